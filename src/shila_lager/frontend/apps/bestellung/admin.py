@@ -1,5 +1,31 @@
+from typing import Any, TYPE_CHECKING
+
 from django.contrib import admin
+from django.db.models import QuerySet
+from django.http import HttpRequest
 
 from shila_lager.frontend.apps.bestellung.models import BeverageCrate
+from shila_lager.frontend.apps.bestellung.orders import bump_catalogue_version
+
+# The admin classes are only generic in the type stubs
+if TYPE_CHECKING:
+    BeverageCrateAdminBase = admin.ModelAdmin[BeverageCrate]
+else:
+    BeverageCrateAdminBase = admin.ModelAdmin
+
+
+@admin.register(BeverageCrate)
+class BeverageCrateAdmin(BeverageCrateAdminBase):
+    """The order table is cached until the catalogue version is bumped, so changing a crate bumps it like an import does"""
+
+    def save_model(self, request: HttpRequest, obj: BeverageCrate, form: Any, change: bool) -> None:
+        super().save_model(request, obj, form, change)
+        bump_catalogue_version()
+
+    def delete_model(self, request: HttpRequest, obj: BeverageCrate) -> None:
+        super().delete_model(request, obj)
+        bump_catalogue_version()
 
-admin.site.register(BeverageCrate)
+    def delete_queryset(self, request: HttpRequest, queryset: QuerySet[BeverageCrate]) -> None:
+        super().delete_queryset(request, queryset)
+        bump_catalogue_version()
@@ -4,9 +4,9 @@ from decimal import Decimal
 from typing import TYPE_CHECKING
 
 from django.db.models import Model, CharField, TextChoices, DecimalField, CASCADE, ForeignKey, DateTimeField
-from django_stubs_ext.db.models.manager import RelatedManager
 
 if TYPE_CHECKING:
+    from django_stubs_ext.db.models.manager import RelatedManager
     from shila_lager.frontend.apps.rechnungen.models import GrihedInvoiceItem, ShilaInventoryCount
 
 
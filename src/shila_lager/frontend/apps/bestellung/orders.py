@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_CEILING
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery, QuerySet
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate, BottleType, GrihedPrice
+from shila_lager.frontend.apps.rechnungen.forecast import get_target_stocks
+from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount, ShilaInventoryCountDetail
+from shila_lager.utils import BeverageID, zero
+
+catalogue_version_key = "bestellung:catalogue-version"
+
+
+@dataclass
+class OrderSuggestion:
+    beverage: BeverageCrate
+    current_stock: Decimal
+    target_stock: Decimal
+    price_per_crate: Decimal  # Including the deposit, as this is what is actually payed
+    extra: int = 0
+
+    @property
+    def order_quantity(self) -> int:
+        missing = (self.target_stock - self.current_stock).to_integral_value(ROUND_CEILING)
+        return max(0, int(missing) + self.extra)
+
+    @property
+    def cost(self) -> Decimal:
+        return self.order_quantity * self.price_per_crate
+
+    def to_json(self) -> dict[str, str | int]:
+        return {
+            "id": self.beverage.id,
+            "current_stock": str(self.current_stock),
+            "target_stock": str(self.target_stock),
+            "extra": self.extra,
+            "order_quantity": self.order_quantity,
+            "cost": f"{self.cost:.2f}",
+        }
+
+
+def orderable_beverages() -> QuerySet[BeverageCrate]:
+    """All beverages that can be ordered, annotated with their current purchase price and deposit"""
+    current_price = GrihedPrice.objects.filter(crate=OuterRef("pk")).order_by("-valid_from")
+    orderable_types = [it for it in BottleType if it.is_bottle]
+
+    return BeverageCrate.objects.filter(bottle_type__in=orderable_types).annotate(
+        current_purchase_price=Subquery(current_price.values("price")[:1]),
+        current_deposit=Subquery(current_price.values("deposit")[:1]),
+    ).order_by("name")
+
+
+def latest_inventory() -> dict[BeverageID, Decimal]:
+    """The counted stock of every beverage in the latest `ShilaInventoryCount`"""
+    latest = ShilaInventoryCount.objects.order_by("-date").values("date")[:1]
+    return dict(ShilaInventoryCountDetail.objects.filter(date_id=Subquery(latest)).values_list("crate_id", "count"))
+
+
+def compute_order_suggestions(
+    target_stocks: dict[BeverageID, Decimal] | None = None,
+    current_stocks: dict[BeverageID, Decimal] | None = None,
+    extras: dict[BeverageID, int] | None = None,
+) -> list[OrderSuggestion]:
+    """
+    Compute the suggested order for every orderable beverage with a constant number of queries.
+    Without explicit `target_stocks` the cached demand forecasts are used, without explicit `current_stocks` the latest `ShilaInventoryCount`.
+    """
+    extras = extras or {}
+    if target_stocks is None:
+        target_stocks = get_target_stocks()
+    if current_stocks is None:
+        current_stocks = latest_inventory()
+
+    suggestions = []
+    for beverage in orderable_beverages():
+        price = getattr(beverage, "current_purchase_price", None) or zero
+        deposit = getattr(beverage, "current_deposit", None) or zero
+
+        suggestions.append(OrderSuggestion(
+            beverage,
+            current_stock=current_stocks.get(beverage.id, zero),
+            target_stock=target_stocks.get(beverage.id, zero),
+            price_per_crate=price + deposit,
+            extra=extras.get(beverage.id, 0),
+        ))
+
+    return suggestions
+
+
+def catalogue_version() -> int:
+    """A token that changes whenever the catalogue, the prices or the inventory changed. Cached order tables are keyed by it."""
+    version = cache.get_or_set(catalogue_version_key, time.time_ns, timeout=None)
+    assert version is not None
+    return int(version)
+
+
+def bump_catalogue_version() -> None:
+    """Invalidate all cached order tables. Has to be called by everything that imports invoices or inventory counts."""
+    cache.set(catalogue_version_key, time.time_ns(), timeout=None)
@@ -1,29 +1,35 @@
 /**
- * Calculate the order quantity and price for a given input element.
- * @param grihed_id {string} The id of the grihed.
- * @param pricePerCrate {number} The price per crate.
- * @param shouldBeInStock {number} The ideal stock level.
+ * Recalculate the order on the server with the values currently entered in the form.
+ * The order quantities and costs are computed by the server, this only updates the displayed values.
+ * @param form {HTMLFormElement} The order form.
  */
-function calculateOrder(grihed_id, pricePerCrate, shouldBeInStock) {
-    const currentStockInput = document.querySelector(`input[name="current_stock_${grihed_id}"]`)
-    const extraOrderInput = document.querySelector(`input[name="extra_order_qty_${grihed_id}"]`);
-    const orderQuantityDisplay = document.querySelector(`td[id="order_qty_${grihed_id}"]`);
-    const orderPriceDisplay = document.querySelector(`td[id="price_${grihed_id}"]`);
+async function recalculateOrder(form) {
+    const response = await fetch(form.dataset.calculateUrl, {method: 'POST', body: new FormData(form)});
+    if (!response.ok) {
+        return;
+    }
 
-    const currentStock = parseInt(currentStockInput.value) || 0;
-    const extraStock = parseInt(extraOrderInput.value) || 0;
-    const orderQuantity = Math.max(0, shouldBeInStock - currentStock + extraStock)
+    const order = await response.json();
+    for (const item of order.items) {
+        const row = form.querySelector(`tr[data-beverage-id="${CSS.escape(item.id)}"]`);
+        if (row === null) {
+            continue;
+        }
 
-    orderQuantityDisplay.innerText = orderQuantity;
-    orderPriceDisplay.innerText = `${(orderQuantity * pricePerCrate).toFixed(2)}€`;
+        row.querySelector('.order-quantity').innerText = item.order_quantity;
+        row.querySelector('.order-cost').innerText = `${item.cost}€`;
+    }
+
+    form.querySelector('#total_cost').innerText = `${order.total_cost}€`;
 }
 
 document.addEventListener('DOMContentLoaded', () => {
     const grihedForm = document.querySelector('form[id="grihed_form"]');
+    let pending = null;
 
-    // Submit changes to the form every time the user changes the input.
-    grihedForm.addEventListener('input', (event) => {
-        const input = event.target;
-        console.log(input.attributes)
+    // A single listener for all rows, the requests are debounced while the user is typing
+    grihedForm.addEventListener('input', () => {
+        clearTimeout(pending);
+        pending = setTimeout(() => recalculateOrder(grihedForm), 250);
     });
 });
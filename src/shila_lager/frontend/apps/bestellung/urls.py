@@ -6,6 +6,7 @@ from shila_lager.frontend.apps.bestellung import views
 urlpatterns = [
     path("", RedirectView.as_view(url="grihed/"), name="bestellungen_index"),
     path("grihed/", views.grihed_order, name="grihed_orders"),
+    path("grihed/calculate/", views.calculate_grihed_order, name="calculate_grihed_order"),
     path("bringmeister/", views.bringmeister_order, name="bringmeister_orders"),
     path("gepa/", views.gepa_order, name="gepa_orders"),
     path("hygienelager/", views.hygienelager_order, name="hygienelager_orders"),
@@ -1,49 +1,88 @@
-from django.db.models import QuerySet
-from django.http import HttpResponse, HttpRequest
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpRequest, JsonResponse
 from django.template import loader
+from django.utils.safestring import mark_safe, SafeString
+from django.views.decorators.http import require_POST
 
-from shila_lager.frontend.apps.bestellung.models import BeverageCrate
+from shila_lager.frontend.apps.bestellung.orders import compute_order_suggestions, latest_inventory, catalogue_version
+from shila_lager.utils import BeverageID, zero
 
+# More crates than this are never in stock or ordered, larger values are capped
+max_order_form_quantity = 10_000
 
-def grihed_order(request: HttpRequest, **kwargs: str) -> HttpResponse:
-    beverages: QuerySet[BeverageCrate] = BeverageCrate.objects.all()
 
-    template = loader.get_template("bestellung/grihed.html")
-    context = {
-        "beverages": beverages,
-    }
+def render_order_table() -> SafeString:
+    """The order table only changes on imports, so the rendered fragment is cached until the catalogue version is bumped"""
+    key = f"bestellung:order-table:{catalogue_version()}"
+    table: str | None = cache.get(key)
 
-    return HttpResponse(template.render(context, request))
+    if table is None:
+        suggestions = compute_order_suggestions()
+        table = loader.render_to_string("bestellung/order_table.html", {
+            "suggestions": suggestions,
+            "total_cost": sum((it.cost for it in suggestions), zero),
+        })
+        cache.set(key, table)
 
+    return mark_safe(table)
 
-def bringmeister_order(request: HttpRequest, **kwargs: str) -> HttpResponse:
-    beverages = BeverageCrate.objects.all()
 
+def render_order_page(request: HttpRequest) -> HttpResponse:
     template = loader.get_template("bestellung/grihed.html")
     context = {
-        "beverages": beverages
+        "order_table": render_order_table(),
     }
 
     return HttpResponse(template.render(context, request))
 
 
-def gepa_order(request: HttpRequest, **kwargs: str) -> HttpResponse:
-    beverages = BeverageCrate.objects.all()
+def grihed_order(request: HttpRequest, **kwargs: str) -> HttpResponse:
+    return render_order_page(request)
 
-    template = loader.get_template("bestellung/grihed.html")
-    context = {
-        "beverages": beverages
-    }
 
-    return HttpResponse(template.render(context, request))
+def bringmeister_order(request: HttpRequest, **kwargs: str) -> HttpResponse:
+    return render_order_page(request)
+
+
+def gepa_order(request: HttpRequest, **kwargs: str) -> HttpResponse:
+    return render_order_page(request)
 
 
 def hygienelager_order(request: HttpRequest, **kwargs: str) -> HttpResponse:
-    beverages = BeverageCrate.objects.all()
+    return render_order_page(request)
 
-    template = loader.get_template("bestellung/grihed.html")
-    context = {
-        "beverages": beverages
-    }
 
-    return HttpResponse(template.render(context, request))
+def parse_order_form(data: dict[str, str]) -> tuple[dict[BeverageID, Decimal], dict[BeverageID, int]]:
+    """Extract the `current_stock_<id>` and `extra_order_qty_<id>` fields of the order form. Invalid values (including infinity and NaN) are treated as 0."""
+    current_stocks, extras = {}, {}
+
+    for key, value in data.items():
+        if key.startswith("current_stock_"):
+            try:
+                stock = Decimal(value)
+            except InvalidOperation:
+                stock = zero
+
+            current_stocks[key.removeprefix("current_stock_")] = min(Decimal(max_order_form_quantity), max(zero, stock)) if stock.is_finite() else zero
+
+        elif key.startswith("extra_order_qty_"):
+            try:
+                extras[key.removeprefix("extra_order_qty_")] = min(max_order_form_quantity, max(0, int(value)))
+            except ValueError:
+                extras[key.removeprefix("extra_order_qty_")] = 0
+
+    return current_stocks, extras
+
+
+@require_POST
+def calculate_grihed_order(request: HttpRequest, **kwargs: str) -> JsonResponse:
+    """Recalculate the order with the values currently entered in the order form"""
+    current_stocks, extras = parse_order_form(request.POST.dict())
+    suggestions = compute_order_suggestions(current_stocks=latest_inventory() | current_stocks, extras=extras)
+
+    return JsonResponse({
+        "items": [it.to_json() for it in suggestions],
+        "total_cost": f"{sum((it.cost for it in suggestions), zero):.2f}",
+    })
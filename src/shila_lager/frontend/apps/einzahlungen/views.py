@@ -1,5 +1,45 @@
+from django.core.exceptions import BadRequest
 from django.http import HttpRequest, HttpResponse
+from django.template import loader
+
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, ShilaBookingCategory, ShilaBookingKind
+from shila_lager.frontend.pagination import keyset_paginate, get_date_parameter
 
 
 def index(request: HttpRequest, **kwargs: str) -> HttpResponse:
-    return HttpResponse("Hello, world. You're at the einzahlungen index.")
+    """All bookings, filtered by `?peer=`, `?category=`, `?kind=`, `?start=` and `?end=`. Every filter is covered by an index together with the booking date."""
+    bookings = ShilaAccountBooking.objects.all()
+
+    peer, category, kind = request.GET.get("peer"), request.GET.get("category"), request.GET.get("kind")
+    if peer:
+        bookings = bookings.filter(beneficiary_or_payer=peer)
+
+    if category:
+        if category not in {it.value for it in ShilaBookingCategory}:
+            raise BadRequest(f"Unknown category {category!r}")
+        bookings = bookings.filter(booking_category=category)
+
+    if kind:
+        if kind not in ShilaBookingKind.values:
+            raise BadRequest(f"Unknown booking kind {kind!r}")
+        bookings = bookings.filter(kind=kind)
+
+    start, end = get_date_parameter(request, "start"), get_date_parameter(request, "end")
+    if start is not None:
+        bookings = bookings.filter(booking_date__gte=start)
+    if end is not None:
+        bookings = bookings.filter(booking_date__lte=end)
+
+    template = loader.get_template("einzahlungen/index.html")
+    context = {
+        "bookings": keyset_paginate(request, bookings, "booking_date"),
+        "categories": [it.value for it in ShilaBookingCategory],
+        "kinds": ShilaBookingKind.values,
+        "peer": peer or "",
+        "category": category or "",
+        "kind": kind or "",
+        "start": start,
+        "end": end,
+    }
+
+    return HttpResponse(template.render(context, request))
@@ -0,0 +1,19 @@
+from typing import TYPE_CHECKING
+
+from django.contrib import admin
+
+from shila_lager.frontend.apps.jobs.models import Job
+
+# The admin classes are only generic in the type stubs
+if TYPE_CHECKING:
+    JobModelAdmin = admin.ModelAdmin[Job]
+else:
+    JobModelAdmin = admin.ModelAdmin
+
+
+@admin.register(Job)
+class JobAdmin(JobModelAdmin):
+    list_display = "id", "kind", "status", "created_at", "finished_at"
+    list_filter = "status", "kind"
+    ordering = "-created_at",
+    show_full_result_count = False
@@ -0,0 +1,75 @@
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, Future, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Any, Iterable
+
+import django
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from shila_lager.frontend.apps.jobs.models import Job, JobStatus, JobKind
+from shila_lager.frontend.apps.jobs.runner import run_job_in_process
+from shila_lager.settings import logger, job_worker_poll_interval, job_runner
+
+
+class Command(BaseCommand):
+    help = 'Run the pending background jobs in a pool of processes (for SHILA_LAGER_JOB_RUNNER=worker)'
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument('--processes', type=int, default=2, help='Number of jobs that are run at the same time')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if job_runner != "worker":
+            logger.warning(f"The job runner is \"{job_runner}\", so the web server runs the jobs itself. Set SHILA_LAGER_JOB_RUNNER=worker to only run them here.")
+
+        processes: int = options["processes"]
+        while True:
+            # The processes are spawned instead of forked, so they do not share the database connection of this one
+            with ProcessPoolExecutor(max_workers=processes, mp_context=get_context("spawn"), initializer=django.setup) as pool:
+                logger.info(f"Waiting for jobs with {processes} processes")
+                self.run_jobs(pool, processes)
+
+            logger.warning("A process of the pool crashed, starting a new pool")
+
+    def run_jobs(self, pool: ProcessPoolExecutor, processes: int) -> None:
+        """Submit the pending jobs to the pool until one of its processes crashes, which breaks the pool"""
+        running: dict[Future[None], tuple[int, JobKind]] = {}
+        while True:
+            if self.finish_jobs(running, [it for it in running if it.done()]):
+                # The other jobs of the broken pool are aborted as well
+                self.finish_jobs(running, list(wait(running).done))
+                return
+
+            # The imports write to the same tables, so only one of them runs at a time
+            is_importing = any(kind.is_import for _, kind in running.values())
+            submitted = [pk for pk, _ in running.values()]
+
+            for job in Job.objects.filter(status=JobStatus.pending).exclude(pk__in=submitted).order_by("created_at")[:max(0, processes - len(running))]:
+                kind = JobKind(job.kind)
+                if kind.is_import and is_importing:
+                    continue
+
+                is_importing |= kind.is_import
+                running[pool.submit(run_job_in_process, job.pk)] = job.pk, kind
+                logger.info(f"Started job {job.pk} ({kind})")
+
+            time.sleep(job_worker_poll_interval)
+
+    def finish_jobs(self, running: dict[Future[None], tuple[int, JobKind]], futures: Iterable[Future[None]]) -> bool:
+        """Remove the finished jobs from `running` and mark those whose process crashed as failed. Returns whether the pool is broken."""
+        broken = False
+        for future in futures:
+            pk, kind = running.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                # `run_job` stores the errors of the job itself, so the process running it crashed
+                logger.exception(f"Job {pk} ({kind}) crashed")
+                Job.objects.filter(pk=pk, status__in=[JobStatus.pending, JobStatus.running]).update(status=JobStatus.failed, finished_at=timezone.now(), error=traceback.format_exc())
+                broken |= isinstance(e, BrokenProcessPool)
+            else:
+                logger.info(f"Job {pk} ({kind}) finished")
+
+        return broken
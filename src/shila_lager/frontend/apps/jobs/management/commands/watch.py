@@ -0,0 +1,16 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+
+from shila_lager.frontend.apps.jobs.watch import watch_uploads
+
+
+class Command(BaseCommand):
+    help = 'Import the files that arrive in the manual-uploads directories as soon as they are complete (inotify is used if inotify_simple is installed)'
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument('--import-existing', action='store_true', help='Also import the files that are already there, the ones that were imported before are skipped by the parsers')
+        parser.add_argument('--plots', action='store_true', help='Create the plots of the MV-Abrechnung again after new data was imported')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        watch_uploads(import_existing=options["import_existing"], plots=options["plots"])
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='output',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='result',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='timings',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('import_invoices', 'Import Rechnungen'), ('import_bookings', 'Import Kontoauszüge'), ('import_inventory_counts', 'Import Lagerzählungen'), ('weekly_digest', 'Wöchentliche Auswertung'), ('mv_abrechnung', 'MV-Abrechnung')], max_length=64),
+        ),
+    ]
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from typing import Any
+
+from django.db.models import Model, CharField, TextChoices, JSONField, DateTimeField, TextField, Index
+
+
+class JobKind(TextChoices):
+    import_invoices = "import_invoices", "Import Rechnungen"
+    import_bookings = "import_bookings", "Import Kontoauszüge"
+    import_inventory_counts = "import_inventory_counts", "Import Lagerzählungen"
+    weekly_digest = "weekly_digest", "Wöchentliche Auswertung"
+    mv_abrechnung = "mv_abrechnung", "MV-Abrechnung"
+
+    @property
+    def is_import(self) -> bool:
+        return self in {JobKind.import_invoices, JobKind.import_bookings, JobKind.import_inventory_counts}
+
+
+class JobStatus(TextChoices):
+    pending = "pending"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class Job(Model):
+    """A task that is run in the background by `jobs.runner`, polled by the web UI"""
+
+    class Meta:
+        verbose_name_plural = "Jobs"
+        indexes = [
+            Index(fields=["status", "created_at"], name="job_status_created_idx"),
+            Index(fields=["sha256"], name="job_sha256_idx"),
+        ]
+
+    kind = CharField(max_length=64, choices=JobKind)
+    arguments = JSONField(default=dict)
+    status = CharField(max_length=16, choices=JobStatus, default=JobStatus.pending)
+    sha256 = CharField(max_length=64, null=True, blank=True)  # Of the uploaded file the job imports
+
+    created_at = DateTimeField(auto_now_add=True)
+    started_at = DateTimeField(null=True, blank=True)
+    finished_at = DateTimeField(null=True, blank=True)
+    error = TextField(blank=True, default="")
+
+    result = JSONField(null=True, blank=True)
+    output = TextField(blank=True, default="")  # Everything the job printed
+    timings = JSONField(default=list, blank=True)  # Wall time, number of queries and SQL time of every profile stage
+
+    def __str__(self) -> str:
+        return f"Job {self.pk} ({self.kind}, {self.status})"
+
+    @property
+    def duration(self) -> float | None:
+        if self.started_at is None or self.finished_at is None:
+            return None
+
+        return (self.finished_at - self.started_at).total_seconds()
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "id": self.pk,
+            "kind": self.kind,
+            "status": self.status,
+            "sha256": self.sha256,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at is not None else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at is not None else None,
+            "duration": self.duration,
+            "error": self.error,
+            "result": self.result,
+            "output": self.output,
+            "timings": self.timings,
+        }
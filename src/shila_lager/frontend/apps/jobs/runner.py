@@ -0,0 +1,129 @@
+"""
+Runs jobs in the background, so requests return immediately.
+The jobs are stored in the database. With the "thread" runner, they are run on a thread pool of the web server, with the "worker" runner by `run-worker` (see `job_runner`).
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict
+from io import StringIO, TextIOBase
+from typing import Any, Iterator, TextIO, cast
+
+from django.db import transaction, close_old_connections, connections
+from django.utils import timezone
+
+from shila_lager.frontend.apps.jobs.models import Job, JobKind, JobStatus
+from shila_lager.frontend.apps.jobs.tasks import job_functions
+from shila_lager.profiling import Profiler
+from shila_lager.settings import logger, job_worker_threads, job_runner
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+_captured = threading.local()
+_stdout_lock = threading.Lock()
+
+
+class _ThreadStdout(TextIOBase):
+    """Writes to the stream captured by the current thread, or to the original stdout if it does not capture"""
+
+    def __init__(self, original: TextIO) -> None:
+        self.original = original
+
+    def _stream(self) -> TextIO:
+        stream: TextIO | None = getattr(_captured, "stream", None)
+        return self.original if stream is None else stream
+
+    def write(self, text: str) -> int:
+        return self._stream().write(text)
+
+    def flush(self) -> None:
+        self._stream().flush()
+
+    def isatty(self) -> bool:
+        return self._stream().isatty()
+
+
+@contextmanager
+def capture_stdout(stream: TextIO) -> Iterator[None]:
+    """Like `redirect_stdout`, but only for the current thread, so jobs that run at the same time do not capture each other's output"""
+    with _stdout_lock:
+        if not isinstance(cast(object, sys.stdout), _ThreadStdout):
+            sys.stdout = cast(TextIO, _ThreadStdout(sys.stdout))
+
+    _captured.stream = stream
+    try:
+        yield
+    finally:
+        _captured.stream = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=job_worker_threads, thread_name_prefix="shila-lager-job")
+
+        return _executor
+
+
+def enqueue_job(kind: JobKind, arguments: dict[str, Any] | None = None, sha256: str | None = None) -> Job:
+    """Create a job, or return the identical job that is still pending"""
+    arguments = arguments or {}
+    with transaction.atomic():
+        pending = Job.objects.filter(kind=kind, arguments=arguments, status=JobStatus.pending).order_by("created_at").first()
+        if pending is not None:
+            return pending
+
+        job = Job.objects.create(kind=kind, arguments=arguments, sha256=sha256)
+
+    if job_runner == "thread":
+        # The thread has its own database connection, which would not see the job before the request's transaction is committed
+        transaction.on_commit(lambda: get_executor().submit(_run_job_in_thread, job.pk))
+
+    return job
+
+
+def run_job(pk: int) -> None:
+    """Run the job if it is still pending. Errors are stored in the job instead of being raised."""
+    claimed = Job.objects.filter(pk=pk, status=JobStatus.pending).update(status=JobStatus.running, started_at=timezone.now())
+    if not claimed:
+        return
+
+    job = Job.objects.get(pk=pk)
+    output = StringIO()
+    profiler = Profiler(f"job-{job.kind}", trace_memory=False)
+
+    try:
+        with capture_stdout(output), profiler:
+            result = job_functions[JobKind(job.kind)](**job.arguments)
+    except Exception:
+        logger.exception(f"{job} failed")
+        Job.objects.filter(pk=pk).update(status=JobStatus.failed, finished_at=timezone.now(), error=traceback.format_exc(), output=output.getvalue(), timings=_timings(profiler))
+        return
+
+    Job.objects.filter(pk=pk).update(status=JobStatus.succeeded, finished_at=timezone.now(), result=result, output=output.getvalue(), timings=_timings(profiler))
+
+
+def _timings(profiler: Profiler) -> list[dict[str, Any]]:
+    return [{key: value for key, value in asdict(it).items() if key != "peak_memory"} for it in profiler.stages]
+
+
+def _run_job_in_thread(pk: int) -> None:
+    try:
+        run_job(pk)
+    finally:
+        # Threads of the pool are reused, their connections are not closed by the request cycle
+        close_old_connections()
+
+
+def run_job_in_process(pk: int) -> None:
+    """Run a job in a process of the `run-worker` pool"""
+    try:
+        run_job(pk)
+    finally:
+        connections.close_all()
@@ -0,0 +1,62 @@
+const pollInterval = 1000;
+const statusTexts = {
+    pending: 'Wartet…',
+    running: 'Läuft…',
+    succeeded: 'Fertig.',
+    failed: 'Fehlgeschlagen.',
+};
+
+/**
+ * Poll the job until it is finished and show its status.
+ * @param statusUrl {string} The url of the job.
+ * @param output {HTMLElement} Where to show the status.
+ * @returns {Promise<object>} The finished job.
+ */
+async function pollJob(statusUrl, output) {
+    while (true) {
+        const response = await fetch(statusUrl);
+        const {job} = await response.json();
+
+        output.innerText = statusTexts[job.status];
+        if (job.status !== 'pending' && job.status !== 'running') {
+            return job;
+        }
+
+        await new Promise(resolve => setTimeout(resolve, pollInterval));
+    }
+}
+
+/**
+ * Submit the form in the background, which has to respond with a job, and poll the job.
+ * @param form {HTMLFormElement} The form that starts the job.
+ * @param output {HTMLElement} Where to show the status.
+ * @returns {Promise<object|null>} The finished job, or null if it could not be started.
+ */
+async function submitJobForm(form, output) {
+    output.innerText = 'Wird gesendet…';
+
+    const response = await fetch(form.action || window.location.href, {method: 'POST', body: new FormData(form)});
+    const result = await response.json();
+    if (!response.ok) {
+        output.innerText = result.error;
+        return null;
+    }
+
+    return await pollJob(result.status_url, output);
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    for (const form of document.querySelectorAll('form.job-form')) {
+        const output = document.querySelector(form.dataset.output);
+
+        form.addEventListener('submit', async (event) => {
+            event.preventDefault();
+            const job = await submitJobForm(form, output);
+
+            // The list of jobs shows the results
+            if (job !== null && form.dataset.reload !== undefined) {
+                window.location.reload();
+            }
+        });
+    }
+});
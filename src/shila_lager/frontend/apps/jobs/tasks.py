@@ -0,0 +1,50 @@
+"""The functions run by the jobs. They get the job arguments as keyword arguments and return a JSON serializable result."""
+from __future__ import annotations
+
+from itertools import pairwise
+from typing import Any, Callable
+
+from dateutil.parser import parse as parse_datetime
+
+from shila_lager.frontend.apps.bestellung.crud import get_beverage_crates
+from shila_lager.frontend.apps.jobs.models import JobKind
+from shila_lager.frontend.apps.rechnungen.analyze import analyze_beverage_crates
+from shila_lager.frontend.apps.rechnungen.balance import BalanceHistory
+from shila_lager.frontend.apps.rechnungen.crud import get_inventory_counts_between, get_invoice_item_rows_by_beverage
+from shila_lager.frontend.apps.rechnungen.imports import import_invoices, import_account_bookings, import_inventory_counts
+from shila_lager.frontend.apps.rechnungen.mv_abrechnung.main import mv_abrechnung_main
+from shila_lager.frontend.apps.rechnungen.valuation import value_inventory_counts
+from shila_lager.frontend.apps.rechnungen.weekly_digest import compute_window_value
+from shila_lager.profiling import profile_stage
+from shila_lager.utils import parse_and_localize_date
+
+
+def weekly_digest_task(start: str | None = None, end: str | None = None) -> dict[str, Any]:
+    """The values of `weekly_digest` for every inventory count window between start and end (same arguments as the `weekly-digest` command)"""
+    with profile_stage("Load balances and inventory counts"):
+        balances, beverages, invoice_items = BalanceHistory.load(), get_beverage_crates(), get_invoice_item_rows_by_beverage()
+        inventory_counts = get_inventory_counts_between(parse_and_localize_date(start) if start else None, parse_and_localize_date(end) if end else None)
+        inventory_values = value_inventory_counts(inventory_counts)
+
+    windows = []
+    with profile_stage("Analyze inventory count windows"):
+        for old, new in pairwise(inventory_counts):
+            value = compute_window_value(old, new, balances, analyze_beverage_crates(beverages, old.date, new.date, (old, new), invoice_items), inventory_values)
+            windows.append({"start": old.date.isoformat(), "end": new.date.isoformat()} | value.to_json())
+
+    return {"windows": windows}
+
+
+def mv_abrechnung_task(start: str | None = None, end: str | None = None) -> dict[str, Any]:
+    """Create the plots of the MV-Abrechnung (same arguments as the `mv-abrechnung` command). The printed summary is stored in the output of the job."""
+    plots = mv_abrechnung_main(parse_datetime(start) if start else None, parse_datetime(end) if end else None)
+    return {"plots": sorted(it.name for it in plots)}
+
+
+job_functions: dict[JobKind, Callable[..., dict[str, Any]]] = {
+    JobKind.import_invoices: import_invoices,
+    JobKind.import_bookings: import_account_bookings,
+    JobKind.import_inventory_counts: import_inventory_counts,
+    JobKind.weekly_digest: weekly_digest_task,
+    JobKind.mv_abrechnung: mv_abrechnung_task,
+}
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any
+
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db.models import TextChoices
+
+from shila_lager.frontend.apps.jobs.models import JobKind
+from shila_lager.settings import manual_upload_dir, upload_staging_dir
+
+
+class UploadKind(TextChoices):
+    grihed = "Grihed", "Grihed Rechnung"
+    sparkasse = "Sparkasse", "Sparkasse Kontoauszug"
+    lagerzaehlung = "Lagerzählungen", "Lagerzählung"
+
+    @property
+    def directory(self) -> Path:
+        return manual_upload_dir / self.value
+
+    @property
+    def job_kind(self) -> JobKind:
+        match self:
+            case UploadKind.grihed:
+                return JobKind.import_invoices
+            case UploadKind.sparkasse:
+                return JobKind.import_bookings
+            case UploadKind.lagerzaehlung:
+                return JobKind.import_inventory_counts
+
+        raise ValueError(f"Unknown upload kind {self}")
+
+
+class HashedUploadedFile(UploadedFile):
+    """An uploaded file in the `upload_staging_dir` together with the sha256 of its content"""
+
+    def __init__(self, name: str, content_type: str, charset: str | None, content_type_extra: dict[str, str] | None) -> None:
+        upload_staging_dir.mkdir(parents=True, exist_ok=True)
+        self.staged_file = NamedTemporaryFile(dir=upload_staging_dir, suffix=".part", delete=False)
+        super().__init__(self.staged_file, name, content_type, 0, charset, content_type_extra)
+        self.hash = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        return self.hash.hexdigest()
+
+    def temporary_file_path(self) -> str:
+        return self.staged_file.name
+
+    def close(self) -> None:
+        """Also removes the staged file if it was not moved to its destination"""
+        self.staged_file.close()
+        Path(self.temporary_file_path()).unlink(missing_ok=True)
+
+
+class HashingFileUploadHandler(FileUploadHandler):
+    """Streams uploads chunk by chunk into the `upload_staging_dir` and hashes them on the way, so the content is never held in memory or read twice"""
+
+    file: HashedUploadedFile
+
+    def new_file(self, *args: Any, **kwargs: Any) -> None:
+        super().new_file(*args, **kwargs)
+        assert self.file_name is not None and self.content_type is not None
+        self.file = HashedUploadedFile(self.file_name, self.content_type, self.charset, self.content_type_extra)
+
+    def receive_data_chunk(self, raw_data: bytes, start: int) -> None:
+        self.file.write(raw_data)
+        self.file.hash.update(raw_data)
+
+    def file_complete(self, file_size: int) -> HashedUploadedFile:
+        self.file.flush()
+        self.file.size = file_size
+        return self.file
+
+    def upload_interrupted(self) -> None:
+        if hasattr(self, "file"):
+            self.file.close()
+
+
+def sha256_of_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    file_hash = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def store_upload(upload: HashedUploadedFile, kind: UploadKind) -> Path:
+    """
+    Move the staged upload into the directory of its kind, where the importer will pick it up.
+    Raises a `FileExistsError` if a file with different content has the same name, as it was already imported and would be lost otherwise.
+    """
+    # The file names carry information for the importers (e.g. `<date> <invoice number>.pdf`), so only a leading path is stripped
+    name = Path(upload.name or "").name
+    if not name or name.startswith("."):
+        raise ValueError(f"Invalid file name {upload.name!r}")
+
+    kind.directory.mkdir(parents=True, exist_ok=True)
+    destination = kind.directory / name
+    if destination.exists() and sha256_of_file(destination) != upload.sha256:
+        raise FileExistsError(f"A different file named {name!r} was already uploaded, please rename it")
+
+    upload.staged_file.flush()
+    os.replace(upload.temporary_file_path(), destination)
+
+    return destination
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from shila_lager.frontend.apps.jobs import views
+
+# The stubs for Django 4.2 do not know that async views can be routed
+urlpatterns = [
+    path("", views.index, name="jobs_index"),
+    path("start/", views.start_job, name="jobs_start"),
+    path("upload/", views.upload, name="jobs_upload"),
+    path("<int:pk>/", views.job_status, name="jobs_status"),  # type:ignore[arg-type]
+    path("plots/<str:name>/", views.download_plot, name="jobs_plot"),  # type:ignore[arg-type]
+]
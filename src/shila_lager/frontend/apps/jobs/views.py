@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import mimetypes
+from functools import wraps
+from urllib.parse import quote
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse, Http404, HttpResponseBase
+from django.template import loader
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST
+
+from shila_lager.frontend.apps.jobs.models import Job, JobStatus, JobKind
+from shila_lager.frontend.apps.jobs.runner import enqueue_job
+from shila_lager.frontend.apps.jobs.uploads import HashingFileUploadHandler, HashedUploadedFile, UploadKind, store_upload
+from shila_lager.settings import plot_output_dir
+
+plot_chunk_size = 64 * 1024
+
+
+def job_to_response(job: Job, status: int = 200) -> JsonResponse:
+    return JsonResponse({"job": job.to_json(), "status_url": reverse("jobs_status", args=[job.pk])}, status=status)
+
+
+def async_login_required(view: Callable[..., Awaitable[HttpResponseBase]]) -> Callable[..., Awaitable[HttpResponseBase]]:
+    """`login_required` for async views, which only supports sync views in this Django version"""
+
+    @wraps(view)
+    async def wrapper(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        user = await request.auser()  # type:ignore[attr-defined]  # Added in Django 5.0, the stubs are still for 4.2
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+# The jobs that can be started from the web UI, all others are started by uploads
+startable_job_kinds = [JobKind.weekly_digest, JobKind.mv_abrechnung]
+
+
+@login_required
+def index(request: HttpRequest, **kwargs: str) -> HttpResponse:
+    template = loader.get_template("jobs/index.html")
+    context = {
+        "jobs": Job.objects.order_by("-created_at").defer("output", "result", "timings")[:50],
+        "kinds": [(it.value, it.label) for it in startable_job_kinds],
+        "plots": sorted(it.name for it in plot_output_dir.glob("*.png")) if plot_output_dir.exists() else [],
+    }
+
+    return HttpResponse(template.render(context, request))
+
+
+@login_required
+@require_POST
+def start_job(request: HttpRequest, **kwargs: str) -> JsonResponse:
+    """Start a digest or the plots of the MV-Abrechnung for an optional date range (`start` and `end`)"""
+    kind = request.POST.get("kind", "")
+    if kind not in startable_job_kinds:
+        return JsonResponse({"error": f"Jobs of kind {kind!r} can not be started"}, status=400)
+
+    arguments = {}
+    for name in ["start", "end"]:
+        value = request.POST.get(name)
+        if not value:
+            continue
+        try:
+            # Raises for well-formed but invalid dates like 2024-02-30
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            return JsonResponse({"error": f"Invalid date {value!r} for {name}, expected YYYY-MM-DD"}, status=400)
+
+        arguments[name] = value
+
+    job = enqueue_job(JobKind(kind), arguments)
+    return job_to_response(job, status=202)
+
+
+@csrf_exempt
+@login_required
+def upload(request: HttpRequest, **kwargs: str) -> HttpResponse:
+    # The upload handlers can only be replaced before the body is read, which the CSRF check does. It is done afterward in `_upload`.
+    request.upload_handlers = [HashingFileUploadHandler(request)]
+    return _upload(request)
+
+
+@csrf_protect
+def _upload(request: HttpRequest) -> HttpResponse:
+    """Store an uploaded file and import it in the background. Returns the job to poll."""
+    if request.method != "POST":
+        template = loader.get_template("jobs/upload.html")
+        return HttpResponse(template.render({"kinds": UploadKind.choices}, request))
+
+    try:
+        kind = UploadKind(request.POST.get("kind", ""))
+    except ValueError:
+        return JsonResponse({"error": f"Unknown upload kind {request.POST.get('kind')!r}"}, status=400)
+
+    file = request.FILES.get("file")
+    if not isinstance(file, HashedUploadedFile):
+        return JsonResponse({"error": "No file uploaded"}, status=400)
+
+    # The same file was already imported (or is about to be), importing it again would not change anything
+    existing = Job.objects.filter(sha256=file.sha256, kind=kind.job_kind).exclude(status=JobStatus.failed).order_by("-created_at").first()
+    if existing is not None:
+        return job_to_response(existing)
+
+    try:
+        store_upload(file, kind)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except FileExistsError as e:
+        return JsonResponse({"error": str(e)}, status=409)
+
+    job = enqueue_job(kind.job_kind, sha256=file.sha256)
+    return job_to_response(job, status=202)
+
+
+@async_login_required
+async def job_status(request: HttpRequest, pk: int, **kwargs: str) -> JsonResponse:
+    # Polled every second by every open page with a running job, so it does not occupy a thread of the server
+    try:
+        job = await Job.objects.aget(pk=pk)
+    except Job.DoesNotExist:
+        raise Http404(f"Job {pk} does not exist")
+
+    return job_to_response(job)
+
+
+async def read_chunks(path: Path) -> AsyncIterator[bytes]:
+    """Read the file in chunks without blocking the event loop"""
+    file = await asyncio.to_thread(path.open, "rb")
+    try:
+        while chunk := await asyncio.to_thread(file.read, plot_chunk_size):
+            yield chunk
+    finally:
+        file.close()
+
+
+@async_login_required
+async def download_plot(request: HttpRequest, name: str, **kwargs: str) -> StreamingHttpResponse:
+    """Stream a plot of the MV-Abrechnung. Only files directly in `plot_output_dir` can be downloaded."""
+    path = plot_output_dir / name
+    if name.startswith(".") or path.parent != plot_output_dir:
+        raise Http404(f"Invalid plot {name!r}")
+
+    try:
+        size = (await asyncio.to_thread(path.stat)).st_size
+    except FileNotFoundError:
+        raise Http404(f"Plot {name!r} does not exist")
+
+    content_type, _ = mimetypes.guess_type(name)
+    response = StreamingHttpResponse(read_chunks(path), content_type=content_type or "application/octet-stream")
+    response["Content-Length"] = str(size)
+    response["Content-Disposition"] = f"inline; filename*=UTF-8''{quote(name)}"
+    return response
@@ -0,0 +1,120 @@
+"""
+Imports the files that arrive in the subdirectories of the `manual_upload_dir`, used by `shila-manage watch`.
+
+The directories are scanned every `watch_poll_interval` seconds, or whenever inotify reports a change if `inotify_simple` is installed.
+A file is imported once its size and modification time did not change for `watch_debounce` seconds, as it might still be copied otherwise.
+The imports are enqueued as jobs with the paths of the new files, so they show up in the web UI and refresh the statistics and columns like uploads do.
+Files uploaded through the web UI are seen as well, importing them again does not change anything.
+"""
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, DefaultDict
+
+from shila_lager.frontend.apps.jobs.models import Job, JobKind, JobStatus
+from shila_lager.frontend.apps.jobs.runner import enqueue_job
+from shila_lager.frontend.apps.jobs.uploads import UploadKind
+from shila_lager.settings import logger, job_worker_poll_interval, watch_poll_interval, watch_debounce
+
+FileState = tuple[int, int]  # Size and modification time in nanoseconds
+
+
+def scan_upload_dirs() -> dict[Path, FileState]:
+    files = {}
+    for kind in UploadKind:
+        if not kind.directory.exists():
+            continue
+
+        for path in kind.directory.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Deleted while scanning
+                continue
+
+            if path.is_file() and not path.name.startswith("."):
+                files[path] = stat.st_size, stat.st_mtime_ns
+
+    return files
+
+
+class UploadWatcher:
+    def __init__(self, import_existing: bool = False) -> None:
+        self.imported: dict[Path, FileState] = {} if import_existing else scan_upload_dirs()
+        self.pending: dict[Path, tuple[FileState, float]] = {}  # The state of a new file and since when it did not change
+
+    def settled_files(self, now: float | None = None) -> DefaultDict[UploadKind, list[Path]]:
+        """The new or changed files that did not change for `watch_debounce` seconds. They are expected to be imported afterward."""
+        now = time.monotonic() if now is None else now
+        files, settled = scan_upload_dirs(), defaultdict(list)
+        self.pending = {path: it for path, it in self.pending.items() if path in files}
+
+        for path, state in files.items():
+            if self.imported.get(path) == state:
+                continue
+
+            pending = self.pending.get(path)
+            if pending is None or pending[0] != state:
+                self.pending[path] = state, now
+            elif now - pending[1] >= watch_debounce:
+                del self.pending[path]
+                self.imported[path] = state
+                settled[UploadKind(path.parent.name)].append(path)
+
+        return settled
+
+
+def _get_inotify_wait() -> Callable[[float | None], None] | None:
+    try:
+        from inotify_simple import INotify, flags  # type:ignore[import-not-found, unused-ignore]
+    except ImportError:
+        return None
+
+    inotify = INotify()
+    for kind in UploadKind:
+        kind.directory.mkdir(parents=True, exist_ok=True)
+        inotify.add_watch(kind.directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.MODIFY | flags.DELETE)
+
+    def wait(timeout: float | None) -> None:
+        inotify.read(timeout=None if timeout is None else int(timeout * 1000))
+
+    return wait
+
+
+def import_files(files: dict[UploadKind, list[Path]], plots: bool = False) -> list[Job]:
+    """Enqueue an import job per kind. With `plots`, the plots of the MV-Abrechnung are created again once the imports are done."""
+    jobs = []
+    for kind, paths in files.items():
+        logger.info(f"Importing {', '.join(it.name for it in paths)}")
+        jobs.append(enqueue_job(kind.job_kind, {"paths": sorted(str(it) for it in paths)}))
+
+    if plots and jobs:
+        while Job.objects.filter(pk__in=[it.pk for it in jobs], status__in=[JobStatus.pending, JobStatus.running]).exists():
+            time.sleep(job_worker_poll_interval)
+
+        if any((it.result or {}).get("imported") for it in Job.objects.filter(pk__in=[it.pk for it in jobs])):
+            jobs.append(enqueue_job(JobKind.mv_abrechnung))
+
+    return jobs
+
+
+def watch_uploads(import_existing: bool = False, plots: bool = False) -> None:
+    watcher = UploadWatcher(import_existing)
+    inotify_wait = _get_inotify_wait()
+    if inotify_wait is None:
+        logger.info(f"inotify_simple is not installed, looking for new files every {watch_poll_interval}s")
+
+    logger.info(f"Watching {', '.join(str(it.directory) for it in UploadKind)}")
+    while True:
+        settled = watcher.settled_files()
+        if settled:
+            import_files(settled, plots)
+
+        # New files are looked at again once they could have settled
+        timeout = watch_debounce if watcher.pending else None
+        if inotify_wait is not None:
+            inotify_wait(timeout)
+        else:
+            time.sleep(timeout or watch_poll_interval)
@@ -1 +1,157 @@
-# Register your models here.
+import operator
+from functools import reduce
+from typing import Any, TYPE_CHECKING
+
+from django.contrib import admin
+from django.db.models import QuerySet, Q
+from django.http import HttpRequest
+
+from shila_lager.frontend.apps.rechnungen.imports import reclassify_account_bookings, refresh_after_inventory_count_change
+from shila_lager.frontend.apps.rechnungen.models import BookingRule, GrihedInvoice, GrihedInvoiceItem, GrihedInvoicePayment, ShilaAccountBooking, ShilaInventoryCount, ShilaInventoryCountDetail
+
+# The admin classes are only generic in the type stubs
+if TYPE_CHECKING:
+    GrihedInvoiceItemInlineBase = admin.TabularInline[GrihedInvoiceItem, GrihedInvoice]
+    GrihedInvoiceAdminBase = admin.ModelAdmin[GrihedInvoice]
+    GrihedInvoiceItemAdminBase = admin.ModelAdmin[GrihedInvoiceItem]
+    ShilaAccountBookingAdminBase = admin.ModelAdmin[ShilaAccountBooking]
+    GrihedInvoicePaymentAdminBase = admin.ModelAdmin[GrihedInvoicePayment]
+    BookingRuleAdminBase = admin.ModelAdmin[BookingRule]
+    ShilaInventoryCountDetailInlineBase = admin.TabularInline[ShilaInventoryCountDetail, ShilaInventoryCount]
+    ShilaInventoryCountAdminBase = admin.ModelAdmin[ShilaInventoryCount]
+else:
+    GrihedInvoiceItemInlineBase = admin.TabularInline
+    GrihedInvoiceAdminBase = admin.ModelAdmin
+    GrihedInvoiceItemAdminBase = admin.ModelAdmin
+    ShilaAccountBookingAdminBase = admin.ModelAdmin
+    GrihedInvoicePaymentAdminBase = admin.ModelAdmin
+    BookingRuleAdminBase = admin.ModelAdmin
+    ShilaInventoryCountDetailInlineBase = admin.TabularInline
+    ShilaInventoryCountAdminBase = admin.ModelAdmin
+
+# All tables here grow with the history, so the change lists skip the second (unfiltered) `COUNT(*)` and only filter on indexed columns.
+# The `__str__` of items and details dereference their foreign keys, which have to be fetched with the rows to avoid one query per row.
+
+
+class GrihedInvoiceItemInline(GrihedInvoiceItemInlineBase):
+    """Invoice items are imported from the PDFs and are only shown here"""
+    model = GrihedInvoiceItem
+    fields = "beverage", "quantity", "total_price", "purchase_price", "sale_price"
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def get_queryset(self, request: HttpRequest) -> QuerySet[GrihedInvoiceItem]:
+        return super().get_queryset(request).select_related("beverage", "purchase_price", "sale_price")
+
+    def has_add_permission(self, request: HttpRequest, obj: Any = None) -> bool:
+        return False
+
+
+@admin.register(GrihedInvoice)
+class GrihedInvoiceAdmin(GrihedInvoiceAdminBase):
+    list_display = "invoice_number", "date", "total_price"
+    date_hierarchy = "date"
+    search_fields = "invoice_number",
+    ordering = "-date", "-invoice_number"
+    show_full_result_count = False
+    inlines = GrihedInvoiceItemInline,
+
+
+@admin.register(GrihedInvoiceItem)
+class GrihedInvoiceItemAdmin(GrihedInvoiceItemAdminBase):
+    list_display = "invoice", "beverage", "quantity", "total_price"
+    list_select_related = "invoice", "beverage"
+    list_filter = "beverage",  # Covered by `grihed_item_beverage_idx`
+    raw_id_fields = "invoice", "beverage", "purchase_price", "sale_price"
+    search_fields = "invoice__invoice_number",
+    ordering = "-invoice__date", "beverage"
+    show_full_result_count = False
+
+
+@admin.register(ShilaAccountBooking)
+class ShilaAccountBookingAdmin(ShilaAccountBookingAdminBase):
+    list_display = "booking_date", "beneficiary_or_payer", "description", "booking_category", "kind", "amount"
+    list_filter = "booking_category", "kind"  # Covered by `booking_category_date_idx` and `booking_kind_date_idx`
+    date_hierarchy = "booking_date"
+    search_fields = "beneficiary_or_payer", "description"
+    ordering = "-booking_date", "-id"
+    show_full_result_count = False
+
+
+@admin.register(GrihedInvoicePayment)
+class GrihedInvoicePaymentAdmin(GrihedInvoicePaymentAdminBase):
+    list_display = "invoice_number", "invoice_date", "status", "booking"
+    list_select_related = "booking",
+    list_filter = "status",  # Covered by `invoice_payment_status_idx`
+    raw_id_fields = "booking",
+    search_fields = "invoice_number",
+    ordering = "-invoice_date", "-id"
+    show_full_result_count = False
+
+
+@admin.register(BookingRule)
+class BookingRuleAdmin(BookingRuleAdminBase):
+    """Changing a rule reclassifies the bookings that match its old or new version"""
+    list_display = "priority", "field", "match", "pattern", "iban", "category"
+    list_filter = "category", "field"
+    search_fields = "pattern",
+
+    def save_model(self, request: HttpRequest, obj: BookingRule, form: Any, change: bool) -> None:
+        old = BookingRule.objects.filter(pk=obj.pk).first() if change else None
+        super().save_model(request, obj, form, change)
+        reclassify_account_bookings(obj.to_filter() | (old.to_filter() if old is not None else Q()))
+
+    def delete_model(self, request: HttpRequest, obj: BookingRule) -> None:
+        condition = obj.to_filter()
+        super().delete_model(request, obj)
+        reclassify_account_bookings(condition)
+
+    def delete_queryset(self, request: HttpRequest, queryset: QuerySet[BookingRule]) -> None:
+        conditions = [it.to_filter() for it in queryset]
+        super().delete_queryset(request, queryset)
+        reclassify_account_bookings(reduce(operator.or_, conditions, Q()))
+
+
+class ShilaInventoryCountDetailInline(ShilaInventoryCountDetailInlineBase):
+    """The counted crates are imported from the inventory files, the admin only allows correcting the counts"""
+    model = ShilaInventoryCountDetail
+    fields = "crate", "count"
+    readonly_fields = "crate",
+    extra = 0
+
+    def get_queryset(self, request: HttpRequest) -> QuerySet[ShilaInventoryCountDetail]:
+        return super().get_queryset(request).select_related("crate", "date")
+
+    def has_add_permission(self, request: HttpRequest, obj: Any = None) -> bool:
+        return False
+
+
+@admin.register(ShilaInventoryCount)
+class ShilaInventoryCountAdmin(ShilaInventoryCountAdminBase):
+    """Changing a count refreshes the statistics, forecasts and order table like an import does"""
+    list_display = "date", "money_in_safe", "other_monetary_value"
+    date_hierarchy = "date"
+    ordering = "-date",
+    show_full_result_count = False
+    inlines = ShilaInventoryCountDetailInline,
+
+    def get_readonly_fields(self, request: HttpRequest, obj: ShilaInventoryCount | None = None) -> Any:
+        # The date is the primary key, changing it would create a second count
+        return ("date",) if obj is not None else ()
+
+    def save_related(self, request: HttpRequest, form: Any, formsets: Any, change: bool) -> None:
+        # The counted crates are saved with the inlines, after `save_model`
+        super().save_related(request, form, formsets, change)
+        refresh_after_inventory_count_change(form.instance.date)
+
+    def delete_model(self, request: HttpRequest, obj: ShilaInventoryCount) -> None:
+        since = obj.date
+        super().delete_model(request, obj)
+        refresh_after_inventory_count_change(since)
+
+    def delete_queryset(self, request: HttpRequest, queryset: QuerySet[ShilaInventoryCount]) -> None:
+        since = min((it.date for it in queryset), default=None)
+        super().delete_queryset(request, queryset)
+        if since is not None:
+            refresh_after_inventory_count_change(since)
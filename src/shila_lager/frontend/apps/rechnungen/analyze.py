@@ -6,15 +6,23 @@ from typing import DefaultDict
 
 from shila_lager.frontend.apps.bestellung.models import BeverageCrate, BottleType
 from shila_lager.frontend.apps.rechnungen.beverage_facts import collapse_categories
-from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount, AnalyzedBeverageCrate, GrihedInvoiceItem
+from shila_lager.frontend.apps.rechnungen.crud import get_invoice_item_rows_by_beverage
+from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount, AnalyzedBeverageCrate, InvoiceItemRow
 from shila_lager.settings import empty_crate_price, logger
 from shila_lager.utils import filter_by_date, zero, BeverageID, DepositCategory, reverse_dict
 
 pfand_scale_factor = Decimal("0.7")
 
 
-def analyze_beverage_crates(beverages: dict[str, BeverageCrate], start: datetime | None = None, end: datetime | None = None, inventory: tuple[ShilaInventoryCount, ShilaInventoryCount] | None = None) -> dict[BeverageID, AnalyzedBeverageCrate]:
-    num_ordered: DefaultDict[BeverageID, list[GrihedInvoiceItem]] = defaultdict(list)
+def analyze_beverage_crates(
+    beverages: dict[str, BeverageCrate], start: datetime | None = None, end: datetime | None = None, inventory: tuple[ShilaInventoryCount, ShilaInventoryCount] | None = None,
+    invoice_items: dict[BeverageID, list[InvoiceItemRow]] | None = None,
+) -> dict[BeverageID, AnalyzedBeverageCrate]:
+    """`invoice_items` are the items of all invoices grouped by beverage (see `get_invoice_item_rows_by_beverage`). Load them once when analyzing many windows."""
+    if invoice_items is None:
+        invoice_items = get_invoice_item_rows_by_beverage()
+
+    num_ordered: DefaultDict[BeverageID, list[InvoiceItemRow]] = defaultdict(list)
     num_returned: DefaultDict[DepositCategory, Decimal] = defaultdict(Decimal)
     payed_deposits: DefaultDict[DepositCategory, Decimal] = defaultdict(Decimal)
     beverage_id_to_deposit_category: dict[BeverageID, DepositCategory] = {}
@@ -29,8 +37,8 @@ def analyze_beverage_crates(beverages: dict[str, BeverageCrate], start: datetime
             # Only add actual crates to the beverage ids
             beverage_id_to_deposit_category[id] = beverage._current_purchase_price().deposit
 
-        for invoice_item in beverage.invoice_items.all():
-            if not filter_by_date(invoice_item.invoice.date, start, end):
+        for invoice_item in invoice_items.get(beverage.id, []):
+            if not filter_by_date(invoice_item.invoice_date, start, end):
                 continue
 
             if bottle_type == BottleType.crate_return:
@@ -63,8 +71,8 @@ def analyze_beverage_crates(beverages: dict[str, BeverageCrate], start: datetime
             average_purchase_price_per_crate = beverage.current_purchase_price()
             average_deposit_per_crate = beverage._current_purchase_price().deposit
         else:
-            average_purchase_price_per_crate = Decimal(sum(item.purchase_price.price for item in ordered) / len(ordered))
-            average_deposit_per_crate = Decimal(sum(item.purchase_price.deposit for item in ordered) / len(ordered))
+            average_purchase_price_per_crate = Decimal(sum(item.purchase_price for item in ordered) / len(ordered))
+            average_deposit_per_crate = Decimal(sum(item.deposit for item in ordered) / len(ordered))
 
         total_payed = num_sold[id] * (average_purchase_price_per_crate + average_deposit_per_crate)
         total_deposit_returned = return_values.get(id, zero)
@@ -92,7 +100,7 @@ def analyze_beverage_crates(beverages: dict[str, BeverageCrate], start: datetime
 
 
 def calculate_return_values(
-    num_ordered: dict[BeverageID, list[GrihedInvoiceItem]],
+    num_ordered: dict[BeverageID, list[InvoiceItemRow]],
     num_returned: dict[DepositCategory, Decimal],
     payed_deposits: dict[DepositCategory, Decimal],
     beverage_id_to_deposit_category: dict[BeverageID, DepositCategory]  # This should contain every beverage id
@@ -130,7 +138,7 @@ def calculate_return_values(
 
 
 def num_returned_per_beverage(
-    num_ordered: dict[BeverageID, list[GrihedInvoiceItem]],
+    num_ordered: dict[BeverageID, list[InvoiceItemRow]],
     num_returned: dict[DepositCategory, Decimal],
     payed_deposits: dict[DepositCategory, Decimal],
     beverage_id_to_deposit_category: dict[BeverageID, DepositCategory],
@@ -147,13 +155,13 @@ def num_returned_per_beverage(
     return n / p * num_returned.get(category, zero)
 
 
-def get_actual_num_ordered(num_ordered: dict[BeverageID, list[GrihedInvoiceItem]], b: BeverageID) -> Decimal:
+def get_actual_num_ordered(num_ordered: dict[BeverageID, list[InvoiceItemRow]], b: BeverageID) -> Decimal:
     return Decimal(sum(item.quantity for item in num_ordered.get(b, [])))
 
 
 def sanity_check_return_values(
     return_values: dict[BeverageID, Decimal],
-    num_ordered: dict[BeverageID, list[GrihedInvoiceItem]],
+    num_ordered: dict[BeverageID, list[InvoiceItemRow]],
     num_returned: dict[DepositCategory, Decimal],
     payed_deposits: dict[DepositCategory, Decimal],
     beverage_id_to_deposit_category: dict[BeverageID, DepositCategory]
@@ -181,7 +189,7 @@ def sanity_check_return_values(
 
 def calculate_num_sold(
     inventory: tuple[ShilaInventoryCount, ShilaInventoryCount] | None,
-    num_ordered: DefaultDict[BeverageID, list[GrihedInvoiceItem]],
+    num_ordered: DefaultDict[BeverageID, list[InvoiceItemRow]],
     beverages: dict[str, BeverageCrate]
 ) -> dict[BeverageID, Decimal]:
     num_sold = {}
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import DefaultDict
+
+import numpy as np
+import numpy.typing as npt
+from django.db import transaction
+from django.db.models import Q
+
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, DailyBalance, BalanceBasis, ShilaBookingCategory
+from shila_lager.profiling import profile_stage
+from shila_lager.settings import database_iterator_chunk_size
+from shila_lager.utils import zero, to_date, to_cents
+
+
+def booking_day(booking: ShilaAccountBooking, basis: BalanceBasis) -> date:
+    return booking.booking_date if basis == BalanceBasis.booking_date else booking.actual_booking_date()
+
+
+def refresh_daily_balances(since: date | None = None) -> None:
+    """
+    Recompute the daily balances from `since` on, or all of them without `since`.
+    Has to be called whenever bookings are inserted or deleted, with the earliest booking date or actual booking date that is affected.
+    """
+    with profile_stage("Refresh daily balances"), transaction.atomic():
+        bookings = ShilaAccountBooking.objects.all()
+        if since is not None:
+            # The actual booking date of Grihed bookings is the invoice date, which lies before the booking date
+            bookings = bookings.filter(Q(booking_date__gte=since) | Q(beneficiary_or_payer="GRIHED Service GmbH"))
+
+        relevant_bookings = list(bookings.iterator(chunk_size=database_iterator_chunk_size))
+
+        for basis in BalanceBasis:
+            balance = zero
+            existing = DailyBalance.objects.filter(basis=basis)
+            if since is not None:
+                balance = existing.filter(date__lt=since).order_by("-date").values_list("balance", flat=True).first() or zero
+                existing = existing.filter(date__gte=since)
+            existing.delete()
+
+            net_changes: DefaultDict[date, Decimal] = defaultdict(Decimal)
+            category_sums: DefaultDict[date, DefaultDict[str, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+            for booking in relevant_bookings:
+                day = booking_day(booking, basis)
+                if since is not None and day < since:
+                    continue
+
+                net_changes[day] += booking.amount
+                category_sums[day][booking.category.value] += booking.amount
+
+            rows = []
+            for day in sorted(net_changes):
+                balance += net_changes[day]
+                rows.append(DailyBalance(basis=basis, date=day, net_change=net_changes[day], balance=balance, category_sums={category: str(amount) for category, amount in category_sums[day].items()}))
+
+            DailyBalance.objects.bulk_create(rows)
+
+
+def get_current_balance() -> Decimal:
+    return DailyBalance.objects.filter(basis=BalanceBasis.booking_date).order_by("-date").values_list("balance", flat=True).first() or zero
+
+
+class BalanceHistory:
+    """The daily balances of one basis, to look up the balance at any day without touching the bookings"""
+
+    def __init__(self, balances: list[DailyBalance]) -> None:
+        self.balances = balances
+        self.dates = [it.date for it in balances]
+        # For the plots, which would otherwise convert every balance on their own
+        self.balance_cents = np.array([to_cents(it.balance) for it in balances], dtype=np.int64)
+
+    @classmethod
+    def load(cls, basis: BalanceBasis = BalanceBasis.actual_booking_date) -> BalanceHistory:
+        return cls(list(DailyBalance.objects.filter(basis=basis).order_by("date")))
+
+    def at(self, day: date | datetime) -> Decimal:
+        """The balance at the end of `day`"""
+        i = bisect_right(self.dates, day.date() if isinstance(day, datetime) else day)
+        return self.balances[i - 1].balance if i else zero
+
+    def current(self) -> Decimal:
+        return self.balances[-1].balance if self.balances else zero
+
+    def _index_range(self, start: date | datetime | None, end: date | datetime | None) -> slice:
+        """The days in (start, end], like `utils.filter_by_date`"""
+        start, end = to_date(start), to_date(end)
+        lo = bisect_right(self.dates, start) if start is not None else 0
+        hi = bisect_right(self.dates, end) if end is not None else len(self.dates)
+        return slice(lo, hi)
+
+    def between(self, start: date | datetime | None, end: date | datetime | None) -> list[DailyBalance]:
+        """All days with bookings in (start, end]"""
+        return self.balances[self._index_range(start, end)]
+
+    def cents_between(self, start: date | datetime | None, end: date | datetime | None) -> tuple[list[date], npt.NDArray[np.int64]]:
+        """The days with bookings in (start, end] and the balances at their end in cents"""
+        index_range = self._index_range(start, end)
+        return self.dates[index_range], self.balance_cents[index_range]
+
+    def expenses_per_category(self, start: date | datetime | None, end: date | datetime | None) -> DefaultDict[ShilaBookingCategory, Decimal]:
+        """Same as `weekly_digest.compute_expenses_per_category`, but from the precomputed category sums"""
+        expenses: DefaultDict[ShilaBookingCategory, Decimal] = defaultdict(Decimal)
+        for it in self.between(start, end):
+            for category, amount in it.category_sums.items():
+                expenses[ShilaBookingCategory(category)] -= Decimal(amount)
+
+        return expenses
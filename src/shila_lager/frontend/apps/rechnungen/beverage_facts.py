@@ -1,3 +1,5 @@
+from datetime import datetime
+
 beverage_categories = {
     "Wicküler": ("#ffdb3e", ["B1278"]),
     "Pilsator": ("#fbc72e", ["B1183"]),
@@ -39,3 +41,18 @@ collapse_categories = {
 }
 
 soli_ids = {"E3451", "E3456"}
+
+# Periods in which nothing was sold, as the Shila was closed
+shila_closed_periods = [
+    (datetime(2024, 1, 16), datetime(2024, 2, 18)),
+    (datetime(2023, 12, 23), datetime(2024, 1, 7)),
+    (datetime(2022, 12, 23), datetime(2023, 1, 5)),
+]
+
+semester_breaks = [
+    (datetime(2022, 7, 23), datetime(2022, 10, 17)),
+    (datetime(2023, 2, 18), datetime(2023, 4, 17)),
+    (datetime(2023, 7, 22), datetime(2023, 10, 16)),
+    (datetime(2024, 2, 17), datetime(2024, 4, 15)),
+    # (datetime(2024, 7, 20), datetime(2024, 10, 16)),
+]
@@ -0,0 +1,134 @@
+"""
+Classifies the bookings into `ShilaBookingCategory`s by the `BookingRule`s, which can be edited in the admin.
+
+The rules are compiled once: Rules matching the exact peer are looked up in a dict, all others are combined into one regex per field.
+The combined regex consists of an optional lookahead with a named group per rule, so one match tells which of the rules match anywhere in the field.
+The category is stored in `ShilaAccountBooking.booking_category` when a booking is imported, and only the affected bookings are reclassified when a rule changes.
+"""
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, DefaultDict, Iterable
+
+from django.db import transaction
+from django.db.models import Q, Count, Max
+
+from shila_lager.frontend.apps.rechnungen.balance import refresh_daily_balances
+from shila_lager.frontend.apps.rechnungen.models import BookingRule, BookingRuleField, BookingRuleMatch, ShilaAccountBooking, ShilaBookingCategory
+from shila_lager.settings import database_iterator_chunk_size, logger
+
+# The rules that are created by the migration. They are equivalent to the hard-coded classification of earlier versions.
+default_booking_rules: list[dict[str, Any]] = [
+    *[{"field": "peer", "match": "exact", "pattern": peer, "category": ShilaBookingCategory.beverages.value} for peer in ["GRIHED Service GmbH", "Team Getraenke Lieferdienste TGL GmbH"]],
+    *[{"field": "peer", "match": "exact", "pattern": peer, "category": ShilaBookingCategory.gepa.value} for peer in ["GEPA MBH", "GEPA mbH", "GEPA mbh", "Cafe Libertad Kollektiv eG"]],
+    *[{"field": "peer", "match": "exact", "pattern": peer, "category": ShilaBookingCategory.chocholate.value} for peer in ["PLANT-FOR-THE-PLANET", "THE GOOD SHOP by Stripe via PPRO"]],
+    {"field": "peer", "match": "exact", "pattern": "DM-drogerie markt", "category": ShilaBookingCategory.dm.value},
+    *[{"field": "peer", "match": "exact", "pattern": peer, "category": ShilaBookingCategory.hosting.value} for peer in ["Jonas Pasche", "Hetzner Online GmbH"]],
+
+    *[{"priority": 200, "field": "description", "match": "contains", "pattern": it, "iban": "0000000000", "category": ShilaBookingCategory.sparkasse_fee.value} for it in ["Entgeltabrechnung siehe Anlage ", "Rechnung Berliner Sparkasse Entgelt"]],
+    {"priority": 300, "field": "description", "match": "regex", "pattern": "^SB-EINZAHLUNG", "category": ShilaBookingCategory.sparkasse_income.value},
+    {"priority": 400, "field": "description", "match": "contains", "pattern": "Flaschenpost", "category": ShilaBookingCategory.beverages.value},
+    {"priority": 400, "field": "peer", "match": "contains", "pattern": "flaschenpost", "category": ShilaBookingCategory.beverages.value},
+    *[{"priority": 500, "field": "description", "match": "contains", "pattern": it, "category": ShilaBookingCategory.bringmeister.value} for it in ["Bringmeister", "Metro"]],
+    {"priority": 600, "field": "description", "match": "contains", "pattern": "MV Ausgabe", "category": ShilaBookingCategory.mv_ausgaben.value},
+]
+
+
+class BookingClassifier:
+    def __init__(self, rules: Iterable[BookingRule]) -> None:
+        self.rules = sorted(rules, key=lambda it: (it.priority, it.pk or 0))
+        self.exact_peers: DefaultDict[str, list[int]] = defaultdict(list)
+        self.groups: DefaultDict[BookingRuleField, list[tuple[str, int]]] = defaultdict(list)
+        lookaheads: DefaultDict[BookingRuleField, list[str]] = defaultdict(list)
+        separate: DefaultDict[BookingRuleField, list[tuple[int, re.Pattern[str]]]] = defaultdict(list)
+
+        for i, rule in enumerate(self.rules):
+            if rule.field == BookingRuleField.peer and rule.match == BookingRuleMatch.exact:
+                self.exact_peers[rule.pattern].append(i)
+                continue
+
+            field = BookingRuleField(rule.field)
+            try:
+                separate[field].append((i, re.compile(rule.to_regex(), re.DOTALL)))
+            except re.error as e:
+                # Rules are validated by `BookingRule.clean`, but not if they were created without it
+                logger.error(f"Ignoring the booking rule {rule}: {e}")
+                continue
+
+            self.groups[field].append((f"_rule{i}", i))
+            lookaheads[field].append(rule.to_lookahead(f"_rule{i}"))
+
+        # If the rules can not be combined (see `BookingRule.clean`), every rule is searched on its own
+        self.regexes: dict[BookingRuleField, re.Pattern[str] | None] = {}
+        self.separate_regexes = separate
+        for field in BookingRuleField:
+            try:
+                self.regexes[field] = re.compile("".join(lookaheads[field]), re.DOTALL)
+            except re.error as e:
+                logger.error(f"The {field} booking rules can not be combined into one regex, they are matched one by one: {e}")
+                self.regexes[field] = None
+
+    def _matching_rules(self, field: BookingRuleField, value: str) -> list[int]:
+        regex = self.regexes[field]
+        if regex is None:
+            return [i for i, it in self.separate_regexes[field] if it.search(value)]
+
+        matched = regex.match(value)
+        assert matched is not None  # Every lookahead is optional
+        return [i for name, i in self.groups[field] if matched.group(name) is not None]
+
+    def classify(self, beneficiary_or_payer: str | None, iban: str, description: str) -> ShilaBookingCategory:
+        candidates = self.exact_peers.get(beneficiary_or_payer or "", []) + self._matching_rules(BookingRuleField.peer, beneficiary_or_payer or "") + self._matching_rules(BookingRuleField.description, description)
+        for i in sorted(candidates):
+            if not self.rules[i].iban or self.rules[i].iban == iban:
+                return ShilaBookingCategory(self.rules[i].category)
+
+        return ShilaBookingCategory.other
+
+    def classify_bookings(self, bookings: Iterable[ShilaAccountBooking]) -> None:
+        """Set `booking_category` of the (not yet saved) bookings"""
+        for booking in bookings:
+            booking.booking_category = self.classify(booking.beneficiary_or_payer, booking.iban, booking.description).value
+
+
+default_booking_classifier = BookingClassifier(BookingRule(**it) for it in default_booking_rules)
+
+_classifier: tuple[tuple[int, datetime | None], BookingClassifier] | None = None
+
+
+def get_booking_classifier() -> BookingClassifier:
+    """The classifier of the current rules. It is only compiled again if the rules were changed, also when that happened in another process."""
+    global _classifier
+    version = BookingRule.objects.aggregate(count=Count("id"), updated_at=Max("updated_at"))
+    if _classifier is None or _classifier[0] != (version["count"], version["updated_at"]):
+        _classifier = (version["count"], version["updated_at"]), BookingClassifier(BookingRule.objects.all())
+
+    return _classifier[1]
+
+
+def classify_booking(beneficiary_or_payer: str | None, iban: str, description: str) -> ShilaBookingCategory:
+    return get_booking_classifier().classify(beneficiary_or_payer, iban, description)
+
+
+def reclassify_bookings(condition: Q | None = None) -> list[ShilaAccountBooking]:
+    """
+    Classify the bookings matching `condition` (or all of them) again and store the changed categories.
+    Returns the changed bookings, the statistics and columns have to be refreshed for them (see `imports.reclassify_account_bookings`).
+    """
+    classifier = get_booking_classifier()
+    changed = []
+
+    with transaction.atomic():
+        for booking in ShilaAccountBooking.objects.filter(condition or Q()).iterator(chunk_size=database_iterator_chunk_size):
+            category = classifier.classify(booking.beneficiary_or_payer, booking.iban, booking.description).value
+            if category != booking.booking_category:
+                booking.booking_category = category
+                changed.append(booking)
+
+        ShilaAccountBooking.objects.bulk_update(changed, ["booking_category"], batch_size=1000)
+        if changed:
+            refresh_daily_balances(since=min(min(it.booking_date, it.actual_booking_date()) for it in changed))
+
+    return changed
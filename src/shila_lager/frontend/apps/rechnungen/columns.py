@@ -0,0 +1,311 @@
+"""
+The bookings, invoice items, prices and inventory counts as columns of NumPy arrays in the `columns_dir`, one `.npy` file per column.
+The files are memory-mapped when they are loaded, so the analyses that only need a date and an amount do not create a model instance per row.
+
+Amounts are stored in cents as int64, dates as datetime64[D] and timestamps as datetime64[s] in UTC.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import ClassVar, TypeVar
+
+import numpy as np
+import numpy.typing as npt
+from django.db.models import Model
+from pytz import UTC
+
+from shila_lager.frontend.apps.bestellung.models import GrihedPrice, SalePrice
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, GrihedInvoiceItem, ShilaInventoryCountDetail, ShilaBookingCategory, ShilaBookingKind, BalanceBasis, BookingRow, get_actual_booking_date
+from shila_lager.profiling import profile_stage
+from shila_lager.settings import columns_dir, database_iterator_chunk_size
+from shila_lager.utils import to_date, to_cents, from_cents
+
+Table = TypeVar("Table", bound="ColumnTable")
+
+# The categories and kinds are stored as their index in these lists
+booking_categories = list(ShilaBookingCategory)
+booking_kinds = [ShilaBookingKind(it) for it in ShilaBookingKind.values]
+_booking_category_codes = {it.value: i for i, it in enumerate(booking_categories)}
+_booking_kind_codes = {it: i for i, it in enumerate(ShilaBookingKind.values)}
+
+
+def _to_utc(it: datetime) -> datetime:
+    # NumPy does not support time zones, naive UTC timestamps are stored instead
+    return it.astimezone(UTC).replace(tzinfo=None) if it.tzinfo is not None else it
+
+
+@dataclass
+class ColumnTable(ABC):
+    """A table whose columns are the fields of the dataclass, all with one entry per row. The rows are sorted by `id`, the primary key of the model."""
+    table_name: ClassVar[str]
+    model: ClassVar[type[Model]]
+
+    # Rows of these tables are (almost) never changed after they are imported, so only the rows with a new id are exported.
+    # The other tables are small and always exported completely.
+    append_only: ClassVar[bool] = False
+
+    id: npt.NDArray[np.int64]
+
+    @classmethod
+    def directory(cls) -> Path:
+        return columns_dir / cls.table_name
+
+    @classmethod
+    def exists(cls) -> bool:
+        return all((cls.directory() / f"{it.name}.npy").exists() for it in fields(cls))
+
+    @classmethod
+    def load(cls: type[Table]) -> Table:
+        if not cls.exists():
+            raise FileNotFoundError(f"The columns of {cls.table_name} do not exist in {columns_dir}, run `export-columns` first")
+
+        return cls(**{it.name: np.load(cls.directory() / f"{it.name}.npy", mmap_mode="r") for it in fields(cls)})
+
+    @classmethod
+    @abstractmethod
+    def query(cls: type[Table], after_id: int | None = None) -> Table:
+        """The rows from the database, optionally only those with an id greater than `after_id`"""
+
+    @classmethod
+    def concatenate(cls: type[Table], first: Table, second: Table) -> Table:
+        return cls(**{it.name: np.concatenate([getattr(first, it.name), getattr(second, it.name)]) for it in fields(cls)})
+
+    def save(self) -> None:
+        """Replace the stored columns. They are written into a temporary directory first, so a crash never leaves a table with columns of different lengths."""
+        directory = self.directory()
+        temporary, old = directory.with_name(f".{self.table_name}.tmp"), directory.with_name(f".{self.table_name}.old")
+        shutil.rmtree(temporary, ignore_errors=True)
+        temporary.mkdir(parents=True)
+
+        for it in fields(self):
+            np.save(temporary / f"{it.name}.npy", np.ascontiguousarray(getattr(self, it.name)))
+
+        # Memory-mapped files of the old columns stay valid until they are closed, even after they are deleted
+        if directory.exists():
+            os.replace(directory, old)
+        os.replace(temporary, directory)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+
+@dataclass
+class BookingColumns(ColumnTable):
+    table_name = "bookings"
+    model = ShilaAccountBooking
+    append_only = True
+
+    booking_date: npt.NDArray[np.datetime64]
+    actual_booking_date: npt.NDArray[np.datetime64]  # See `ShilaAccountBooking.actual_booking_date`
+    amount: npt.NDArray[np.int64]
+    category: npt.NDArray[np.int8]  # Index into `booking_categories`
+    kind: npt.NDArray[np.int8]  # Index into `booking_kinds`
+
+    @classmethod
+    def query(cls, after_id: int | None = None) -> BookingColumns:
+        bookings = ShilaAccountBooking.objects.order_by("id")
+        if after_id is not None:
+            bookings = bookings.filter(id__gt=after_id)
+
+        rows = list(bookings.values_list("id", "booking_date", "beneficiary_or_payer", "description", "amount", "booking_category", "kind").iterator(chunk_size=database_iterator_chunk_size))
+        return cls(
+            id=np.array([it[0] for it in rows], dtype=np.int64),
+            booking_date=np.array([it[1] for it in rows], dtype="datetime64[D]"),
+            actual_booking_date=np.array([get_actual_booking_date(it[2], it[3], it[1]) for it in rows], dtype="datetime64[D]"),
+            amount=np.array([to_cents(it[4]) for it in rows], dtype=np.int64),
+            category=np.array([_booking_category_codes[it[5]] for it in rows], dtype=np.int8),
+            kind=np.array([_booking_kind_codes[it[6]] for it in rows], dtype=np.int8),
+        )
+
+    @classmethod
+    def from_rows(cls, rows: list[BookingRow]) -> BookingColumns:
+        """The columns of bookings that are already loaded"""
+        return cls(
+            id=np.array([it.id for it in rows], dtype=np.int64),
+            booking_date=np.array([it.booking_date for it in rows], dtype="datetime64[D]"),
+            actual_booking_date=np.array([it.actual_booking_date for it in rows], dtype="datetime64[D]"),
+            amount=np.array([to_cents(it.amount) for it in rows], dtype=np.int64),
+            category=np.array([_booking_category_codes[it.category.value] for it in rows], dtype=np.int8),
+            kind=np.array([_booking_kind_codes[it.kind] for it in rows], dtype=np.int8),
+        )
+
+    def between(self, start: date | datetime | None, end: date | datetime | None, basis: BalanceBasis = BalanceBasis.actual_booking_date) -> npt.NDArray[np.bool_]:
+        """The mask of the bookings in (start, end], the same range as `filter_by_date` uses for dates"""
+        dates = self.actual_booking_date if basis == BalanceBasis.actual_booking_date else self.booking_date
+        start, end = to_date(start), to_date(end)
+
+        mask = np.ones(len(self), dtype=np.bool_)
+        if start is not None:
+            mask &= dates > np.datetime64(start, "D")
+        if end is not None:
+            mask &= dates <= np.datetime64(end, "D")
+
+        return mask
+
+    def total(self, mask: npt.NDArray[np.bool_]) -> Decimal:
+        return from_cents(self.amount[mask].sum())
+
+    def total_per_category(self, mask: npt.NDArray[np.bool_]) -> dict[ShilaBookingCategory, Decimal]:
+        """The sums of the categories that have bookings in the mask"""
+        categories, amounts = self.category[mask], self.amount[mask]
+
+        # The sums are computed in integers, so they are exact like the sums of the `Decimal` amounts
+        sums = np.zeros(len(booking_categories), dtype=np.int64)
+        np.add.at(sums, categories, amounts)
+        counts = np.bincount(categories, minlength=len(booking_categories))
+
+        return {category: from_cents(sums[i]) for i, category in enumerate(booking_categories) if counts[i]}
+
+
+@dataclass
+class InvoiceItemColumns(ColumnTable):
+    table_name = "invoice_items"
+    model = GrihedInvoiceItem
+    append_only = True
+
+    invoice_number: npt.NDArray[np.str_]
+    invoice_date: npt.NDArray[np.datetime64]
+    beverage_id: npt.NDArray[np.str_]
+    quantity: npt.NDArray[np.int64]
+    total_price: npt.NDArray[np.int64]
+    purchase_price_id: npt.NDArray[np.int64]  # See `GrihedPriceColumns`
+    sale_price_id: npt.NDArray[np.int64]  # See `SalePriceColumns`
+
+    @classmethod
+    def query(cls, after_id: int | None = None) -> InvoiceItemColumns:
+        items = GrihedInvoiceItem.objects.order_by("id")
+        if after_id is not None:
+            items = items.filter(id__gt=after_id)
+
+        rows = list(items.values_list("id", "invoice_id", "invoice__date", "beverage_id", "quantity", "total_price", "purchase_price_id", "sale_price_id").iterator(chunk_size=database_iterator_chunk_size))
+        return cls(
+            id=np.array([it[0] for it in rows], dtype=np.int64),
+            invoice_number=np.array([it[1] for it in rows], dtype=np.str_),
+            invoice_date=np.array([it[2] for it in rows], dtype="datetime64[D]"),
+            beverage_id=np.array([it[3] for it in rows], dtype=np.str_),
+            quantity=np.array([it[4] for it in rows], dtype=np.int64),
+            total_price=np.array([to_cents(it[5]) for it in rows], dtype=np.int64),
+            purchase_price_id=np.array([it[6] for it in rows], dtype=np.int64),
+            sale_price_id=np.array([it[7] for it in rows], dtype=np.int64),
+        )
+
+
+@dataclass
+class GrihedPriceColumns(ColumnTable):
+    table_name = "grihed_prices"
+    model = GrihedPrice
+
+    crate_id: npt.NDArray[np.str_]
+    price: npt.NDArray[np.float64]  # In euros, some prices (Soli) are fractions of a cent
+    deposit: npt.NDArray[np.int64]
+    valid_from: npt.NDArray[np.datetime64]
+
+    @classmethod
+    def query(cls, after_id: int | None = None) -> GrihedPriceColumns:
+        rows = list(GrihedPrice.objects.order_by("id").values_list("id", "crate_id", "price", "deposit", "valid_from"))
+        return cls(
+            id=np.array([it[0] for it in rows], dtype=np.int64),
+            crate_id=np.array([it[1] for it in rows], dtype=np.str_),
+            price=np.array([it[2] for it in rows], dtype=np.float64),
+            deposit=np.array([to_cents(it[3]) for it in rows], dtype=np.int64),
+            valid_from=np.array([_to_utc(it[4]) for it in rows], dtype="datetime64[s]"),
+        )
+
+
+@dataclass
+class SalePriceColumns(ColumnTable):
+    table_name = "sale_prices"
+    model = SalePrice
+
+    crate_id: npt.NDArray[np.str_]
+    price: npt.NDArray[np.int64]
+    valid_from: npt.NDArray[np.datetime64]
+
+    @classmethod
+    def query(cls, after_id: int | None = None) -> SalePriceColumns:
+        rows = list(SalePrice.objects.order_by("id").values_list("id", "crate_id", "price", "valid_from"))
+        return cls(
+            id=np.array([it[0] for it in rows], dtype=np.int64),
+            crate_id=np.array([it[1] for it in rows], dtype=np.str_),
+            price=np.array([to_cents(it[2]) for it in rows], dtype=np.int64),
+            valid_from=np.array([_to_utc(it[3]) for it in rows], dtype="datetime64[s]"),
+        )
+
+
+@dataclass
+class InventoryCountColumns(ColumnTable):
+    """The details of the inventory counts, one row per counted crate"""
+    table_name = "inventory_counts"
+    model = ShilaInventoryCountDetail
+
+    date: npt.NDArray[np.datetime64]
+    crate_id: npt.NDArray[np.str_]
+    count: npt.NDArray[np.float64]
+
+    @classmethod
+    def query(cls, after_id: int | None = None) -> InventoryCountColumns:
+        rows = list(ShilaInventoryCountDetail.objects.order_by("id").values_list("id", "date_id", "crate_id", "count"))
+        return cls(
+            id=np.array([it[0] for it in rows], dtype=np.int64),
+            date=np.array([_to_utc(it[1]) for it in rows], dtype="datetime64[s]"),
+            crate_id=np.array([it[2] for it in rows], dtype=np.str_),
+            count=np.array([it[3] for it in rows], dtype=np.float64),
+        )
+
+
+column_tables: list[type[ColumnTable]] = [BookingColumns, InvoiceItemColumns, GrihedPriceColumns, SalePriceColumns, InventoryCountColumns]
+
+
+def _read_manifest() -> dict[str, dict[str, int]]:
+    try:
+        with open(columns_dir / "manifest.json") as f:
+            manifest: dict[str, dict[str, int]] = json.load(f)
+            return manifest
+    except FileNotFoundError:
+        return {}
+
+
+def export_columns(full: bool = False) -> dict[str, int]:
+    """
+    Write the columns of all tables, returns the number of rows per table.
+    Only the new rows of the append only tables are queried, unless `full` is set or rows were deleted since the last export.
+    Changed rows are not detected, after changing existing rows (e.g. reclassifying bookings) the columns have to be exported with `full`.
+    """
+    manifest = _read_manifest()
+
+    for table in column_tables:
+        with profile_stage(f"Export {table.table_name}"):
+            state = manifest.get(table.table_name)
+            is_incremental = not full and table.append_only and state is not None and table.exists() and table.model._default_manager.filter(pk__lte=state["last_id"]).count() == state["rows"]
+
+            if not is_incremental:
+                rows = table.query()
+            else:
+                assert state is not None
+                new_rows = table.query(after_id=state["last_id"])
+                if not len(new_rows):
+                    continue
+
+                rows = table.concatenate(table.load(), new_rows)
+
+            rows.save()
+            manifest[table.table_name] = {"rows": len(rows), "last_id": int(rows.id[-1]) if len(rows) else 0}
+
+    with open(columns_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    return {name: it["rows"] for name, it in manifest.items()}
+
+
+def refresh_columns() -> None:
+    """Export the new rows after an import, but only if the columns are used (were exported before)"""
+    if columns_dir.exists():
+        export_columns()
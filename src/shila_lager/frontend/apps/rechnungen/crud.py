@@ -3,16 +3,18 @@ from __future__ import annotations
 from collections import defaultdict
 from datetime import datetime
 from decimal import Decimal
+from typing import DefaultDict
 
 import pytz
+from django.db.models import Sum, F, DecimalField, QuerySet
 from math import isclose
 
 from shila_lager.frontend.apps.bestellung.crud import create_grihed_price, create_beverage_crate
 from shila_lager.frontend.apps.bestellung.models import BottleType, GrihedPrice, SalePrice, BeverageCrate
 from shila_lager.frontend.apps.rechnungen.beverage_facts import soli_ids
-from shila_lager.frontend.apps.rechnungen.models import GrihedInvoice, GrihedInvoiceItem, ShilaAccountBooking, ShilaInventoryCount
-from shila_lager.settings import logger
-from shila_lager.utils import german_price_to_decimal
+from shila_lager.frontend.apps.rechnungen.models import GrihedInvoice, GrihedInvoiceItem, ShilaAccountBooking, ShilaInventoryCount, ShilaBookingCategory, BookingRow, InvoiceItemRow, InvoiceRow, get_actual_booking_date
+from shila_lager.settings import logger, database_iterator_chunk_size
+from shila_lager.utils import german_price_to_decimal, BeverageID
 
 sale_price_translation = {
     ("B0991", "Allgäuer Büble Edelbräu"): 1.5 * 20,
@@ -207,9 +209,96 @@ def get_grihed_invoices() -> set[GrihedInvoice]:
     return set(GrihedInvoice.objects.all())
 
 
+def get_grihed_invoices_between(start: datetime | None, end: datetime | None) -> list[GrihedInvoice]:
+    """Both `start` and `end` are inclusive. The filtering and sorting is done by the database."""
+    invoices = GrihedInvoice.objects.order_by("date")
+    if start is not None:
+        invoices = invoices.filter(date__gte=start.date())
+    if end is not None:
+        invoices = invoices.filter(date__lte=end.date())
+
+    return list(invoices)
+
+
 def get_shila_account_bookings() -> set[ShilaAccountBooking]:
-    return set(ShilaAccountBooking.objects.all())
+    # The bookings table is by far the largest one. Streaming it uses a server-side cursor on PostgreSQL instead of loading everything into the driver at once.
+    return set(ShilaAccountBooking.objects.all().iterator(chunk_size=database_iterator_chunk_size))
+
+
+def get_sorted_shila_account_bookings() -> list[ShilaAccountBooking]:
+    return list(ShilaAccountBooking.objects.order_by("booking_date", "id").iterator(chunk_size=database_iterator_chunk_size))
+
+
+def get_booking_rows(only_grihed: bool = False) -> list[BookingRow]:
+    """The bookings sorted by date, optionally only those of the Grihed invoices (which are matched to the invoices by their description)"""
+    bookings = ShilaAccountBooking.objects.order_by("booking_date", "id")
+    if only_grihed:
+        bookings = bookings.filter(beneficiary_or_payer="GRIHED Service GmbH")
+
+    return [
+        BookingRow(id, booking_date, get_actual_booking_date(beneficiary_or_payer, description, booking_date), kind, beneficiary_or_payer, description, amount, ShilaBookingCategory(category))
+        for id, booking_date, kind, beneficiary_or_payer, description, amount, category
+        in bookings.values_list("id", "booking_date", "kind", "beneficiary_or_payer", "description", "amount", "booking_category").iterator(chunk_size=database_iterator_chunk_size)
+    ]
+
+
+def _get_invoice_item_rows(items: QuerySet[GrihedInvoiceItem]) -> list[InvoiceItemRow]:
+    return [
+        InvoiceItemRow(*row) for row in items.values_list(
+            "invoice_id", "invoice__date", "beverage_id", "beverage__name", "beverage__bottle_type", "quantity", "total_price", "purchase_price__price", "purchase_price__deposit", "sale_price__price",
+        ).iterator(chunk_size=database_iterator_chunk_size)
+    ]
+
+
+def get_invoice_rows_between(start: datetime | None, end: datetime | None) -> list[InvoiceRow]:
+    """Same as `get_grihed_invoices_between`, with the items of every invoice. Only two queries are made."""
+    invoices, items = GrihedInvoice.objects.order_by("date", "invoice_number"), GrihedInvoiceItem.objects.order_by("id")
+    if start is not None:
+        invoices, items = invoices.filter(date__gte=start.date()), items.filter(invoice__date__gte=start.date())
+    if end is not None:
+        invoices, items = invoices.filter(date__lte=end.date()), items.filter(invoice__date__lte=end.date())
+
+    items_by_invoice: DefaultDict[str, list[InvoiceItemRow]] = defaultdict(list)
+    for item in _get_invoice_item_rows(items):
+        items_by_invoice[item.invoice_number].append(item)
+
+    return [InvoiceRow(number, date, total_price, items_by_invoice[number]) for number, date, total_price in invoices.values_list("invoice_number", "date", "total_price")]
+
+
+def get_invoice_item_rows_by_beverage() -> DefaultDict[BeverageID, list[InvoiceItemRow]]:
+    """All invoice items grouped by their beverage"""
+    items_by_beverage: DefaultDict[BeverageID, list[InvoiceItemRow]] = defaultdict(list)
+    for item in _get_invoice_item_rows(GrihedInvoiceItem.objects.order_by("id")):
+        items_by_beverage[item.beverage_id].append(item)
+
+    return items_by_beverage
 
 
 def get_inventory_counts() -> set[ShilaInventoryCount]:
     return set(ShilaInventoryCount.objects.all())
+
+
+def get_inventory_counts_between(start: datetime | None, end: datetime | None) -> list[ShilaInventoryCount]:
+    """Both `start` and `end` are inclusive. The counts are sorted by date, their details and crates are prefetched."""
+    counts = ShilaInventoryCount.objects.order_by("date").prefetch_related("details__crate")
+    if start is not None:
+        counts = counts.filter(date__gte=start)
+    if end is not None:
+        counts = counts.filter(date__lte=end)
+
+    return list(counts)
+
+
+def get_last_inventory_count(end: datetime | None = None) -> ShilaInventoryCount | None:
+    """The newest count until `end` (inclusive), with its details prefetched"""
+    counts = ShilaInventoryCount.objects.order_by("date").prefetch_related("details")
+    if end is not None:
+        counts = counts.filter(date__lte=end)
+
+    return counts.last()
+
+
+def get_invoice_calculated_total_price(invoice: GrihedInvoice) -> Decimal:
+    """The sum of `GrihedInvoiceItem.calculated_total_price` over all items of the invoice, computed by the database."""
+    total = invoice.items.aggregate(total=Sum((F("purchase_price__price") + F("purchase_price__deposit")) * F("quantity"), output_field=DecimalField()))["total"]
+    return Decimal(total or 0)
@@ -0,0 +1,134 @@
+"""
+Demand forecasting for the order suggestions.
+
+The consumption of a crate between two consecutive inventory counts is `old - new + ordered` (see `analyze.calculate_num_sold`).
+Divided by the number of days the Shila was open, this gives a daily rate which is smoothed with an exponentially weighted moving average.
+Semester and semester break are tracked as separate rates, as the demand differs drastically.
+As the inventory is counted (and ordered) weekly, every window contains each weekday once, so weekday effects cancel out and are not modelled separately.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_CEILING
+from itertools import pairwise
+from typing import DefaultDict
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate, BottleType
+from shila_lager.frontend.apps.rechnungen.beverage_facts import shila_closed_periods, semester_breaks
+from shila_lager.frontend.apps.rechnungen.models import CrateDemandForecast, GrihedInvoiceItem, ShilaInventoryCount, ShilaInventoryCountDetail
+from shila_lager.profiling import profile_stage
+from shila_lager.utils import BeverageID, zero, to_date
+
+smoothing_factor = Decimal("0.3")
+safety_factor = Decimal("1.25")
+order_interval = timedelta(days=7)
+
+
+def _is_in(day: date, periods: list[tuple[datetime, datetime]]) -> bool:
+    return any(start.date() <= day <= end.date() for start, end in periods)
+
+
+def open_days(start: date, end: date) -> tuple[int, int]:
+    """The number of days in (start, end] the Shila was open, split into (semester days, semester break days)"""
+    semester_days, break_days = 0, 0
+    for offset in range(1, (end - start).days + 1):
+        day = start + timedelta(days=offset)
+        if _is_in(day, shila_closed_periods):
+            continue
+
+        if _is_in(day, semester_breaks):
+            break_days += 1
+        else:
+            semester_days += 1
+
+    return semester_days, break_days
+
+
+def _ewma(previous: Decimal | None, value: Decimal) -> Decimal:
+    return value if previous is None else smoothing_factor * value + (1 - smoothing_factor) * previous
+
+
+@dataclass
+class DemandState:
+    semester_rate: Decimal | None = None
+    break_rate: Decimal | None = None
+
+    def update(self, consumption: Decimal, semester_days: int, break_days: int) -> None:
+        if semester_days + break_days == 0:
+            return
+
+        # Negative consumption only happens for miscounts, which should not drag the forecast down
+        rate = max(zero, consumption) / (semester_days + break_days)
+        if semester_days >= break_days:
+            self.semester_rate = _ewma(self.semester_rate, rate)
+        else:
+            self.break_rate = _ewma(self.break_rate, rate)
+
+    def target_stock(self, start: date) -> Decimal:
+        """The expected consumption until the next order, with some safety margin"""
+        semester_rate = self.semester_rate if self.semester_rate is not None else self.break_rate or zero
+        break_rate = self.break_rate if self.break_rate is not None else semester_rate
+
+        semester_days, break_days = open_days(start, start + order_interval)
+        expected = semester_rate * semester_days + break_rate * break_days
+
+        return (expected * safety_factor).to_integral_value(ROUND_CEILING)
+
+
+def refresh_demand_forecasts(since: date | datetime | None = None) -> None:
+    """
+    Fold all inventory counts that are newer than the cached forecasts into them.
+    If counts or invoices up to the newest included count were imported (`since`), the forecasts are rebuilt from scratch.
+    """
+    forecasts = {it.crate_id: it for it in CrateDemandForecast.objects.all()}
+    last_count_date = min((it.last_count_date for it in forecasts.values()), default=None)
+
+    # Compared by day, as invoices only have a date
+    since_day = to_date(since)
+    if last_count_date is not None and since_day is not None and since_day <= last_count_date.date():
+        forecasts, last_count_date = {}, None
+
+    with profile_stage("Refresh demand forecasts"):
+        counts = ShilaInventoryCount.objects.order_by("date")
+        if last_count_date is not None:
+            counts = counts.filter(date__gte=last_count_date)
+
+        count_dates = list(counts.values_list("date", flat=True))
+        if len(count_dates) < 2:
+            return
+
+        inventory: DefaultDict[datetime, dict[BeverageID, Decimal]] = defaultdict(dict)
+        for count_date, crate_id, count in ShilaInventoryCountDetail.objects.filter(date__in=count_dates).values_list("date_id", "crate_id", "count"):
+            inventory[count_date][crate_id] = count
+
+        # Invoices are attributed to the window (old, new] they were delivered in
+        window_ends = [it.date() for it in count_dates]
+        ordered: DefaultDict[int, DefaultDict[BeverageID, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+        items = GrihedInvoiceItem.objects.filter(invoice__date__gt=window_ends[0], invoice__date__lte=window_ends[-1]).values_list("invoice__date", "beverage_id", "quantity")
+        for invoice_date, crate_id, quantity in items:
+            ordered[bisect_left(window_ends, invoice_date) - 1][crate_id] += quantity
+
+        orderable_types = [it for it in BottleType if it.is_bottle]
+        crate_ids = list(BeverageCrate.objects.filter(bottle_type__in=orderable_types).values_list("id", flat=True))
+        states = {id: DemandState(it.semester_rate, it.break_rate) if (it := forecasts.get(id)) is not None else DemandState() for id in crate_ids}
+
+        for i, (old, new) in enumerate(pairwise(count_dates)):
+            semester_days, break_days = open_days(old.date(), new.date())
+            old_inventory, new_inventory, window_ordered = inventory[old], inventory[new], ordered[i]
+
+            for id, state in states.items():
+                consumption = old_inventory.get(id, zero) - new_inventory.get(id, zero) + window_ordered.get(id, zero)
+                state.update(consumption, semester_days, break_days)
+
+        newest = count_dates[-1]
+        CrateDemandForecast.objects.bulk_create(
+            [CrateDemandForecast(crate_id=id, semester_rate=state.semester_rate, break_rate=state.break_rate, target_stock=state.target_stock(newest.date()), last_count_date=newest) for id, state in states.items()],
+            update_conflicts=True, unique_fields=["crate"], update_fields=["semester_rate", "break_rate", "target_stock", "last_count_date"],
+        )
+
+
+def get_target_stocks() -> dict[BeverageID, Decimal]:
+    return dict(CrateDemandForecast.objects.values_list("crate_id", "target_stock"))
@@ -0,0 +1,81 @@
+"""
+The imports of the files in the `manual_upload_dir`, including everything that has to be refreshed afterward.
+Used by the `import-*` commands and the background jobs of uploaded files.
+`watch` passes the `paths` of the files that arrived, all other callers import the whole directory.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from django.db.models import Q
+
+from shila_lager.frontend.apps.bestellung.orders import bump_catalogue_version
+from shila_lager.frontend.apps.rechnungen.classification import reclassify_bookings
+from shila_lager.frontend.apps.rechnungen.columns import refresh_columns, export_columns
+from shila_lager.frontend.apps.rechnungen.forecast import refresh_demand_forecasts
+from shila_lager.frontend.apps.rechnungen.parser.grihed_pdf_parser import import_all_grihed_pdfs
+from shila_lager.frontend.apps.rechnungen.parser.inventory_counts_parser import import_lager_counts
+from shila_lager.frontend.apps.rechnungen.parser.sparkasse_csv_parser import import_bookings
+from shila_lager.frontend.apps.rechnungen.timeline import discard_inventory_timeline
+from shila_lager.frontend.apps.stats.materialize import refresh_statistics
+from shila_lager.settings import columns_dir
+
+
+def _to_paths(paths: list[str] | None) -> list[Path] | None:
+    # The job arguments are stored as JSON
+    return [Path(it) for it in paths] if paths is not None else None
+
+
+def import_invoices(paths: list[str] | None = None) -> dict[str, Any]:
+    invoices = import_all_grihed_pdfs(_to_paths(paths))
+    refresh_statistics(since=min((it.date for it in invoices), default=None))
+    if invoices:
+        # The delivered crates are part of the consumption of their count window, which changes the forecasts and the cached order table
+        refresh_demand_forecasts(since=min(it.date for it in invoices))
+        bump_catalogue_version()
+    if invoices:
+        discard_inventory_timeline()
+    refresh_columns()
+
+    return {"imported": [it.invoice_number for it in invoices]}
+
+
+def import_account_bookings(paths: list[str] | None = None) -> dict[str, Any]:
+    bookings = import_bookings(_to_paths(paths))
+    refresh_statistics(since=min((it.actual_booking_date() for it in bookings), default=None))
+    refresh_columns()
+
+    return {"imported": len(bookings)}
+
+
+def import_inventory_counts(paths: list[str] | None = None) -> dict[str, Any]:
+    counts = import_lager_counts(_to_paths(paths))
+    refresh_statistics(since=min((it.date for it in counts), default=None))
+    if counts:
+        discard_inventory_timeline()
+    refresh_columns()
+
+    return {"imported": [it.date.isoformat() for it in counts]}
+
+
+def refresh_after_inventory_count_change(since: datetime) -> None:
+    """Called when counts from `since` on are changed or deleted in the admin, refreshes what an import of these counts would"""
+    refresh_statistics(since=since)
+    refresh_demand_forecasts(since=since)
+    discard_inventory_timeline()
+    bump_catalogue_version()
+    refresh_columns()
+
+
+def reclassify_account_bookings(condition: Q | None = None) -> dict[str, Any]:
+    """Called when the `BookingRule`s change, with the bookings the changed rules can match (or all bookings)"""
+    bookings = reclassify_bookings(condition)
+    if bookings:
+        refresh_statistics(since=min(it.actual_booking_date() for it in bookings))
+        if columns_dir.exists():
+            # The categories of existing rows changed, which the incremental export does not notice
+            export_columns(full=True)
+
+    return {"reclassified": len(bookings)}
@@ -0,0 +1,17 @@
+from typing import Any
+
+from shila_lager.frontend.apps.rechnungen.columns import export_columns
+from shila_lager.profiling import ProfiledCommand
+from shila_lager.settings import logger, columns_dir
+
+
+class Command(ProfiledCommand):
+    help = 'Export the bookings, invoice items, prices and inventory counts as memory-mappable columns (used by `mv-abrechnung --columnar`)'
+
+    def add_arguments(self, parser: Any) -> None:
+        super().add_arguments(parser)
+        parser.add_argument('--full', action='store_true', help='Export all rows instead of only the new ones, needed after existing rows were changed')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        rows = export_columns(full=options["full"])
+        logger.info(f"Exported the columns to {columns_dir}: " + ", ".join(f"{count} {table}" for table, count in rows.items()))
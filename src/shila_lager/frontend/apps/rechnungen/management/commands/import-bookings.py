@@ -1,12 +1,11 @@
 from typing import Any
 
-from django.core.management import BaseCommand
+from shila_lager.frontend.apps.rechnungen.imports import import_account_bookings
+from shila_lager.profiling import ProfiledCommand
 
-from shila_lager.frontend.apps.rechnungen.parser.sparkasse_csv_parser import import_bookings
 
-
-class Command(BaseCommand):
+class Command(ProfiledCommand):
     help = 'Import sale prices'
 
     def handle(self, *args: Any, **options: Any) -> None:
-        import_bookings()
+        import_account_bookings()
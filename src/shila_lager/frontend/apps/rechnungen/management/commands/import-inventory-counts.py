@@ -1,12 +1,11 @@
 from typing import Any
 
-from django.core.management import BaseCommand
+from shila_lager.frontend.apps.rechnungen.imports import import_inventory_counts
+from shila_lager.profiling import ProfiledCommand
 
-from shila_lager.frontend.apps.rechnungen.parser.inventory_counts_parser import import_lager_counts
 
-
-class Command(BaseCommand):
+class Command(ProfiledCommand):
     help = 'Import Lagerzählungen'
 
     def handle(self, *args: Any, **options: Any) -> None:
-        import_lager_counts()
+        import_inventory_counts()
@@ -1,12 +1,11 @@
 from typing import Any
 
-from django.core.management import BaseCommand
+from shila_lager.frontend.apps.rechnungen.imports import import_invoices
+from shila_lager.profiling import ProfiledCommand
 
-from shila_lager.frontend.apps.rechnungen.parser.grihed_pdf_parser import import_all_grihed_pdfs
 
-
-class Command(BaseCommand):
+class Command(ProfiledCommand):
     help = 'Analyze PDFs'
 
     def handle(self, *args: Any, **options: Any) -> None:
-        import_all_grihed_pdfs()
+        import_invoices()
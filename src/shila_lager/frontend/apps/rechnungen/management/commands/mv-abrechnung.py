@@ -1,18 +1,22 @@
 from typing import Any
 
 from dateutil.parser import parse as parse_datetime
-from django.core.management import BaseCommand
 
 from shila_lager.frontend.apps.rechnungen.mv_abrechnung.main import mv_abrechnung_main
+from shila_lager.frontend.apps.rechnungen.report import ReportFormat
+from shila_lager.profiling import ProfiledCommand
 
 
-class Command(BaseCommand):
+class Command(ProfiledCommand):
     help = 'Analyze PDFs'
 
     def add_arguments(self, parser: Any) -> None:
+        super().add_arguments(parser)
         # Add --start and --end with datetime objects
         parser.add_argument('--start', type=parse_datetime, help='Start date (inclusive)')
         parser.add_argument('--end', type=parse_datetime, help='End date (exclusive)')
+        parser.add_argument('--columnar', action='store_true', help='Sum the bookings from the exported columns instead of loading every booking (see `export-columns`)')
+        parser.add_argument('--format', choices=[it.value for it in ReportFormat], default=ReportFormat.text.value, help='Write the values as JSON or CSV instead of printing them and creating the plots')
 
     def handle(self, *args: Any, **options: Any) -> None:
-        mv_abrechnung_main(options.get("start"), options.get("end"))
+        mv_abrechnung_main(options.get("start"), options.get("end"), columnar=options["columnar"], output_format=ReportFormat(options["format"]))
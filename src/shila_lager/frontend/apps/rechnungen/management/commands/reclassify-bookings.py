@@ -0,0 +1,13 @@
+from typing import Any
+
+from shila_lager.frontend.apps.rechnungen.imports import reclassify_account_bookings
+from shila_lager.profiling import ProfiledCommand
+from shila_lager.settings import logger
+
+
+class Command(ProfiledCommand):
+    help = 'Classify all bookings again by the current booking rules, only needed if the rules were changed outside of the admin'
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        result = reclassify_account_bookings()
+        logger.info(f"Reclassified {result['reclassified']} bookings")
@@ -1,29 +1,34 @@
 from typing import Any
 
-from django.core.management import BaseCommand
-
 from shila_lager.frontend.apps.rechnungen.parser.grihed_pdf_parser import import_all_grihed_pdfs
 from shila_lager.frontend.apps.rechnungen.parser.inventory_counts_parser import import_lager_counts
 from shila_lager.frontend.apps.rechnungen.parser.sparkasse_csv_parser import import_bookings
+from shila_lager.frontend.apps.rechnungen.report import ReportFormat
 from shila_lager.frontend.apps.rechnungen.weekly_digest import weekly_digest
+from shila_lager.profiling import ProfiledCommand, profile_stage
 from shila_lager.settings import logger
 from shila_lager.utils import parse_and_localize_date
 
 
-class Command(BaseCommand):
+class Command(ProfiledCommand):
     help = 'Weekly digest'
 
     def add_arguments(self, parser: Any) -> None:
+        super().add_arguments(parser)
         # Add --start and --end with datetime objects
         parser.add_argument('--start', type=parse_and_localize_date, help='Start date (inclusive)')
         parser.add_argument('--end', type=parse_and_localize_date, help='End date (exclusive)')
+        parser.add_argument('--format', choices=[it.value for it in ReportFormat], default=ReportFormat.text.value, help='Write every window as a JSON line or as CSV rows instead of the coloured text')
 
     def handle(self, *args: Any, **options: Any) -> None:
         logger.info("Starting to import pdfs...")
         # import_all_grihed_pdfs()
         logger.info("Starting to import bookings...")
-        import_bookings()
+        with profile_stage("Import bookings"):
+            import_bookings()
+
         logger.info("Starting to import lager counts...")
-        import_lager_counts()
+        with profile_stage("Import lager counts"):
+            import_lager_counts()
 
-        weekly_digest(options.get("start"), options.get("end"))
+        weekly_digest(options.get("start"), options.get("end"), ReportFormat(options["format"]))
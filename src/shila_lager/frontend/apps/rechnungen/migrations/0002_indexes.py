@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-19 13:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bestellung', '0001_initial'),
+        ('rechnungen', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='grihedinvoiceitem',
+            name='beverage',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.RESTRICT, related_name='invoice_items', to='bestellung.beveragecrate'),
+        ),
+        migrations.AddIndex(
+            model_name='grihedinvoice',
+            index=models.Index(fields=['date'], name='grihed_invoice_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grihedinvoiceitem',
+            index=models.Index(fields=['beverage', 'invoice'], name='grihed_item_beverage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shilaaccountbooking',
+            index=models.Index(fields=['booking_date', 'id'], name='booking_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shilaaccountbooking',
+            index=models.Index(fields=['beneficiary_or_payer', 'booking_date'], name='booking_peer_date_idx'),
+        ),
+    ]
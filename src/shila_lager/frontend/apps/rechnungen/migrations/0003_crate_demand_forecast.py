@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-19 13:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bestellung', '0001_initial'),
+        ('rechnungen', '0002_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrateDemandForecast',
+            fields=[
+                ('crate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='demand_forecast', serialize=False, to='bestellung.beveragecrate')),
+                ('semester_rate', models.DecimalField(decimal_places=4, max_digits=16, null=True)),
+                ('break_rate', models.DecimalField(decimal_places=4, max_digits=16, null=True)),
+                ('target_stock', models.DecimalField(decimal_places=4, max_digits=16)),
+                ('last_count_date', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Crate Demand Forecasts',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-19 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rechnungen', '0003_crate_demand_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('basis', models.CharField(choices=[('booking_date', 'Booking Date'), ('actual_booking_date', 'Actual Booking Date')], max_length=32)),
+                ('date', models.DateField()),
+                ('net_change', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('category_sums', models.JSONField()),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Balances',
+                'unique_together': {('basis', 'date')},
+            },
+        ),
+    ]
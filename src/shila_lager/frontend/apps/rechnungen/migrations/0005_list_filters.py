@@ -0,0 +1,78 @@
+# Generated by Django 5.0.14 on 2026-10-19 13:56
+
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def classify_booking(beneficiary_or_payer: str | None, iban: str, description: str) -> str:
+    # A copy of the classification at the time of this migration, the app code may change
+    match beneficiary_or_payer:
+        case "GRIHED Service GmbH" | "Team Getraenke Lieferdienste TGL GmbH":
+            return "Getränke"
+        case "GEPA MBH" | "GEPA mbH" | "GEPA mbh" | "Cafe Libertad Kollektiv eG":
+            return "GEPA"
+        case "PLANT-FOR-THE-PLANET" | "THE GOOD SHOP by Stripe via PPRO":
+            return "Schokolade"
+        case "DM-drogerie markt":
+            return "DM"
+        case "Jonas Pasche" | "Hetzner Online GmbH":
+            return "Hosting"
+        case _:
+            if iban == "0000000000" and (
+                "Entgeltabrechnung siehe Anlage " in description or "Rechnung Berliner Sparkasse Entgelt" in description
+            ):
+                return "Sparkasse Gebühr"
+
+            if description.startswith("SB-EINZAHLUNG"):
+                return "Sparkasse Einzahlung"
+            if "Flaschenpost" in description or beneficiary_or_payer is not None and "flaschenpost" in beneficiary_or_payer:
+                return "Getränke"
+            if "Bringmeister" in description or "Metro" in description:
+                return "Bringmeister"
+
+            if "MV Ausgabe" in description:
+                return "MV Haushalt"
+
+            return "Sonstige"
+
+
+def classify_existing_bookings(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    ShilaAccountBooking = apps.get_model('rechnungen', 'ShilaAccountBooking')
+    bookings = list(ShilaAccountBooking.objects.all())
+    for booking in bookings:
+        booking.booking_category = classify_booking(booking.beneficiary_or_payer, booking.iban, booking.description)
+
+    ShilaAccountBooking.objects.bulk_update(bookings, ['booking_category'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rechnungen', '0004_daily_balance'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='grihedinvoice',
+            name='grihed_invoice_date_idx',
+        ),
+        migrations.AddField(
+            model_name='shilaaccountbooking',
+            name='booking_category',
+            field=models.CharField(choices=[('Getränke', 'Getränke'), ('GEPA', 'GEPA'), ('Bringmeister', 'Bringmeister'), ('Schokolade', 'Schokolade'), ('DM', 'DM'), ('Hosting', 'Hosting'), ('Sparkasse Gebühr', 'Sparkasse Gebühr'), ('MV Haushalt', 'MV Haushalt'), ('Sonstige', 'Sonstige'), ('Sparkasse Einzahlung', 'Sparkasse Einzahlung')], default='Sonstige', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='grihedinvoice',
+            index=models.Index(fields=['date', 'invoice_number'], name='grihed_invoice_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shilaaccountbooking',
+            index=models.Index(fields=['booking_category', 'booking_date', 'id'], name='booking_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shilaaccountbooking',
+            index=models.Index(fields=['kind', 'booking_date', 'id'], name='booking_kind_date_idx'),
+        ),
+        migrations.RunPython(classify_existing_bookings, migrations.RunPython.noop),
+    ]
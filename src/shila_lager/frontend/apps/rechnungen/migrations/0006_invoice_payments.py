@@ -0,0 +1,64 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:25
+
+import re
+from datetime import date, datetime
+
+import django.db.models.deletion
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def parse_invoice_payments(beneficiary_or_payer: str | None, kind: str, description: str) -> list[tuple[str, date, str]]:
+    # A copy of `models.parse_invoice_payments` at the time of this migration, the app code may change
+    if beneficiary_or_payer != 'GRIHED Service GmbH':
+        return []
+
+    if 'TEMP:' in description:
+        status = 'temp'
+    elif kind == 'Lastschrift':
+        status = 'paid'
+    elif kind == 'LS Wiedergutschrift':
+        status = 'undone'
+    else:
+        return []
+
+    invoices = re.findall(r'RE(\d+-\d+) vo[nm] (\d{2}\.\d{2}\.\d{4})', description)
+    return [(number, datetime.strptime(invoice_date, '%d.%m.%Y').date(), status) for number, invoice_date in invoices]
+
+
+def link_existing_bookings(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    ShilaAccountBooking = apps.get_model('rechnungen', 'ShilaAccountBooking')
+    GrihedInvoicePayment = apps.get_model('rechnungen', 'GrihedInvoicePayment')
+    payments = [
+        GrihedInvoicePayment(booking=booking, invoice_number=number, invoice_date=invoice_date, status=status)
+        for booking in ShilaAccountBooking.objects.filter(beneficiary_or_payer='GRIHED Service GmbH').order_by('booking_date', 'id')
+        for number, invoice_date, status in parse_invoice_payments(booking.beneficiary_or_payer, booking.kind, booking.description)
+    ]
+
+    GrihedInvoicePayment.objects.bulk_create(payments, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rechnungen', '0005_list_filters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GrihedInvoicePayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoice_number', models.CharField(max_length=64)),
+                ('invoice_date', models.DateField()),
+                ('status', models.CharField(choices=[('paid', 'Paid'), ('undone', 'Undone'), ('temp', 'Temp')], max_length=16)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_payments', to='rechnungen.shilaaccountbooking')),
+            ],
+            options={
+                'verbose_name_plural': 'Grihed Invoice Payments',
+                'indexes': [models.Index(fields=['invoice_number', 'status'], name='invoice_payment_number_idx'), models.Index(fields=['status', 'invoice_number'], name='invoice_payment_status_idx')],
+            },
+        ),
+        migrations.RunPython(link_existing_bookings, migrations.RunPython.noop),
+    ]
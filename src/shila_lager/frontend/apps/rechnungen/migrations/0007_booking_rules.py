@@ -0,0 +1,57 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:30
+
+from typing import Any
+
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+# A copy of `classification.default_booking_rules` at the time of this migration, the app code may change
+default_booking_rules: list[dict[str, Any]] = [
+    *[{'field': 'peer', 'match': 'exact', 'pattern': peer, 'category': 'Getränke'} for peer in ['GRIHED Service GmbH', 'Team Getraenke Lieferdienste TGL GmbH']],
+    *[{'field': 'peer', 'match': 'exact', 'pattern': peer, 'category': 'GEPA'} for peer in ['GEPA MBH', 'GEPA mbH', 'GEPA mbh', 'Cafe Libertad Kollektiv eG']],
+    *[{'field': 'peer', 'match': 'exact', 'pattern': peer, 'category': 'Schokolade'} for peer in ['PLANT-FOR-THE-PLANET', 'THE GOOD SHOP by Stripe via PPRO']],
+    {'field': 'peer', 'match': 'exact', 'pattern': 'DM-drogerie markt', 'category': 'DM'},
+    *[{'field': 'peer', 'match': 'exact', 'pattern': peer, 'category': 'Hosting'} for peer in ['Jonas Pasche', 'Hetzner Online GmbH']],
+
+    *[{'priority': 200, 'field': 'description', 'match': 'contains', 'pattern': it, 'iban': '0000000000', 'category': 'Sparkasse Gebühr'} for it in ['Entgeltabrechnung siehe Anlage ', 'Rechnung Berliner Sparkasse Entgelt']],
+    {'priority': 300, 'field': 'description', 'match': 'regex', 'pattern': '^SB-EINZAHLUNG', 'category': 'Sparkasse Einzahlung'},
+    {'priority': 400, 'field': 'description', 'match': 'contains', 'pattern': 'Flaschenpost', 'category': 'Getränke'},
+    {'priority': 400, 'field': 'peer', 'match': 'contains', 'pattern': 'flaschenpost', 'category': 'Getränke'},
+    *[{'priority': 500, 'field': 'description', 'match': 'contains', 'pattern': it, 'category': 'Bringmeister'} for it in ['Bringmeister', 'Metro']],
+    {'priority': 600, 'field': 'description', 'match': 'contains', 'pattern': 'MV Ausgabe', 'category': 'MV Haushalt'},
+]
+
+
+def create_default_rules(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    BookingRule = apps.get_model('rechnungen', 'BookingRule')
+    BookingRule.objects.bulk_create([BookingRule(**it) for it in default_booking_rules])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rechnungen', '0006_invoice_payments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('priority', models.IntegerField(default=100)),
+                ('field', models.CharField(choices=[('peer', 'Peer'), ('description', 'Description')], max_length=16)),
+                ('match', models.CharField(choices=[('exact', 'Exact'), ('contains', 'Contains'), ('regex', 'Regex')], max_length=16)),
+                ('pattern', models.CharField(max_length=256)),
+                ('iban', models.CharField(blank=True, max_length=64)),
+                ('category', models.CharField(choices=[('Getränke', 'Getränke'), ('GEPA', 'GEPA'), ('Bringmeister', 'Bringmeister'), ('Schokolade', 'Schokolade'), ('DM', 'DM'), ('Hosting', 'Hosting'), ('Sparkasse Gebühr', 'Sparkasse Gebühr'), ('MV Haushalt', 'MV Haushalt'), ('Sonstige', 'Sonstige'), ('Sparkasse Einzahlung', 'Sparkasse Einzahlung')], max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Booking Rules',
+                'ordering': ('priority', 'id'),
+            },
+        ),
+        migrations.RunPython(create_default_rules, migrations.RunPython.noop),
+    ]
@@ -7,11 +7,12 @@ from decimal import Decimal
 from enum import Enum
 from typing import TYPE_CHECKING, Any, Never
 
-from django.db.models import Model, DecimalField, CharField, DateField, ForeignKey, IntegerField, RESTRICT, TextChoices, ManyToManyField, CASCADE, JSONField, DateTimeField
+from django.core.exceptions import ValidationError
+from django.db.models import Q, Model, DecimalField, CharField, DateField, ForeignKey, IntegerField, RESTRICT, TextChoices, ManyToManyField, CASCADE, JSONField, DateTimeField, Index, OneToOneField
 from math import isclose
 
 from shila_lager.frontend.apps.bestellung.models import BeverageCrate, GrihedPrice, SalePrice
-from shila_lager.settings import logger, grihed_temp_str
+from shila_lager.settings import logger, grihed_temp_str, grihed_booking_date_regex
 
 if TYPE_CHECKING:
     from django.db.models.fields.related_descriptors import RelatedManager
@@ -21,6 +22,9 @@ if TYPE_CHECKING:
 class GrihedInvoice(Model):
     class Meta:
         verbose_name_plural = "Grihed Invoices"
+        indexes = [
+            Index(fields=["date", "invoice_number"], name="grihed_invoice_date_idx"),
+        ]
 
     invoice_number = CharField(max_length=64, primary_key=True)
     date = DateField()
@@ -39,12 +43,16 @@ class GrihedInvoiceItem(Model):
     class Meta:
         verbose_name_plural = "Grihed Invoice Items"
         unique_together = ("invoice", "beverage")
+        indexes = [
+            # The unique constraint covers lookups by invoice, this one covers the per-beverage scans of the analysis
+            Index(fields=["beverage", "invoice"], name="grihed_item_beverage_idx"),
+        ]
 
     quantity = IntegerField()
     total_price = DecimalField(max_digits=16, decimal_places=2)
 
     invoice = ForeignKey(GrihedInvoice, on_delete=RESTRICT, related_name="items")
-    beverage = ForeignKey(BeverageCrate, on_delete=RESTRICT, related_name="invoice_items")
+    beverage = ForeignKey(BeverageCrate, on_delete=RESTRICT, related_name="invoice_items", db_index=False)  # Covered by `grihed_item_beverage_idx`
     purchase_price = ForeignKey(GrihedPrice, on_delete=RESTRICT, related_name="invoice_items")
     sale_price = ForeignKey(SalePrice, on_delete=RESTRICT, related_name="invoice_items")
 
@@ -100,32 +108,27 @@ class ShilaBookingKind(TextChoices):
 
     @classmethod
     def from_str(cls, kind: str) -> ShilaBookingKind:
-        match kind.strip().lower():
-            case "lastschrift" | "einmal lastschrift" | "folgelastschrift" | "erstlastschrift":
-                return cls.lastschrift
-            case "ls wiedergutschrift":
-                return cls.lastschrift_undo
-            case "dauerauftrag":
-                return cls.dauerauftrag
-            case "rechnung":
-                return cls.rechnung
-            case "kartenzahlung":
-                return cls.kartenzahlung
-            case "online-ueberweisung" | "einzelueberweisung":
-                return cls.onlineuberweisung
-
-            case "gutschr. ueberweisung" | "echtzeit-gutschrift":
-                return cls.gutschrift
-            case "bargeldeinzahlung" | "bargeldeinzahlung sb":
-                return cls.bargeldeinzahlung
-
-            case "abschluss":
-                return cls.abschluss
-            case "entgeltabschluss":
-                return cls.entgeltabschluss
+        try:
+            return booking_kind_names[kind.strip().lower()]
+        except KeyError:
+            raise ValueError(f"Unknown booking kind {kind}") from None
 
-            case _:
-                raise ValueError(f"Unknown booking kind {kind}")
+
+# The "Buchungstext"s of the Sparkasse, lowercase
+booking_kind_names = {
+    "lastschrift": ShilaBookingKind.lastschrift, "einmal lastschrift": ShilaBookingKind.lastschrift, "folgelastschrift": ShilaBookingKind.lastschrift, "erstlastschrift": ShilaBookingKind.lastschrift,
+    "ls wiedergutschrift": ShilaBookingKind.lastschrift_undo,
+    "dauerauftrag": ShilaBookingKind.dauerauftrag,
+    "rechnung": ShilaBookingKind.rechnung,
+    "kartenzahlung": ShilaBookingKind.kartenzahlung,
+    "online-ueberweisung": ShilaBookingKind.onlineuberweisung, "einzelueberweisung": ShilaBookingKind.onlineuberweisung,
+
+    "gutschr. ueberweisung": ShilaBookingKind.gutschrift, "echtzeit-gutschrift": ShilaBookingKind.gutschrift,
+    "bargeldeinzahlung": ShilaBookingKind.bargeldeinzahlung, "bargeldeinzahlung sb": ShilaBookingKind.bargeldeinzahlung,
+
+    "abschluss": ShilaBookingKind.abschluss,
+    "entgeltabschluss": ShilaBookingKind.entgeltabschluss,
+}
 
 
 class ShilaBookingCategory(Enum):
@@ -141,14 +144,133 @@ class ShilaBookingCategory(Enum):
     sparkasse_income = "Sparkasse Einzahlung"
 
 
+class BookingRuleField(TextChoices):
+    peer = "peer"  # `ShilaAccountBooking.beneficiary_or_payer`
+    description = "description"
+
+
+class BookingRuleMatch(TextChoices):
+    exact = "exact"
+    contains = "contains"
+    regex = "regex"  # Searched anywhere in the field, use `^` and `$` to anchor it
+
+
+# Global inline flags, named groups, named and numbered backreferences and conditional groups
+unsupported_rule_regex = re.compile(r"\(\?[aiLmsux]+\)|\(\?P|\(\?\(|\\[1-9]")
+
+
+class BookingRule(Model):
+    """A rule of `classification.BookingClassifier`, the first matching rule (by priority) decides the category of a booking"""
+
+    class Meta:
+        verbose_name_plural = "Booking Rules"
+        ordering = "priority", "id"
+
+    priority = IntegerField(default=100)
+    field = CharField(max_length=16, choices=BookingRuleField)
+    match = CharField(max_length=16, choices=BookingRuleMatch)
+    pattern = CharField(max_length=256)
+    iban = CharField(max_length=64, blank=True)  # If set, the rule only matches bookings with this IBAN
+    category = CharField(max_length=64, choices=[(it.value, it.value) for it in ShilaBookingCategory])
+
+    updated_at = DateTimeField(auto_now=True)  # Tells the other processes to recompile their classifier
+
+    def __str__(self) -> str:
+        return f"{self.field} {self.match} {self.pattern!r} -> {self.category}"
+
+    def clean(self) -> None:
+        if self.match != BookingRuleMatch.regex:
+            return
+
+        # The rules are combined into one regex, where these would apply to or reference the other rules
+        if unsupported_rule_regex.search(self.pattern):
+            raise ValidationError({"pattern": "Inline flags like (?i), backreferences and named groups are not supported, use (?i:…) and unnamed groups instead"})
+
+        try:
+            re.compile(self.to_lookahead("_rule"), re.DOTALL)
+        except re.error as e:
+            raise ValidationError({"pattern": f"Invalid regex: {e}"})
+
+    def to_regex(self) -> str:
+        match self.match:
+            case BookingRuleMatch.exact:
+                return rf"\A{re.escape(self.pattern)}\Z"
+            case BookingRuleMatch.contains:
+                return re.escape(self.pattern)
+            case _:
+                return self.pattern
+
+    def to_lookahead(self, group: str) -> str:
+        """The rule as an optional lookahead, which sets `group` if the rule matches anywhere in the field (see `classification.BookingClassifier`)"""
+        return f"(?:(?=.*?(?P<{group}>{self.to_regex()})))?"
+
+    def to_filter(self) -> Q:
+        """All bookings the rule can match. Used to find the bookings that have to be reclassified when the rule changes."""
+        column = "beneficiary_or_payer" if self.field == BookingRuleField.peer else "description"
+        lookup = {BookingRuleMatch.exact: "exact", BookingRuleMatch.contains: "contains"}.get(BookingRuleMatch(self.match), "regex")
+        condition = Q(**{f"{column}__{lookup}": self.pattern})
+        if self.iban:
+            condition &= Q(iban=self.iban)
+
+        return condition
+
+
+def get_actual_booking_date(beneficiary_or_payer: str | None, description: str, booking_date: date) -> date:
+    """Grihed debits the invoices days after they were issued, the actual booking date is the invoice date in the description"""
+    if beneficiary_or_payer != "GRIHED Service GmbH":
+        return booking_date
+
+    matched_date = re.search(r"(\d{2})\.(\d{2})\.(\d{4})", description)
+    if matched_date is None:
+        logger.error(f"Could not find a date in {description}")
+        return booking_date
+
+    return date(*map(int, reversed(matched_date.groups())))
+
+
+class InvoicePaymentStatus(TextChoices):
+    paid = "paid"  # Lastschrift
+    undone = "undone"  # LS Wiedergutschrift, the Lastschrift was returned
+    temp = "temp"  # Temporary booking of an invoice that is not booked yet, see `import_grihed_non_booked_items`
+
+
+def parse_invoice_payments(beneficiary_or_payer: str | None, kind: str, description: str) -> list[tuple[str, date, InvoicePaymentStatus]]:
+    """The (invoice number, invoice date, status) of every invoice a Grihed booking pays, taken from its description"""
+    if beneficiary_or_payer != "GRIHED Service GmbH":
+        return []
+
+    if grihed_temp_str in description:
+        status = InvoicePaymentStatus.temp
+    elif kind == ShilaBookingKind.lastschrift:
+        status = InvoicePaymentStatus.paid
+    elif kind == ShilaBookingKind.lastschrift_undo:
+        status = InvoicePaymentStatus.undone
+    else:
+        logger.error(f"Unknown booking kind: {kind}")
+        return []
+
+    invoices = grihed_booking_date_regex.findall(description)
+    if not invoices:
+        logger.error(f"Could not find invoice number in booking description: {description}")
+
+    return [(number, datetime.strptime(invoice_date, "%d.%m.%Y").date(), status) for number, invoice_date in invoices]
+
+
 class ShilaAccountBooking(Model):
     class Meta:
         verbose_name_plural = "Shila Account Bookings"
+        indexes = [
+            Index(fields=["booking_date", "id"], name="booking_date_idx"),
+            Index(fields=["beneficiary_or_payer", "booking_date"], name="booking_peer_date_idx"),
+            Index(fields=["booking_category", "booking_date", "id"], name="booking_category_date_idx"),
+            Index(fields=["kind", "booking_date", "id"], name="booking_kind_date_idx"),
+        ]
 
     booking_date = DateField()
     value_date = DateField()
     kind = CharField(max_length=64, choices=ShilaBookingKind)
     description = CharField(max_length=256)
+    booking_category = CharField(max_length=64, choices=[(it.value, it.value) for it in ShilaBookingCategory], default=ShilaBookingCategory.other.value)  # See `classification.classify_bookings`
 
     creditor_id = CharField(max_length=64, null=True)
     mandate_reference = CharField(max_length=64, null=True)
@@ -165,6 +287,8 @@ class ShilaAccountBooking(Model):
     currency = CharField(max_length=16)
     additional_info = CharField(max_length=256)
 
+    invoice_payments: RelatedManager[GrihedInvoicePayment]
+
     def __str__(self) -> str:
         return f"Booking {self.description} on {self.booking_date}"
 
@@ -199,46 +323,53 @@ class ShilaAccountBooking(Model):
         return self.beneficiary_or_payer == "GRIHED Service GmbH" and grihed_temp_str in self.description
 
     def actual_booking_date(self) -> date:
-        if self.beneficiary_or_payer != "GRIHED Service GmbH":
-            return self.booking_date
-
-        matched_date = re.search(r"(\d{2})\.(\d{2})\.(\d{4})", self.description)
-        if matched_date is None:
-            logger.error(f"Could not find a date in {self.description}")
-            return self.booking_date
-
-        return date(*map(int, reversed(matched_date.groups())))
+        return get_actual_booking_date(self.beneficiary_or_payer, self.description, self.booking_date)
 
     @property
     def category(self) -> ShilaBookingCategory:
-        match self.beneficiary_or_payer:
-            case "GRIHED Service GmbH" | "Team Getraenke Lieferdienste TGL GmbH":
-                return ShilaBookingCategory.beverages
-            case "GEPA MBH" | "GEPA mbH" | "GEPA mbh" | "Cafe Libertad Kollektiv eG":
-                return ShilaBookingCategory.gepa
-            case "PLANT-FOR-THE-PLANET" | "THE GOOD SHOP by Stripe via PPRO":
-                return ShilaBookingCategory.chocholate
-            case "DM-drogerie markt":
-                return ShilaBookingCategory.dm
-            case "Jonas Pasche" | "Hetzner Online GmbH":
-                return ShilaBookingCategory.hosting
-            case _:
-                if self.iban == "0000000000" and (
-                    "Entgeltabrechnung siehe Anlage " in self.description or "Rechnung Berliner Sparkasse Entgelt" in self.description
-                ):
-                    return ShilaBookingCategory.sparkasse_fee
+        return ShilaBookingCategory(self.booking_category)
+
+
+class GrihedInvoicePayment(Model):
+    """Links a Grihed booking to an invoice it pays, maintained by `reconciliation.link_invoice_payments`"""
+
+    class Meta:
+        verbose_name_plural = "Grihed Invoice Payments"
+        indexes = [
+            Index(fields=["invoice_number", "status"], name="invoice_payment_number_idx"),
+            Index(fields=["status", "invoice_number"], name="invoice_payment_status_idx"),
+        ]
+
+    booking = ForeignKey(ShilaAccountBooking, on_delete=CASCADE, related_name="invoice_payments")
+    invoice_number = CharField(max_length=64)  # Not a foreign key, older bookings pay invoices that were never imported
+    invoice_date = DateField()
+    status = CharField(max_length=16, choices=InvoicePaymentStatus)
+
+    def __str__(self) -> str:
+        return f"Payment of {self.invoice_number} ({self.status})"
+
 
-                if self.description.startswith("SB-EINZAHLUNG"):
-                    return ShilaBookingCategory.sparkasse_income
-                if "Flaschenpost" in self.description or self.beneficiary_or_payer is not None and "flaschenpost" in self.beneficiary_or_payer:
-                    return ShilaBookingCategory.beverages
-                if "Bringmeister" in self.description or "Metro" in self.description:
-                    return ShilaBookingCategory.bringmeister
+class BalanceBasis(TextChoices):
+    booking_date = "booking_date"
+    actual_booking_date = "actual_booking_date"  # See `ShilaAccountBooking.actual_booking_date`
 
-                if "MV Ausgabe" in self.description:
-                    return ShilaBookingCategory.mv_ausgaben
 
-                return ShilaBookingCategory.other
+class DailyBalance(Model):
+    """The account balance at the end of every day with bookings, maintained by `balance.refresh_daily_balances`"""
+
+    class Meta:
+        verbose_name_plural = "Daily Balances"
+        unique_together = "basis", "date"
+
+    basis = CharField(max_length=32, choices=BalanceBasis)
+    date = DateField()
+
+    net_change = DecimalField(max_digits=16, decimal_places=2)
+    balance = DecimalField(max_digits=16, decimal_places=2)
+    category_sums = JSONField()  # `ShilaBookingCategory.value` -> sum of the amounts as string
+
+    def __str__(self) -> str:
+        return f"Balance on {self.date} ({self.basis})"
 
 
 class ShilaInventoryCount(Model):
@@ -284,6 +415,65 @@ class ShilaInventoryCountDetail(Model):
         return self.__str__()
 
 
+class CrateDemandForecast(Model):
+    """The cached demand forecast of a crate, maintained by `forecast.refresh_demand_forecasts`"""
+
+    class Meta:
+        verbose_name_plural = "Crate Demand Forecasts"
+
+    crate = OneToOneField(BeverageCrate, on_delete=CASCADE, primary_key=True, related_name="demand_forecast")
+
+    # Smoothed number of crates sold per open day
+    semester_rate = DecimalField(max_digits=16, decimal_places=4, null=True)
+    break_rate = DecimalField(max_digits=16, decimal_places=4, null=True)
+
+    target_stock = DecimalField(max_digits=16, decimal_places=4)
+    last_count_date = DateTimeField()  # The newest inventory count that is included in the forecast
+
+    crate_id: str
+
+    def __str__(self) -> str:
+        return f"Demand Forecast for {self.crate_id}"
+
+
+# The rows below are read-only copies of the fields the analyses need, loaded with `values_list` by the `crud.get_*_rows` functions.
+# Creating them is a lot cheaper than creating model instances, and they do not query their relations lazily.
+
+@dataclass(slots=True, frozen=True)
+class BookingRow:
+    id: int
+    booking_date: date
+    actual_booking_date: date  # See `ShilaAccountBooking.actual_booking_date`
+    kind: str
+    beneficiary_or_payer: str | None
+    description: str
+    amount: Decimal
+    category: ShilaBookingCategory
+
+
+@dataclass(slots=True, frozen=True)
+class InvoiceItemRow:
+    invoice_number: str
+    invoice_date: date
+    beverage_id: str
+    beverage_name: str
+    bottle_type: str
+
+    quantity: int
+    total_price: Decimal
+    purchase_price: Decimal  # `GrihedPrice.price`
+    deposit: Decimal  # `GrihedPrice.deposit`
+    sale_price: Decimal  # `SalePrice.price`
+
+
+@dataclass(slots=True, frozen=True)
+class InvoiceRow:
+    invoice_number: str
+    date: date
+    total_price: Decimal
+    items: list[InvoiceItemRow]
+
+
 @dataclass
 class AnalyzedBeverageCrate:
     beverage: BeverageCrate
@@ -305,5 +495,10 @@ class AnalyzedBeverageCrate:
     def __str__(self) -> str:
         return f"{self.beverage.name}: {self.num_ordered:.2f}× ordered, {self.num_sold:.2f}× sold: {self.total_profit:.2f}€ profit"
 
+    def to_json(self) -> dict[str, str]:
+        return {"name": self.beverage.name} | {it: f"{getattr(self, it):.2f}" for it in [
+            "num_ordered", "num_returned", "num_sold", "total_payed", "total_profit", "total_profit_without_deposits", "total_profit_with_payed_but_not_returned_deposits", "total_deposit_returned",
+        ]}
+
     def __repr__(self) -> str:
         return self.__str__()
@@ -8,8 +8,8 @@ from math import isclose
 
 from shila_lager.frontend.apps.bestellung.models import BottleType, BeverageCrate
 from shila_lager.frontend.apps.rechnungen.beverage_facts import collapse_categories
-from shila_lager.frontend.apps.rechnungen.crud import get_shila_account_bookings
-from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, GrihedInvoice, ShilaInventoryCount
+from shila_lager.frontend.apps.rechnungen.crud import get_booking_rows, get_invoice_rows_between
+from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount, BookingRow, InvoiceRow
 from shila_lager.settings import empty_crate_price
 from shila_lager.utils import reverse_dict
 
@@ -28,29 +28,19 @@ class AnalyzedBeverageCrate:
     def __str__(self) -> str:
         return f"{self.name}: {self.total_purchased}× ordered, {self.total_profit:.2f}€ profit"
 
+    def to_json(self) -> dict[str, str]:
+        return {"name": self.name, "total_purchased": str(self.total_purchased)} | {it: f"{getattr(self, it):.2f}" for it in ["total_returned", "total_profit", "total_theoretical_profit", "total_payed"]}
+
     def __repr__(self) -> str:
         return self.__str__()
 
 
-def get_data(start: datetime | None, end: datetime | None) -> tuple[list[ShilaAccountBooking], list[GrihedInvoice]]:
-    def filter_it(it: ShilaAccountBooking | GrihedInvoice) -> bool:
-        attr = it.booking_date if isinstance(it, ShilaAccountBooking) else it.date
-        res = True
-
-        if start is not None:
-            res &= start.date() <= attr
-        if end is not None:
-            res &= attr <= end.date()
-
-        return res
-
-    return (
-        sorted(get_shila_account_bookings(), key=lambda it: it.booking_date),
-        sorted(filter(filter_it, GrihedInvoice.objects.all()), key=lambda it: it.date)
-    )
+def get_data(start: datetime | None, end: datetime | None) -> tuple[list[BookingRow], list[InvoiceRow]]:
+    # Only the invoices are filtered, the bookings are needed in full to calculate the account balance
+    return get_booking_rows(), get_invoice_rows_between(start, end)
 
 
-def analyze_invoices(invoices: list[GrihedInvoice], inventory: tuple[ShilaInventoryCount, ShilaInventoryCount] | None = None) -> list[AnalyzedBeverageCrate]:
+def analyze_invoices(invoices: list[InvoiceRow], inventory: tuple[ShilaInventoryCount, ShilaInventoryCount] | None = None) -> list[AnalyzedBeverageCrate]:
     old_inventory, new_inventory = inventory or (None, None)
     crates: DefaultDict[tuple[str, str], list[tuple[Decimal, Decimal, Decimal]]] = defaultdict(list)
     crate_deposit: dict[str, Decimal] = {}
@@ -58,24 +48,24 @@ def analyze_invoices(invoices: list[GrihedInvoice], inventory: tuple[ShilaInvent
     payed_deposits: DefaultDict[Decimal, int] = defaultdict(int)
     booked_deposits: DefaultDict[Decimal, Decimal] = defaultdict(Decimal)
     reversed_collapse_categories = reverse_dict(collapse_categories)
-    beverage_id_to_name = {beverage.id: beverage.name for beverage in BeverageCrate.objects.all()}
+    beverage_id_to_name = dict(BeverageCrate.objects.values_list("id", "name"))
 
     # TODO: Make this faster
 
     for invoice in invoices:
-        for item in invoice.items.all():
-            if item.beverage.bottle_type == BottleType.crate_return:
-                returns[-item.purchase_price.price] += item.quantity
+        for item in invoice.items:
+            if item.bottle_type == BottleType.crate_return:
+                returns[-item.purchase_price] += item.quantity
             else:
-                beverage_id, beverage_name = item.beverage.id, item.beverage.name
+                beverage_id, beverage_name = item.beverage_id, item.beverage_name
                 if beverage_id in reversed_collapse_categories:
                     beverage_id = reversed_collapse_categories[beverage_id]
                     beverage_name = beverage_id_to_name[beverage_id]
 
-                total_profit = item.sale_price.price * item.quantity - item.total_price
+                total_profit = item.sale_price * item.quantity - item.total_price
                 crates[beverage_id, beverage_name].append((Decimal(item.quantity), total_profit, item.total_price))
-                payed_deposits[item.purchase_price.deposit] += item.quantity
-                crate_deposit[beverage_name] = item.purchase_price.deposit
+                payed_deposits[item.deposit] += item.quantity
+                crate_deposit[beverage_name] = item.deposit
 
     if old_inventory is not None and new_inventory is not None:
         old_inventory_ids, new_inventory_ids = {detail.crate.id: (detail.count, detail.crate) for detail in old_inventory.details.all()}, {detail.crate.id: (detail.count, detail.crate) for detail in new_inventory.details.all()}
@@ -145,8 +135,8 @@ def analyze_invoices(invoices: list[GrihedInvoice], inventory: tuple[ShilaInvent
     return analyzed_crates
 
 
-def group_invoices_by_time_interval(invoices: list[GrihedInvoice], days: int) -> dict[date, list[AnalyzedBeverageCrate]]:
-    grouped_invoices: DefaultDict[int, list[GrihedInvoice]] = defaultdict(list)
+def group_invoices_by_time_interval(invoices: list[InvoiceRow], days: int) -> dict[date, list[AnalyzedBeverageCrate]]:
+    grouped_invoices: DefaultDict[int, list[InvoiceRow]] = defaultdict(list)
 
     min_date = min(invoice.date for invoice in invoices)
     for invoice in sorted(invoices, key=lambda it: it.date):
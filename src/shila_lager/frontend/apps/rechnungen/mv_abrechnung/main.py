@@ -1,119 +1,168 @@
-import time
 from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
+from pathlib import Path
 from typing import DefaultDict
 
-from shila_lager.frontend.apps.bestellung.crud import get_beverage_crates
-from shila_lager.frontend.apps.bestellung.models import BeverageCrate
-from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, GrihedInvoice, ShilaBookingKind, ShilaBookingCategory
+from shila_lager.frontend.apps.rechnungen.balance import get_current_balance
+from shila_lager.frontend.apps.rechnungen.columns import BookingColumns, export_columns
+from shila_lager.frontend.apps.rechnungen.crud import get_invoice_rows_between, get_last_inventory_count
+from shila_lager.frontend.apps.rechnungen.models import ShilaBookingCategory, BookingRow
 from shila_lager.frontend.apps.rechnungen.mv_abrechnung.data import get_data, analyze_invoices, AnalyzedBeverageCrate
 from shila_lager.frontend.apps.rechnungen.mv_abrechnung.plots import plot_shila_value, plot_bookings, plot_beverage_profit_and_turnover_piecharts, plot_turnover_categories
-from shila_lager.settings import logger, grihed_booking_date_regex
-from shila_lager.utils import filter_by_date
+from shila_lager.profiling import profile_stage
+from shila_lager.frontend.apps.rechnungen.report import ReportFormat, ReportWriter, report_record
+from shila_lager.frontend.apps.rechnungen.reconciliation import get_grihed_debt, get_unknown_invoice_payments
+from shila_lager.frontend.apps.rechnungen.valuation import PriceTable, value_inventory_count
+from shila_lager.utils import zero
 
 
-def calculate_inventory_value(beverages: dict[str, BeverageCrate]) -> tuple[Decimal, Decimal]:
-    inventory_value_when_sold, inventory_value_to_purchase = Decimal(0), Decimal(0)
-    # for (id, _), amount in current_inventory.items():
-    #     inventory_value_when_sold += beverages[id].current_sale_price() * Decimal(amount)
-    #     inventory_value_to_purchase += beverages[id].current_purchase_price() * Decimal(amount)
+def calculate_inventory_value(end: datetime | None = None) -> tuple[Decimal, Decimal]:
+    """The (sale, purchase) value of the last inventory count until `end`, at the prices that were valid when it was counted"""
+    count = get_last_inventory_count(end)
+    if count is None:
+        return zero, zero
 
-    return inventory_value_when_sold, inventory_value_to_purchase
+    value = value_inventory_count(count, PriceTable.load())
+    return value.sale_value, value.purchase_value
 
 
-def calculate_account_balance(bookings: list[ShilaAccountBooking], invoices: list[GrihedInvoice], start: datetime | None = None, end: datetime | None = None) -> Decimal:
-    invoices_by_id = {invoice.invoice_number: invoice for invoice in invoices}
-    current_account_balance = Decimal(sum(booking.amount for booking in bookings))
+@dataclass
+class ShilaValue:
+    account_balance: Decimal
+    debt_to_grihed: Decimal
+    inventory_value_when_sold: Decimal
+    inventory_value_to_purchase: Decimal
 
-    already_booked: set[str] = set()
-    for booking in bookings:
-        if booking.beneficiary_or_payer == "GRIHED Service GmbH":
-            booking_numbers = grihed_booking_date_regex.findall(booking.description)
-            assert booking_numbers, f"Could not find invoice number in booking description: {booking.description}"
+    tips: Decimal = Decimal(2596.64)
+    kleingeld: Decimal = Decimal(675.25)
+    debts_to_shila: Decimal = Decimal(512.18)
 
-            for invoice_number, booking_date in booking_numbers:
-                if invoice_number not in invoices_by_id and filter_by_date(datetime.strptime(booking_date, "%d.%m.%Y"), start, end) and not booking_date.endswith("2022"):
-                    print(f"Booking {invoice_number} was not found in invoices ({booking_date})")
-                    continue
+    @property
+    def account_value(self) -> Decimal:
+        return self.account_balance - self.debt_to_grihed - self.tips
 
-                match booking.kind:
-                    case ShilaBookingKind.lastschrift:
-                        assert invoice_number not in already_booked, f"Booking {invoice_number} was already booked"
-                        already_booked.add(invoice_number)
-                    case ShilaBookingKind.lastschrift_undo:
-                        already_booked.remove(invoice_number)
-                    case _:
-                        logger.error(f"Unknown booking kind: {booking.kind}")
+    @property
+    def total(self) -> Decimal:
+        return self.account_value + self.inventory_value_when_sold + self.debts_to_shila + self.kleingeld
 
-    debt_to_grihed = Decimal(sum(invoice.total_price for invoice in invoices if invoice.invoice_number not in already_booked))
+    def to_json(self) -> dict[str, str]:
+        return {it: f"{getattr(self, it):.2f}" for it in [
+            "account_balance", "debt_to_grihed", "inventory_value_when_sold", "inventory_value_to_purchase", "tips", "kleingeld", "debts_to_shila", "account_value", "total",
+        ]}
 
-    print(f"Ursprünglicher Kontostand:\t{current_account_balance:.2f}€")
-    print(f"Grihed Schulden:\t{debt_to_grihed:.2f}€")
-    return current_account_balance - debt_to_grihed
 
+def calculate_shila_value(start: datetime | None = None, end: datetime | None = None) -> ShilaValue:
+    inventory_value_when_sold, inventory_value_to_purchase = calculate_inventory_value(end)
+    return ShilaValue(get_current_balance(), get_grihed_debt(start, end), inventory_value_when_sold, inventory_value_to_purchase)
 
-def calculate_and_plot_shila_value(bookings: list[ShilaAccountBooking], invoices: list[GrihedInvoice], beverages: dict[str, BeverageCrate], start: datetime | None = None, end: datetime | None = None) -> Decimal:
-    current_account_balance = calculate_account_balance(bookings, invoices, start, end)
-    inventory_value_when_sold, inventory_value_to_purchase = calculate_inventory_value(beverages)
-    tips, kleingeld = Decimal(2596.64), Decimal(675.25)
-    debts_to_shila = Decimal(512.18)
 
-    print(f"Wert des Kontos:\t{current_account_balance - tips:.2f}€")
-    print(f"Wert des Inventars:\t{inventory_value_when_sold:.2f}€")
-    print(f"Kleingeld:\t\t {kleingeld:.2f}€")
-    print(f"Schulden beim Shila:\t {debts_to_shila:.2f}€")
-    print(f"Trinkgeld:\t\t{tips:.2f}€")
+def print_and_plot_shila_value(value: ShilaValue, start: datetime | None = None, end: datetime | None = None) -> Path:
+    for payment in get_unknown_invoice_payments(start, end):
+        if payment.invoice_date.year != 2022:
+            print(f"Booking {payment.invoice_number} was not found in invoices ({payment.invoice_date:%d.%m.%Y})")
+
+    print(f"Ursprünglicher Kontostand:\t{value.account_balance:.2f}€")
+    print(f"Grihed Schulden:\t{value.debt_to_grihed:.2f}€")
+    print(f"Wert des Kontos:\t{value.account_value:.2f}€")
+    print(f"Wert des Inventars:\t{value.inventory_value_when_sold:.2f}€")
+    print(f"Kleingeld:\t\t {value.kleingeld:.2f}€")
+    print(f"Schulden beim Shila:\t {value.debts_to_shila:.2f}€")
+    print(f"Trinkgeld:\t\t{value.tips:.2f}€")
     print("─" * 32)
-    print(f"Wert des Shilas:\t{current_account_balance - tips + inventory_value_when_sold + debts_to_shila + kleingeld:.2f}€")
+    print(f"Wert des Shilas:\t{value.total:.2f}€")
     print()
 
-    plot_shila_value(current_account_balance, inventory_value_when_sold, tips, debts_to_shila, kleingeld)
+    return plot_shila_value(value.account_balance - value.debt_to_grihed, value.inventory_value_when_sold, value.tips, value.debts_to_shila, value.kleingeld)
+
+
+@dataclass
+class BookingTotals:
+    """The sums of the bookings in a date range"""
+    profit: Decimal
+    turnover: Decimal
+    money_in: Decimal
+    turnover_per_category: DefaultDict[ShilaBookingCategory, Decimal]
+
+
+def sum_bookings(bookings: list[BookingRow], start: datetime | None = None, end: datetime | None = None) -> BookingTotals:
+    return sum_booking_columns(BookingColumns.from_rows(bookings), start, end)
 
-    return current_account_balance - tips + inventory_value_when_sold + debts_to_shila + kleingeld
 
+def sum_booking_columns(columns: BookingColumns, start: datetime | None = None, end: datetime | None = None) -> BookingTotals:
+    """The sums are computed on the integer cents of the columns, `Decimal`s are only created for the totals"""
+    in_range = columns.between(start, end)
+    money_out, money_in = in_range & (columns.amount < 0), in_range & (columns.amount > 0)
 
-def print_and_plot_profits_and_turnovers(bookings: list[ShilaAccountBooking], analyzed_crates: list[AnalyzedBeverageCrate], start: datetime | None = None, end: datetime | None = None) -> None:
-    total_profit = sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date(), start, end))
-    total_turnover = -sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date(), start, end) and booking.amount < 0)
-    total_money_in = sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date(), start, end) and booking.amount > 0)
+    return BookingTotals(
+        profit=columns.total(in_range),
+        turnover=zero - columns.total(money_out),
+        money_in=columns.total(money_in),
+        turnover_per_category=defaultdict(Decimal, {category: zero - amount for category, amount in columns.total_per_category(money_out).items()}),
+    )
 
-    total_turnover_per_category: DefaultDict[ShilaBookingCategory, Decimal] = defaultdict(Decimal)
-    for booking in bookings:
-        if filter_by_date(booking.actual_booking_date(), start, end) and booking.amount < 0:
-            total_turnover_per_category[booking.category] -= booking.amount
 
+def print_and_plot_profits_and_turnovers(totals: BookingTotals, analyzed_crates: list[AnalyzedBeverageCrate]) -> Path:
     print()
     print(f"Erwarteter Profit:\t {sum(crate.total_profit for crate in analyzed_crates):.2f}€")
     print(f"Erwarteter Umsatz:\t{sum(crate.total_payed for crate in analyzed_crates):.2f}€")
     print()
     for category in ShilaBookingCategory:
-        print(f"{f'{category.value} Ausgaben:'.ljust(30)} {total_turnover_per_category[category]:.2f}€")
+        print(f"{f'{category.value} Ausgaben:'.ljust(30)} {totals.turnover_per_category[category]:.2f}€")
     print("─" * 33)
-    print(f"Tatsächlicher Umsatz:\t{total_turnover:.2f}€")
-    print(f"Eingezahltes Geld:\t{total_money_in:.2f}€")
-    print(f"Tatsächlicher Profit:\t {total_profit:.2f}€")
+    print(f"Tatsächlicher Umsatz:\t{totals.turnover:.2f}€")
+    print(f"Eingezahltes Geld:\t{totals.money_in:.2f}€")
+    print(f"Tatsächlicher Profit:\t {totals.profit:.2f}€")
 
-    plot_turnover_categories(dict(total_turnover_per_category))
+    return plot_turnover_categories(dict(totals.turnover_per_category))
 
 
-def mv_abrechnung_main(start: datetime | None = None, end: datetime | None = None) -> None:
+def mv_abrechnung_main(start: datetime | None = None, end: datetime | None = None, columnar: bool = False, output_format: ReportFormat = ReportFormat.text) -> list[Path]:
+    """Print the MV-Abrechnung and return the paths of the plots, which are only created with the text output"""
     # TODO: Pro Bestellung schauen wie viel gratis Wicküler es wären um einen Überschlag zu haben wie viele frei gesoffen werden könnten
     #   Mit folgestatistik "Alle Mitglieder könnten jeden Tag 42 Bier trinken und wir wären immernoch profitablel mit 69%"
     #   Wie sähe unser Kontostand aus, wenn jeden Tag 42 Bier getrunken werden würden
 
-    s = time.perf_counter()
-
-    # Invoices are filtered by date, bookings are not
-    bookings, invoices = get_data(start, end)
-    beverage_crates = get_beverage_crates()
-    analyzed_crates = analyze_invoices(invoices)
-
-    calculate_and_plot_shila_value(bookings, invoices, beverage_crates, start, end)
-    print_and_plot_profits_and_turnovers(bookings, analyzed_crates, start, end)
-
-    plot_bookings(bookings, start, end, True)
-    plot_beverage_profit_and_turnover_piecharts(analyzed_crates)
-    # plot_beverage_consumption_over_time(invoices, start, end)
-
-    print(f"Time elapsed: {time.perf_counter() - s:.2f}s")
+    with profile_stage("Load bookings and invoices"):
+        if columnar:
+            # The bookings are summed from the columns
+            export_columns()
+            invoices = get_invoice_rows_between(start, end)
+        else:
+            # Invoices are filtered by date, bookings are not
+            bookings, invoices = get_data(start, end)
+
+    with profile_stage("Analyze invoices"):
+        analyzed_crates = analyze_invoices(invoices)
+
+    with profile_stage("Shila value"):
+        shila_value = calculate_shila_value(start, end)
+
+    with profile_stage("Profits and turnovers"):
+        totals = sum_booking_columns(BookingColumns.load(), start, end) if columnar else sum_bookings(bookings, start, end)
+
+    if output_format != ReportFormat.text:
+        # Only the values, the plots are not created
+        ReportWriter(output_format).write(report_record(
+            start, end,
+            shila_value=shila_value.to_json(),
+            totals={
+                "expected_profit": f"{sum(crate.total_profit for crate in analyzed_crates):.2f}", "expected_turnover": f"{sum(crate.total_payed for crate in analyzed_crates):.2f}",
+                "turnover": f"{totals.turnover:.2f}", "money_in": f"{totals.money_in:.2f}", "profit": f"{totals.profit:.2f}",
+            },
+            expenses_per_category={category.value: f"{totals.turnover_per_category[category]:.2f}" for category in ShilaBookingCategory},
+            beverages={crate.id: crate.to_json() for crate in analyzed_crates},
+        ))
+        return []
+
+    plots = [print_and_plot_shila_value(shila_value, start, end), print_and_plot_profits_and_turnovers(totals, analyzed_crates)]
+
+    with profile_stage("Plot bookings"):
+        plots += plot_bookings(start, end, True)
+
+    with profile_stage("Plot beverage profits and turnovers"):
+        plots += plot_beverage_profit_and_turnover_piecharts(analyzed_crates)
+        # plot_beverage_consumption_over_time(invoices, start, end)
+
+    return plots
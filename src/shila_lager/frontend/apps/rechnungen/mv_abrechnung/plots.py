@@ -1,20 +1,28 @@
 from collections import defaultdict
 from datetime import datetime
 from decimal import Decimal
+from pathlib import Path
 from typing import Any, DefaultDict, Iterable, Callable
 
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
-import numpy as np
 from matplotlib.patches import Arc
 
-from shila_lager.frontend.apps.rechnungen.beverage_facts import beverage_categories, meta_categories
-from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, GrihedInvoice, ShilaBookingCategory
+from shila_lager.frontend.apps.rechnungen.balance import BalanceHistory
+from shila_lager.frontend.apps.rechnungen.beverage_facts import beverage_categories, meta_categories, shila_closed_periods, semester_breaks
+from shila_lager.frontend.apps.rechnungen.models import ShilaBookingCategory, BalanceBasis, InvoiceRow
 from shila_lager.frontend.apps.rechnungen.mv_abrechnung.data import AnalyzedBeverageCrate, group_invoices_by_time_interval
 from shila_lager.settings import plot_output_dir
 from shila_lager.utils import flat_map, autopct_pie_format_with_number
 
 
+def save_plot(name: str, **kwargs: Any) -> Path:
+    """Save the current figure in the `plot_output_dir`"""
+    path = plot_output_dir / name
+    plt.savefig(path, **kwargs)
+    return path
+
+
 def fill_plt_with_shila_events(add_shila_closed_times: bool, start: datetime | None = None, end: datetime | None = None) -> None:
     def axvline(date: datetime, **kwargs: Any) -> None:
         if start is not None and date < start:
@@ -46,15 +54,11 @@ def fill_plt_with_shila_events(add_shila_closed_times: bool, start: datetime | N
     }
 
     if add_shila_closed_times:
-        axvspan(datetime(2024, 1, 16), datetime(2024, 2, 18), color=colors["Shila zu"], label="Shila zu")
-        axvspan(datetime(2023, 12, 23), datetime(2024, 1, 7), color=colors["Shila zu"], label="Shila zu")
-        axvspan(datetime(2022, 12, 23), datetime(2023, 1, 5), color=colors["Shila zu"], label="Shila zu")
+        for closed_start, closed_end in shila_closed_periods:
+            axvspan(closed_start, closed_end, color=colors["Shila zu"], label="Shila zu")
 
-        axvspan(datetime(2022, 7, 23), datetime(2022, 10, 17), color=colors["Semesterferien"], label="Semesterferien")
-        axvspan(datetime(2023, 2, 18), datetime(2023, 4, 17), color=colors["Semesterferien"], label="Semesterferien")
-        axvspan(datetime(2023, 7, 22), datetime(2023, 10, 16), color=colors["Semesterferien"], label="Semesterferien")
-        axvspan(datetime(2024, 2, 17), datetime(2024, 4, 15), color=colors["Semesterferien"], label="Semesterferien")
-        # axvspan(datetime(2024, 7, 20), datetime(2024, 10, 16), color=colors["Semesterferien"])
+        for break_start, break_end in semester_breaks:
+            axvspan(break_start, break_end, color=colors["Semesterferien"], label="Semesterferien")
 
     axvline(datetime(2022, 10, 28), color=colors["Shilafahrt"], linestyle="--", linewidth=lw, label="Shilafahrt")
     axvline(datetime(2023, 11, 3), color=colors["Shilafahrt"], linestyle="--", linewidth=lw, label="Shilafahrt")
@@ -75,7 +79,8 @@ def fill_plt_with_shila_events(add_shila_closed_times: bool, start: datetime | N
     plt.legend(by_label.values(), by_label.keys(), loc="lower right")
 
 
-def plot_bookings(all_bookings: list[ShilaAccountBooking], start: datetime | None = None, end: datetime | None = None, only_netto: bool = True) -> None:
+def plot_bookings(start: datetime | None = None, end: datetime | None = None, only_netto: bool = True) -> list[Path]:
+    paths = []
     # TODO: Shilafahrt rausrechnen
     # TODO: I think it would be best if we color the lines up and down a specific color, depending on which kind of booking it was
     # TODO: Add an optional line from all einzahlungen to each other to see the overall trend
@@ -90,22 +95,10 @@ def plot_bookings(all_bookings: list[ShilaAccountBooking], start: datetime | Non
     plt.ylabel("Betrag in €")
     plt.grid(True)
 
-    filter_by_start, filter_by_end = lambda it: start is None or start.date() <= it, lambda it: end is None or it <= end.date()
-
-    original_dates_and_balances = [(it.booking_date, np.float64(it.amount)) for it in all_bookings if filter_by_start(it.booking_date) and filter_by_end(it.booking_date)]
-    modified_dates_and_balances = [(it.actual_booking_date(), np.float64(it.amount)) for it in all_bookings if filter_by_start(it.actual_booking_date()) and filter_by_end(it.actual_booking_date())]
-    orgiginal_discarded_balances, modified_discarded_balances = [np.float64(it.amount) for it in all_bookings if not filter_by_start(it.booking_date)], [np.float64(it.amount) for it in all_bookings if not filter_by_start(it.actual_booking_date())]
-    original_dates_and_balances.sort(key=lambda it: it[0]), modified_dates_and_balances.sort(key=lambda it: it[0])
-
-    if orgiginal_discarded_balances:
-        original_dates_and_balances.insert(0, (original_dates_and_balances[0][0], np.sum(orgiginal_discarded_balances)))
-    if modified_discarded_balances:
-        modified_dates_and_balances.insert(0, (modified_dates_and_balances[0][0], np.sum(modified_discarded_balances)))
-
-    (original_dates, original_balances), (modified_dates, modified_balances) = zip(*original_dates_and_balances), zip(*modified_dates_and_balances)
-    original_cum_balances, modified_cum_balances = np.cumsum(original_balances), np.cumsum(modified_balances)
-    assert len(original_dates) == len(original_cum_balances)
-    assert len(modified_dates) == len(modified_cum_balances)
+    (_original_dates, original_cents), (_modified_dates, modified_cents) = BalanceHistory.load(BalanceBasis.booking_date).cents_between(start, end), BalanceHistory.load(BalanceBasis.actual_booking_date).cents_between(start, end)
+    original_dates: tuple[Any, ...] = tuple(_original_dates)
+    modified_dates: tuple[Any, ...] = tuple(_modified_dates)
+    original_cum_balances, modified_cum_balances = original_cents / 100, modified_cents / 100
 
     if only_netto is False:
         # TODO: Make this less jagged
@@ -125,43 +118,35 @@ def plot_bookings(all_bookings: list[ShilaAccountBooking], start: datetime | Non
 
     plt.gca().xaxis.set_major_locator(locator)
     plt.gca().yaxis.set_major_locator(plt.MultipleLocator(1000))  # type:ignore[attr-defined]
-    plt.savefig(plot_output_dir / f"shila{'_netto' if only_netto else ''}_kontostand_stairs.png", dpi=400, bbox_inches="tight")
+    paths.append(save_plot(f"shila{'_netto' if only_netto else ''}_kontostand_stairs.png", dpi=400, bbox_inches="tight"))
 
     fill_plt_with_shila_events(True, start, end)
-    plt.savefig(plot_output_dir / f"shila{'_netto' if only_netto else ''}_kontostand_mit_events_stairs.png", dpi=400, bbox_inches="tight")
+    paths.append(save_plot(f"shila{'_netto' if only_netto else ''}_kontostand_mit_events_stairs.png", dpi=400, bbox_inches="tight"))
+
+    return paths
 
 
-def plot_bookings_bar(all_bookings: list[ShilaAccountBooking], start: datetime | None = None, end: datetime | None = None) -> None:
+def plot_bookings_bar(start: datetime | None = None, end: datetime | None = None) -> list[Path]:
+    paths = []
     plt.figure(figsize=(32, 15))
     plt.title("Shila Kontostand")
     plt.xlabel("Zeitpunkt")
     plt.ylabel("Betrag in €")
     plt.grid(True)
 
-    filter_by_start, filter_by_end = lambda it: start is None or start.date() <= it, lambda it: end is None or it <= end.date()
+    dates, balance_cents = BalanceHistory.load().cents_between(start, end)
+    plt.bar(dates, balance_cents / 100, color="blue")  # type:ignore[arg-type]
 
-    dates_and_balances = defaultdict(list)
-    for booking in all_bookings:
-        date = booking.actual_booking_date()
-        if filter_by_start(date) and filter_by_end(date):
-            dates_and_balances[date.strftime("%Y-%m-%d")].append(np.float64(booking.amount))
-
-    discarded_balances = [np.float64(it.amount) for it in all_bookings if not filter_by_start(it.actual_booking_date())]
-    if discarded_balances:
-        dates_and_balances[min(dates_and_balances.keys())].append(np.sum(discarded_balances))
-
-    sorted_dates_and_balances = sorted(dates_and_balances.items(), key=lambda it: it[0])
-    dates, balances = zip(*[(datetime.strptime(date, "%Y-%m-%d").date(), np.sum(values)) for (date, values) in sorted_dates_and_balances])
-    assert len(dates) == len(balances)
-    plt.bar(dates, np.cumsum(balances), color="blue")
-
-    plt.savefig(plot_output_dir / "shila_netto_kontostand_bar.png", dpi=400, bbox_inches="tight")
+    paths.append(save_plot("shila_netto_kontostand_bar.png", dpi=400, bbox_inches="tight"))
 
     fill_plt_with_shila_events(True, start, end)
-    plt.savefig(plot_output_dir / "shila_netto_kontostand_mit_events_bar.png", dpi=400, bbox_inches="tight")
+    paths.append(save_plot("shila_netto_kontostand_mit_events_bar.png", dpi=400, bbox_inches="tight"))
 
+    return paths
 
-def plot_beverage_profit_and_turnover_piecharts(crates: list[AnalyzedBeverageCrate]) -> None:
+
+def plot_beverage_profit_and_turnover_piecharts(crates: list[AnalyzedBeverageCrate]) -> list[Path]:
+    paths = []
     crates_by_id = {crate.id: crate for crate in crates}
     category_profits: DefaultDict[str, dict[str, Decimal]] = defaultdict(dict)
     category_theoretical_profits: DefaultDict[str, dict[str, Decimal]] = defaultdict(dict)
@@ -241,7 +226,7 @@ def plot_beverage_profit_and_turnover_piecharts(crates: list[AnalyzedBeverageCra
     draw_meta_category_border(ax2, wedges2, labels)
 
     plt.tight_layout()
-    plt.savefig(plot_output_dir / "gewinn_und_ausgaben_pro_getränk_pie.png", dpi=500, bbox_inches="tight")
+    paths.append(save_plot("gewinn_und_ausgaben_pro_getränk_pie.png", dpi=500, bbox_inches="tight"))
 
     # Second plot: stacked bar chart
     # TODO: Anders stacken: Ausgaben, Einnahmen, theoretische einnahmen
@@ -283,10 +268,13 @@ def plot_beverage_profit_and_turnover_piecharts(crates: list[AnalyzedBeverageCra
     ax.set_xticklabels(labels)  # type:ignore[operator]
     ax.legend()
     plt.tight_layout()
-    plt.savefig(plot_output_dir / "gewinn_und_ausgaben_pro_getränk_bar.png", dpi=400, bbox_inches="tight")
+    paths.append(save_plot("gewinn_und_ausgaben_pro_getränk_bar.png", dpi=400, bbox_inches="tight"))
+
+    return paths
 
 
-def plot_beverage_consumption_over_time(invoices: list[GrihedInvoice]) -> None:
+def plot_beverage_consumption_over_time(invoices: list[InvoiceRow]) -> list[Path]:
+    paths = []
     interval_days = 14
     grouped_invoices = group_invoices_by_time_interval(invoices, interval_days)
 
@@ -304,7 +292,7 @@ def plot_beverage_consumption_over_time(invoices: list[GrihedInvoice]) -> None:
     ax.xaxis.set_major_locator(mdates.MonthLocator())
     ax.yaxis.set_major_locator(plt.MultipleLocator(1000))  # type:ignore[attr-defined]
     plt.tight_layout()
-    plt.savefig(plot_output_dir / "gewinn_und_ausgaben_line.png", dpi=400, bbox_inches="tight")
+    paths.append(save_plot("gewinn_und_ausgaben_line.png", dpi=400, bbox_inches="tight"))
 
     # Second plot: Line chart per category
     fig, ax = plt.subplots(figsize=(12, 6))
@@ -319,7 +307,7 @@ def plot_beverage_consumption_over_time(invoices: list[GrihedInvoice]) -> None:
     ax.xaxis.set_major_locator(mdates.MonthLocator())
     ax.yaxis.set_major_locator(plt.MultipleLocator(500))  # type:ignore[attr-defined]
     plt.tight_layout()
-    plt.savefig(plot_output_dir / "gewinn_pro_kategorie_line.png", dpi=400, bbox_inches="tight")
+    paths.append(save_plot("gewinn_pro_kategorie_line.png", dpi=400, bbox_inches="tight"))
 
     fig, ax = plt.subplots(figsize=(12, 6))
     for category, (color, ids) in beverage_categories.items():
@@ -333,10 +321,12 @@ def plot_beverage_consumption_over_time(invoices: list[GrihedInvoice]) -> None:
     ax.xaxis.set_major_locator(mdates.MonthLocator())
     ax.yaxis.set_major_locator(plt.MultipleLocator(1000))  # type:ignore[attr-defined]
     plt.tight_layout()
-    plt.savefig(plot_output_dir / "ausgaben_pro_kategorie_line.png", dpi=400, bbox_inches="tight")
+    paths.append(save_plot("ausgaben_pro_kategorie_line.png", dpi=400, bbox_inches="tight"))
+
+    return paths
 
 
-def plot_shila_value(current_account_balance: Decimal, inventory_value_when_sold: Decimal, tips: Decimal, debts_to_shila: Decimal, kleingeld: Decimal) -> None:
+def plot_shila_value(current_account_balance: Decimal, inventory_value_when_sold: Decimal, tips: Decimal, debts_to_shila: Decimal, kleingeld: Decimal) -> Path:
     actual_account_balance = current_account_balance - tips
     labels = ["Kontostand", "Trinkgeld", "Schulden", "Kleingeld", "Inventar"]
     values = [float(actual_account_balance), float(tips), float(debts_to_shila), float(kleingeld), float(inventory_value_when_sold)]
@@ -349,10 +339,10 @@ def plot_shila_value(current_account_balance: Decimal, inventory_value_when_sold
     ax.pie(values, labels=labels, colors=colors, autopct=autopct_pie_format_with_number(values), startangle=140, labeldistance=1.04, textprops={"fontsize": "16"})
     # ax.set_title(f"Wert des Shilas", fontsize="23")
     plt.tight_layout()
-    plt.savefig(plot_output_dir / "shila_wert.png", dpi=400, bbox_inches="tight", transparent=True)
+    return save_plot("shila_wert.png", dpi=400, bbox_inches="tight", transparent=True)
 
 
-def plot_turnover_categories(_turnover_per_category: dict[ShilaBookingCategory, Decimal]) -> None:
+def plot_turnover_categories(_turnover_per_category: dict[ShilaBookingCategory, Decimal]) -> Path:
     too_little_to_plot = {ShilaBookingCategory.hosting, ShilaBookingCategory.chocholate, ShilaBookingCategory.dm}
     turnover_per_category = {category.value: abs(float(turnover)) for category, turnover in _turnover_per_category.items() if category not in too_little_to_plot}
     turnover_per_category[ShilaBookingCategory.other.value] += sum(float(_turnover_per_category.get(category, 0)) for category in too_little_to_plot)
@@ -378,4 +368,4 @@ def plot_turnover_categories(_turnover_per_category: dict[ShilaBookingCategory,
     plt.grid(True)
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.savefig(plot_output_dir / "konto_ausgaben_pro_kategorie_pie.png", dpi=400, bbox_inches="tight", transparent=True)
+    return save_plot("konto_ausgaben_pro_kategorie_pie.png", dpi=400, bbox_inches="tight", transparent=True)
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import re
-import time
 from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
+from typing import Iterable
 
 import pytz
 from math import isclose
@@ -12,8 +12,10 @@ from pypdf import PdfReader
 
 from shila_lager.frontend.apps.bestellung.crud import get_beverage_crates, get_sorted_grihed_prices, get_sorted_sale_prices
 from shila_lager.frontend.apps.bestellung.models import BeverageCrate, GrihedPrice, SalePrice
-from shila_lager.frontend.apps.rechnungen.crud import create_invoice, get_grihed_invoices
+from shila_lager.frontend.apps.bestellung.orders import bump_catalogue_version
+from shila_lager.frontend.apps.rechnungen.crud import create_invoice, get_grihed_invoices, get_invoice_calculated_total_price
 from shila_lager.frontend.apps.rechnungen.models import GrihedInvoice
+from shila_lager.profiling import profile_stage
 from shila_lager.settings import manual_upload_dir, logger
 from shila_lager.utils import german_price_to_decimal
 
@@ -37,9 +39,17 @@ item_regex = re.compile((
 # @formatter:on
 
 
-def import_grihed_pdf(pdf_path: Path, beverages: dict[str, BeverageCrate], grihed_prices: defaultdict[str, list[GrihedPrice]], sale_prices: defaultdict[str, list[SalePrice]], existing_invoices: set[GrihedInvoice]) -> GrihedInvoice | None:
+def extract_grihed_text(pdf_path: Path) -> str:
+    """Extract the layout text of a Grihed invoice. Files ending in `.txt` are treated as already extracted text."""
+    if pdf_path.suffix.lower() == ".txt":
+        return pdf_path.read_text()
+
     reader = PdfReader(pdf_path)
-    pdf = "\n\n\n".join(page.extract_text(extraction_mode="layout") for page in reader.pages)
+    return "\n\n\n".join(page.extract_text(extraction_mode="layout") for page in reader.pages)
+
+
+def import_grihed_pdf(pdf_path: Path, beverages: dict[str, BeverageCrate], grihed_prices: defaultdict[str, list[GrihedPrice]], sale_prices: defaultdict[str, list[SalePrice]], existing_invoices: set[GrihedInvoice]) -> GrihedInvoice | None:
+    pdf = extract_grihed_text(pdf_path)
 
     invoice_numbers, _date, _total_price = invoice_number_regex.search(pdf), date_regex.search(pdf), total_price_regex.search(pdf)
     unparsed_items = item_regex.findall(pdf)
@@ -67,10 +77,11 @@ def import_grihed_pdf(pdf_path: Path, beverages: dict[str, BeverageCrate], grihe
     if invoice is None:
         return None
 
-    if not isclose(sum(item.calculated_total_price for item in invoice.items.all()), total_price):
+    if not isclose(get_invoice_calculated_total_price(invoice), total_price):
+        items = invoice.items.select_related("beverage", "purchase_price")
         logger.error(
             f"\nTotal price mismatch in {pdf_path}:\n" +
-            "\n".join(f'    {item.beverage.name}: expected {item.total_price}, got {item.calculated_total_price}' for item in invoice.items.all() if not isclose(item.calculated_total_price, item.total_price)) +
+            "\n".join(f'    {item.beverage.name}: expected {item.total_price}, got {item.calculated_total_price}' for item in items if not isclose(item.calculated_total_price, item.total_price)) +
             "\n\n"
         )
         return None
@@ -78,13 +89,18 @@ def import_grihed_pdf(pdf_path: Path, beverages: dict[str, BeverageCrate], grihe
     return invoice
 
 
-def import_all_grihed_pdfs() -> list[GrihedInvoice]:
-    beverages, grihed_prices, sale_prices, invoices = get_beverage_crates(), get_sorted_grihed_prices(), get_sorted_sale_prices(), get_grihed_invoices()
-    s = time.perf_counter()
+def import_all_grihed_pdfs(paths: Iterable[Path] | None = None) -> list[GrihedInvoice]:
+    """Import the files in `paths`, or all files of the upload directory. Files that were already imported are skipped."""
+    with profile_stage("Load beverages, prices and invoices"):
+        beverages, grihed_prices, sale_prices, invoices = get_beverage_crates(), get_sorted_grihed_prices(), get_sorted_sale_prices(), get_grihed_invoices()
+
     items = []
+    with profile_stage("Import Grihed PDFs"):
+        for pdf_path in paths if paths is not None else (manual_upload_dir / "Grihed").iterdir():
+            items.append(import_grihed_pdf(pdf_path, beverages, grihed_prices, sale_prices, invoices))
 
-    for pdf_path in (manual_upload_dir / "Grihed").iterdir():
-        items.append(import_grihed_pdf(pdf_path, beverages, grihed_prices, sale_prices, invoices))
+    imported = [it for it in items if it is not None]
+    if imported:
+        bump_catalogue_version()
 
-    logger.info(f"Importing all Grihed PDFs ({len(items)}) took {time.perf_counter() - s:3f}s")
-    return [it for it in items if it is not None]
+    return imported
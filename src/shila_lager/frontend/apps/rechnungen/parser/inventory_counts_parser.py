@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Iterable
 
 import yaml
 from dateutil.parser import parse
@@ -6,8 +7,11 @@ from pytz import UTC
 
 from shila_lager.frontend.apps.bestellung.crud import get_beverage_crates
 from shila_lager.frontend.apps.bestellung.models import BeverageCrate
+from shila_lager.frontend.apps.bestellung.orders import bump_catalogue_version
 from shila_lager.frontend.apps.rechnungen.crud import get_inventory_counts
+from shila_lager.frontend.apps.rechnungen.forecast import refresh_demand_forecasts
 from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount, ShilaInventoryCountDetail
+from shila_lager.profiling import profile_stage
 from shila_lager.settings import manual_upload_dir, logger
 from shila_lager.utils import parse_numeric
 
@@ -55,10 +59,20 @@ def import_lager_file(file: Path, inventory_counts: set[ShilaInventoryCount], be
         ShilaInventoryCountDetail.objects.bulk_create(details)
         inventory_count.save()
 
-    return None
+    return inventory_count
 
 
-def import_lager_counts() -> None:
+def import_lager_counts(paths: Iterable[Path] | None = None) -> list[ShilaInventoryCount]:
+    """Import the files in `paths`, or all files of the upload directory. Files that were already imported are skipped."""
     files, beverages, inventory_counts = [], get_beverage_crates(), get_inventory_counts()
-    for file in (manual_upload_dir / "Lagerzählungen").iterdir():
-        files.append(import_lager_file(file, inventory_counts, beverages))
+    with profile_stage("Import Lagerzählungen"):
+        for file in paths if paths is not None else (manual_upload_dir / "Lagerzählungen").iterdir():
+            files.append(import_lager_file(file, inventory_counts, beverages))
+
+    imported = [it for it in files if it is not None]
+
+    # This also builds the forecasts for databases that were imported before they existed
+    refresh_demand_forecasts(since=min((it.date for it in imported), default=None))
+    bump_catalogue_version()
+
+    return imported
@@ -1,11 +1,15 @@
 import csv
-import time
 from datetime import datetime
 from pathlib import Path
-
-from shila_lager.frontend.apps.rechnungen.crud import get_shila_account_bookings, get_grihed_invoices
-from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, ShilaBookingKind
-from shila_lager.settings import manual_upload_dir, logger, grihed_creditor_id, grihed_mandate_reference, grihed_description, grihed_beneficiary_or_payer, grihed_iban, grihed_bic, grihed_currency, grihed_additional_info, grihed_booking_date_regex
+from typing import Iterable
+
+from shila_lager.frontend.apps.rechnungen.balance import refresh_daily_balances
+from shila_lager.frontend.apps.rechnungen.classification import get_booking_classifier
+from shila_lager.frontend.apps.rechnungen.crud import get_shila_account_bookings
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, ShilaBookingKind, DailyBalance, InvoicePaymentStatus
+from shila_lager.frontend.apps.rechnungen.reconciliation import link_invoice_payments, get_outstanding_invoices
+from shila_lager.profiling import profile_stage
+from shila_lager.settings import manual_upload_dir, logger, grihed_creditor_id, grihed_mandate_reference, grihed_description, grihed_beneficiary_or_payer, grihed_iban, grihed_bic, grihed_currency, grihed_additional_info
 from shila_lager.utils import german_price_to_decimal
 
 
@@ -57,55 +61,57 @@ def import_booking_csv(csv_path: Path) -> list[ShilaAccountBooking] | None:
 
         booking = ShilaAccountBooking(
             booking_date=booking_date, value_date=value_date, kind=booking_kind, description=description, creditor_id=creditor_id, mandate_reference=mandate_reference, customer_reference=customer_reference, collector_reference=collector_reference, original_amount=original_amount,
-            chargeback_amount=chargeback_amount, beneficiary_or_payer=beneficiary_or_payer, iban=iban, bic=bic, amount=amount, currency=currency, additional_info=additional_info
+            chargeback_amount=chargeback_amount, beneficiary_or_payer=beneficiary_or_payer, iban=iban, bic=bic, amount=amount, currency=currency, additional_info=additional_info,
         )
 
         if booking not in existing_bookings:
             bookings_to_create.append(booking)
             existing_bookings.add(booking)
 
+    get_booking_classifier().classify_bookings(bookings_to_create)
     return ShilaAccountBooking.objects.bulk_create(bookings_to_create)
 
 
-def import_grihed_non_booked_items() -> list[ShilaAccountBooking]:
-    invoices = get_grihed_invoices()
-    bookings = get_shila_account_bookings()
-    booked_invoice_numbers: set[str] = set()
-
-    # First pass: Remove old temp bookings
-    for booking in bookings:
-        if booking.beneficiary_or_payer != grihed_beneficiary_or_payer:
-            continue
-
-        if booking.is_temp:
-            booking.delete()
-            continue
-
-        booked_invoice_numbers.update({it for it, _ in grihed_booking_date_regex.findall(booking.description)})
+def import_grihed_non_booked_items() -> tuple[list[ShilaAccountBooking], list[ShilaAccountBooking]]:
+    """Replace the temporary Grihed bookings of not yet booked invoices. Returns the (removed, added) temporary bookings."""
+    # The payments of the removed bookings are deleted with them
+    removed_bookings = list(ShilaAccountBooking.objects.filter(invoice_payments__status=InvoicePaymentStatus.temp).distinct())
+    ShilaAccountBooking.objects.filter(pk__in=[it.pk for it in removed_bookings]).delete()
 
-    # Second pass: Add new temp bookings
+    # Add new temp bookings for every invoice that is not booked, or whose Lastschrift was returned
     bookings_to_add = []
-    for invoice in invoices:
-        if invoice.invoice_number in booked_invoice_numbers:
-            continue
-
+    for invoice in get_outstanding_invoices().order_by("date", "invoice_number"):
+        description = grihed_description(invoice.invoice_number, invoice.date)
         bookings_to_add.append(ShilaAccountBooking(
-            booking_date=datetime.now().date(), value_date=datetime.now().date(), kind=ShilaBookingKind.lastschrift, description=grihed_description(invoice.invoice_number, invoice.date),
+            booking_date=datetime.now().date(), value_date=datetime.now().date(), kind=ShilaBookingKind.lastschrift, description=description,
             creditor_id=grihed_creditor_id, mandate_reference=grihed_mandate_reference, customer_reference=None, collector_reference=None, original_amount=None, chargeback_amount=None,
-            beneficiary_or_payer=grihed_beneficiary_or_payer, iban=grihed_iban, bic=grihed_bic, amount=-invoice.total_price, currency=grihed_currency, additional_info=grihed_additional_info
+            beneficiary_or_payer=grihed_beneficiary_or_payer, iban=grihed_iban, bic=grihed_bic, amount=-invoice.total_price, currency=grihed_currency, additional_info=grihed_additional_info,
         ))
         # logger.info(f"Added booking for {invoice.invoice_number} ({invoice.date})")
 
-    return ShilaAccountBooking.objects.bulk_create(bookings_to_add)
+    get_booking_classifier().classify_bookings(bookings_to_add)
+    added_bookings = ShilaAccountBooking.objects.bulk_create(bookings_to_add)
+    link_invoice_payments(added_bookings)
+
+    return removed_bookings, added_bookings
 
 
-def import_bookings() -> list[ShilaAccountBooking]:
-    s = time.perf_counter()
+def import_bookings(paths: Iterable[Path] | None = None) -> list[ShilaAccountBooking]:
+    """Import the files in `paths`, or all files of the upload directory. Files that were already imported are skipped."""
     items = []
-    for csv_path in (manual_upload_dir / "Sparkasse").iterdir():
-        items.append(import_booking_csv(csv_path))
+    with profile_stage("Import Sparkasse CSVs"):
+        for csv_path in paths if paths is not None else (manual_upload_dir / "Sparkasse").iterdir():
+            items.append(import_booking_csv(csv_path))
+
+    imported = [it for item in items if item is not None for it in item]
+    with profile_stage("Link Grihed invoice payments"):
+        link_invoice_payments(imported)
+
+    with profile_stage("Update temporary Grihed bookings"):
+        removed_temp_bookings, added_temp_bookings = import_grihed_non_booked_items()
 
-    import_grihed_non_booked_items()
+    changed = imported + removed_temp_bookings + added_temp_bookings
+    if changed or not DailyBalance.objects.exists():
+        refresh_daily_balances(since=min((min(it.booking_date, it.actual_booking_date()) for it in changed), default=None))
 
-    logger.info(f"Importing all Bookings took {time.perf_counter() - s:3f}s")
-    return [it for item in items if item is not None for it in item]
+    return imported
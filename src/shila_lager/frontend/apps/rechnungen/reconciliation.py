@@ -0,0 +1,59 @@
+"""
+Which Grihed invoices are paid.
+
+Grihed debits every invoice with a Lastschrift whose description contains the invoice number and date (see `grihed_booking_date_regex`), returned Lastschriften are booked as LS Wiedergutschrift.
+The descriptions are parsed once when the bookings are imported, the links are stored in `GrihedInvoicePayment`.
+An invoice is covered if it has more Lastschriften (or temporary bookings) than Wiedergutschriften, everything else is outstanding debt to Grihed.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable
+
+from django.db.models import Sum, Case, When, Value, OuterRef, Subquery, QuerySet, IntegerField
+from django.db.models.functions import Coalesce
+
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, GrihedInvoice, GrihedInvoicePayment, InvoicePaymentStatus, parse_invoice_payments
+from shila_lager.utils import zero
+
+
+def link_invoice_payments(bookings: Iterable[ShilaAccountBooking]) -> list[GrihedInvoicePayment]:
+    """Has to be called for every newly created booking, bookings that are not from Grihed are skipped. Deleted bookings delete their payments."""
+    return GrihedInvoicePayment.objects.bulk_create([
+        GrihedInvoicePayment(booking=booking, invoice_number=number, invoice_date=invoice_date, status=status)
+        for booking in bookings
+        for number, invoice_date, status in parse_invoice_payments(booking.beneficiary_or_payer, booking.kind, booking.description)
+    ])
+
+
+def _net_payments() -> Sum:
+    return Sum(Case(When(status=InvoicePaymentStatus.undone, then=Value(-1)), default=Value(1)), output_field=IntegerField())
+
+
+def get_outstanding_invoices(start: datetime | None = None, end: datetime | None = None) -> QuerySet[GrihedInvoice]:
+    """The invoices between `start` and `end` (inclusive) that are neither paid nor have a temporary booking"""
+    net_payments = GrihedInvoicePayment.objects.filter(invoice_number=OuterRef("invoice_number")).values("invoice_number").annotate(net=_net_payments()).values("net")
+    invoices = GrihedInvoice.objects.annotate(net_payments=Coalesce(Subquery(net_payments), 0)).filter(net_payments__lte=0)
+    if start is not None:
+        invoices = invoices.filter(date__gte=start.date())
+    if end is not None:
+        invoices = invoices.filter(date__lte=end.date())
+
+    return invoices
+
+
+def get_grihed_debt(start: datetime | None = None, end: datetime | None = None) -> Decimal:
+    return get_outstanding_invoices(start, end).aggregate(debt=Sum("total_price"))["debt"] or zero
+
+
+def get_unknown_invoice_payments(start: datetime | None = None, end: datetime | None = None) -> QuerySet[GrihedInvoicePayment]:
+    """Payments of invoices from `start` to `end` (by the date in the booking) that were not imported"""
+    invoices = GrihedInvoice.objects.all()
+    payments = GrihedInvoicePayment.objects.order_by("booking__booking_date", "booking_id", "id")
+    if start is not None:
+        invoices, payments = invoices.filter(date__gte=start.date()), payments.filter(invoice_date__gte=start.date())
+    if end is not None:
+        invoices, payments = invoices.filter(date__lte=end.date()), payments.filter(invoice_date__lte=end.date())
+
+    return payments.exclude(invoice_number__in=invoices.values("invoice_number"))
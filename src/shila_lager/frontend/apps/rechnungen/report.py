@@ -0,0 +1,54 @@
+"""
+Machine-readable output of `weekly-digest` and `mv-abrechnung`.
+
+Every analysed window is one record, which is written as soon as the window is computed.
+JSON is written as one object per line, CSV as one `start,end,section,name,field,value` row per value, so both can be read while the report is still running.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import sys
+from datetime import datetime
+from enum import Enum
+from typing import Any, TextIO
+
+
+class ReportFormat(Enum):
+    text = "text"  # The coloured output for humans
+    json = "json"
+    csv = "csv"
+
+
+def report_record(start: datetime | None, end: datetime | None, **sections: dict[str, Any]) -> dict[str, Any]:
+    """A section maps names either to values or, like the beverages, to a dict of fields"""
+    return {"start": start.isoformat() if start else None, "end": end.isoformat() if end else None} | sections
+
+
+class ReportWriter:
+    def __init__(self, output_format: ReportFormat, file: TextIO | None = None) -> None:
+        self.output_format = output_format
+        self.file = file or sys.stdout
+        self.csv_writer = csv.writer(self.file) if output_format == ReportFormat.csv else None
+
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(["start", "end", "section", "name", "field", "value"])
+
+    def write(self, record: dict[str, Any]) -> None:
+        assert self.output_format != ReportFormat.text, "The text output is printed by the reports themselves"
+        if self.csv_writer is None:
+            self.file.write(json.dumps(record) + "\n")
+        else:
+            start, end = record["start"] or "", record["end"] or ""
+            for section, values in record.items():
+                if section in {"start", "end"}:
+                    continue
+
+                for name, value in values.items():
+                    if isinstance(value, dict):
+                        self.csv_writer.writerows([start, end, section, name, field, it] for field, it in value.items())
+                    else:
+                        self.csv_writer.writerow([start, end, section, "", name, value])
+
+        # Written as soon as the window is done, also when stdout is a pipe
+        self.file.flush()
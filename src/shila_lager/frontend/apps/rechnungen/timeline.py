@@ -0,0 +1,159 @@
+"""
+The estimated stock of every crate on every day, interpolated between the inventory counts.
+
+Between two counts, the consumption of a window is `old - new + delivered` (see `analyze.calculate_num_sold`), which is spread evenly over its days.
+The invoice items are delivered on their invoice date, so the stock jumps up on that day.
+The cumulative consumption and deliveries are stored as well, so the consumption between any two days is a difference of two entries.
+
+The timeline is stored in `inventory_timeline_file` once it is used. The imports only discard it, so they do not pay for a timeline nobody reads.
+"""
+from __future__ import annotations
+
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import pairwise
+from typing import DefaultDict
+
+import numpy as np
+import numpy.typing as npt
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate, BottleType
+from shila_lager.frontend.apps.rechnungen.models import GrihedInvoiceItem, ShilaInventoryCount, ShilaInventoryCountDetail
+from shila_lager.profiling import profile_stage
+from shila_lager.settings import inventory_timeline_file
+from shila_lager.utils import BeverageID
+
+
+def _day(it: date | datetime) -> date:
+    return it.date() if isinstance(it, datetime) else it
+
+
+@dataclass
+class InventoryTimeline:
+    start: date
+    crate_ids: list[BeverageID]
+    count_days: list[date]
+
+    # (crates, days) from `start` to the last count day
+    stock: npt.NDArray[np.float64]  # At the end of the day
+    consumed: npt.NDArray[np.float64]  # Cumulative since `start`
+    delivered: npt.NDArray[np.float64]  # Cumulative since `start`
+
+    rows: dict[BeverageID, int] = field(init=False, repr=False)
+    out_of_stock: npt.NDArray[np.int64] = field(init=False, repr=False)  # Cumulative number of days with no stock
+
+    def __post_init__(self) -> None:
+        self.rows = {id: i for i, id in enumerate(self.crate_ids)}
+        self.out_of_stock = np.cumsum(self.stock <= 0, axis=1)
+
+    @property
+    def end(self) -> date:
+        return self.count_days[-1]
+
+    def _index(self, day: date | datetime) -> int | None:
+        index = (_day(day) - self.start).days
+        return index if 0 <= index < self.stock.shape[1] else None
+
+    def stock_at(self, crate_id: BeverageID, day: date | datetime) -> float | None:
+        """`None` for unknown crates and days outside the counted range"""
+        row, index = self.rows.get(crate_id), self._index(day)
+        return None if row is None or index is None else float(self.stock[row, index])
+
+    def consumption_between(self, crate_id: BeverageID, start: date | datetime, end: date | datetime) -> float | None:
+        """The consumption in (start, end]"""
+        row, first, last = self.rows.get(crate_id), self._index(start), self._index(end)
+        return None if row is None or first is None or last is None else float(self.consumed[row, last] - self.consumed[row, first])
+
+    def consumption_rate(self, crate_id: BeverageID, start: date | datetime, end: date | datetime) -> float | None:
+        """Crates per day in (start, end]"""
+        consumption, days = self.consumption_between(crate_id, start, end), (_day(end) - _day(start)).days
+        return None if consumption is None or days <= 0 else consumption / days
+
+    def days_out_of_stock(self, crate_id: BeverageID, start: date | datetime, end: date | datetime) -> int | None:
+        """The number of days in (start, end] the crate was (estimated to be) sold out"""
+        row, first, last = self.rows.get(crate_id), self._index(start), self._index(end)
+        return None if row is None or first is None or last is None else int(self.out_of_stock[row, last] - self.out_of_stock[row, first])
+
+    @classmethod
+    def load(cls) -> InventoryTimeline | None:
+        if not inventory_timeline_file.exists():
+            return None
+
+        with np.load(inventory_timeline_file) as data:
+            return cls(
+                start=data["start"].item(), crate_ids=data["crate_ids"].tolist(), count_days=data["count_days"].tolist(),
+                stock=data["stock"], consumed=data["consumed"], delivered=data["delivered"],
+            )
+
+    def save(self) -> None:
+        # Written to a temporary file first, so readers never see a partial file
+        temporary = inventory_timeline_file.with_name(f".{inventory_timeline_file.name}.tmp")
+        with temporary.open("wb") as f:
+            np.savez(
+                f, start=np.datetime64(self.start, "D"), crate_ids=np.array(self.crate_ids, dtype=str), count_days=np.array(self.count_days, dtype="datetime64[D]"),
+                stock=self.stock, consumed=self.consumed, delivered=self.delivered,
+            )
+        os.replace(temporary, inventory_timeline_file)
+
+
+def _load_counts() -> tuple[list[date], dict[date, dict[BeverageID, Decimal]]]:
+    """The days of the counts and the counted crates. If there are multiple counts on a day, the last one is used."""
+    last_count_of_day = {it.date(): it for it in ShilaInventoryCount.objects.order_by("date").values_list("date", flat=True)}
+    days = sorted(last_count_of_day)
+
+    inventory: DefaultDict[date, dict[BeverageID, Decimal]] = defaultdict(dict)
+    for count_date, crate_id, count in ShilaInventoryCountDetail.objects.filter(date__in=last_count_of_day.values()).values_list("date_id", "crate_id", "count"):
+        inventory[count_date.date()][crate_id] = count
+
+    return days, inventory
+
+
+def build_inventory_timeline(crate_ids: list[BeverageID], count_days: list[date], inventory: dict[date, dict[BeverageID, Decimal]]) -> InventoryTimeline:
+    """The timeline from the first to the last of `count_days`, with the deliveries in between"""
+    start, num_days, rows = count_days[0], (count_days[-1] - count_days[0]).days + 1, {id: i for i, id in enumerate(crate_ids)}
+
+    daily_deliveries = np.zeros((len(crate_ids), num_days))
+    items = GrihedInvoiceItem.objects.filter(invoice__date__gt=start, invoice__date__lte=count_days[-1], beverage_id__in=crate_ids).values_list("invoice__date", "beverage_id", "quantity")
+    for invoice_date, crate_id, quantity in items:
+        daily_deliveries[rows[crate_id], (invoice_date - start).days] += quantity
+    delivered = np.cumsum(daily_deliveries, axis=1)
+
+    counted = np.array([[float(inventory.get(day, {}).get(id, 0)) for day in count_days] for id in crate_ids]).reshape(len(crate_ids), len(count_days))
+    stock, consumed = np.zeros((len(crate_ids), num_days)), np.zeros((len(crate_ids), num_days))
+    stock[:, 0] = counted[:, 0]
+
+    for i, (old, new) in enumerate(pairwise(count_days)):
+        first, last = (old - start).days, (new - start).days
+        window_delivered = delivered[:, first + 1:last + 1] - delivered[:, first:first + 1]
+        consumption = counted[:, i] - counted[:, i + 1] + window_delivered[:, -1]
+        window_consumed = consumption[:, None] * (np.arange(1, last - first + 1) / (last - first))[None, :]
+
+        stock[:, first + 1:last + 1] = counted[:, i:i + 1] + window_delivered - window_consumed
+        consumed[:, first + 1:last + 1] = consumed[:, first:first + 1] + window_consumed
+
+    return InventoryTimeline(start, crate_ids, count_days, stock, consumed, delivered)
+
+
+def refresh_inventory_timeline() -> InventoryTimeline | None:
+    """Build and store the timeline, returns `None` if there are less than two inventory counts"""
+    with profile_stage("Refresh inventory timeline"):
+        crate_ids = sorted(BeverageCrate.objects.filter(bottle_type__in=[it for it in BottleType if it.is_bottle]).values_list("id", flat=True))
+        count_days, inventory = _load_counts()
+        if len(count_days) < 2:
+            return None
+
+        timeline = build_inventory_timeline(crate_ids, count_days, inventory)
+        timeline.save()
+        return timeline
+
+
+def discard_inventory_timeline() -> None:
+    """Has to be called whenever inventory counts or invoices are imported, the next `get_inventory_timeline` builds it again"""
+    inventory_timeline_file.unlink(missing_ok=True)
+
+
+def get_inventory_timeline() -> InventoryTimeline | None:
+    return InventoryTimeline.load() or refresh_inventory_timeline()
@@ -4,4 +4,5 @@ from shila_lager.frontend.apps.rechnungen import views
 
 urlpatterns = [
     path("", views.index, name="rechnungen_index"),
+    path("<str:invoice_number>/", views.invoice_detail, name="rechnungen_invoice"),
 ]
@@ -0,0 +1,82 @@
+"""
+The value of the counted inventory, at the purchase and sale prices that were valid when it was counted.
+
+All prices are loaded once into a `PriceTable`, which finds the price of a crate at any time with a binary search over the dates the prices became valid.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import DefaultDict, Iterable
+
+from shila_lager.frontend.apps.bestellung.models import GrihedPrice, SalePrice
+from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount
+from shila_lager.settings import logger
+from shila_lager.utils import BeverageID, zero
+
+
+class _PriceHistory:
+    def __init__(self) -> None:
+        self.valid_from: list[datetime] = []
+        self.prices: list[Decimal] = []
+
+    def at(self, time: datetime) -> Decimal:
+        # Counts before the first known price are valued at that price, there is no better one
+        return self.prices[max(bisect_right(self.valid_from, time) - 1, 0)]
+
+
+class PriceTable:
+    def __init__(self) -> None:
+        self.purchase_prices: DefaultDict[BeverageID, _PriceHistory] = defaultdict(_PriceHistory)
+        self.sale_prices: DefaultDict[BeverageID, _PriceHistory] = defaultdict(_PriceHistory)
+
+    @classmethod
+    def load(cls) -> PriceTable:
+        """Two queries for all prices of all crates"""
+        table = cls()
+        for prices, rows in [
+            (table.purchase_prices, GrihedPrice.objects.values_list("crate_id", "valid_from", "price")),
+            (table.sale_prices, SalePrice.objects.values_list("crate_id", "valid_from", "price")),
+        ]:
+            for crate_id, valid_from, price in rows.order_by("crate_id", "valid_from"):
+                history = prices[crate_id]
+                history.valid_from.append(valid_from)
+                history.prices.append(price)
+
+        return table
+
+    def purchase_price_at(self, crate_id: BeverageID, time: datetime) -> Decimal | None:
+        return self.purchase_prices[crate_id].at(time) if crate_id in self.purchase_prices else None
+
+    def sale_price_at(self, crate_id: BeverageID, time: datetime) -> Decimal | None:
+        return self.sale_prices[crate_id].at(time) if crate_id in self.sale_prices else None
+
+
+@dataclass
+class InventoryValue:
+    date: datetime
+    purchase_value: Decimal  # What the counted crates cost
+    sale_value: Decimal  # What the counted crates are sold for
+
+
+def value_inventory_count(count: ShilaInventoryCount, prices: PriceTable) -> InventoryValue:
+    """The details of the count should be prefetched (see `crud.get_inventory_counts_between`)"""
+    purchase_value, sale_value = zero, zero
+    for detail in count.details.all():
+        purchase_price, sale_price = prices.purchase_price_at(detail.crate_id, count.date), prices.sale_price_at(detail.crate_id, count.date)
+        if purchase_price is None or sale_price is None:
+            logger.warning(f"{detail.crate_id} has no price, it is not included in the value of {count}")
+            continue
+
+        purchase_value += detail.count * purchase_price
+        sale_value += detail.count * sale_price
+
+    return InventoryValue(count.date, purchase_value, sale_value)
+
+
+def value_inventory_counts(counts: Iterable[ShilaInventoryCount], prices: PriceTable | None = None) -> dict[datetime, InventoryValue]:
+    prices = prices or PriceTable.load()
+    return {count.date: value_inventory_count(count, prices) for count in counts}
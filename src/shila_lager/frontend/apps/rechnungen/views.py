@@ -1,5 +1,37 @@
 from django.http import HttpRequest, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template import loader
+
+from shila_lager.frontend.apps.rechnungen.models import GrihedInvoice
+from shila_lager.frontend.pagination import keyset_paginate, get_date_parameter
 
 
 def index(request: HttpRequest, **kwargs: str) -> HttpResponse:
-    return HttpResponse("Hello, world. You're at the rechnungen index.")
+    invoices = GrihedInvoice.objects.all()
+
+    start, end = get_date_parameter(request, "start"), get_date_parameter(request, "end")
+    if start is not None:
+        invoices = invoices.filter(date__gte=start)
+    if end is not None:
+        invoices = invoices.filter(date__lte=end)
+
+    template = loader.get_template("rechnungen/index.html")
+    context = {
+        "invoices": keyset_paginate(request, invoices, "date"),
+        "start": start,
+        "end": end,
+    }
+
+    return HttpResponse(template.render(context, request))
+
+
+def invoice_detail(request: HttpRequest, invoice_number: str, **kwargs: str) -> HttpResponse:
+    invoice = get_object_or_404(GrihedInvoice, invoice_number=invoice_number)
+
+    template = loader.get_template("rechnungen/invoice.html")
+    context = {
+        "invoice": invoice,
+        "items": invoice.items.select_related("beverage", "purchase_price", "sale_price").order_by("beverage__name"),
+    }
+
+    return HttpResponse(template.render(context, request))
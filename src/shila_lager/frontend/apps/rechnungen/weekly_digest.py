@@ -1,37 +1,67 @@
 from collections import defaultdict
 from datetime import datetime
+from dataclasses import dataclass, fields
 from decimal import Decimal
 from itertools import pairwise
-from typing import Iterable, DefaultDict
+from typing import Any, Iterable, DefaultDict
 
 import numpy as np
 from math import isclose
 
 from shila_lager.frontend.apps.bestellung.crud import get_beverage_crates
 from shila_lager.frontend.apps.rechnungen.analyze import analyze_beverage_crates, pfand_scale_factor
+from shila_lager.frontend.apps.rechnungen.balance import BalanceHistory
 from shila_lager.frontend.apps.rechnungen.beverage_facts import digest_categories
-from shila_lager.frontend.apps.rechnungen.crud import get_inventory_counts, get_shila_account_bookings, get_grihed_invoices
-from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount, ShilaAccountBooking, ShilaBookingCategory, AnalyzedBeverageCrate, ShilaBookingKind
+from shila_lager.frontend.apps.rechnungen.crud import get_inventory_counts_between, get_grihed_invoices, get_invoice_item_rows_by_beverage
+from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount, BookingRow, ShilaBookingCategory, AnalyzedBeverageCrate, ShilaBookingKind
+from shila_lager.frontend.apps.rechnungen.report import ReportFormat, ReportWriter, report_record
+from shila_lager.frontend.apps.rechnungen.valuation import InventoryValue, value_inventory_counts
+from shila_lager.profiling import profile_stage
 from shila_lager.settings import bright_color, reset_color, underline_color
 from shila_lager.utils import parse_numeric, reverse_dict, filter_by_date, BeverageID
 
 
-def output_value(old: ShilaInventoryCount, new: ShilaInventoryCount, bookings: Iterable[ShilaAccountBooking], analyzed_crates: dict[BeverageID, AnalyzedBeverageCrate]) -> tuple[Decimal, Decimal, Decimal, Decimal]:
-    old_balance = sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date(), None, old.date))
-    new_balance = sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date(), None, new.date))
+@dataclass
+class WindowValue:
+    """The (expected) profit and income in the window between two inventory counts"""
+    old_value: Decimal
+    new_value: Decimal
 
-    old_inventory_value = sum(detail.count * detail.crate.current_purchase_price() for detail in old.details.all())
-    new_inventory_value = sum(detail.count * detail.crate.current_purchase_price() for detail in new.details.all())
+    profit: Decimal
+    profit_with_extra_expenses: Decimal
+    expected_profit: Decimal
+    expected_profit_without_deposits: Decimal
+    expected_profit_with_payed_but_not_returned_deposits: Decimal
 
-    profit = new_balance + new_inventory_value + new.other_monetary_value - old_balance - old_inventory_value - old.other_monetary_value
-    profit_with_extra_expenses = profit + sum(parse_numeric(it) for it in new.extra_expenses.values())
-    expected_profit = sum(crate.total_profit for crate in analyzed_crates.values())
-    expected_profit_without_deposits = sum(crate.total_profit_without_deposits for crate in analyzed_crates.values())
-    expected_profit_with_payed_but_not_returned_deposits = sum(crate.total_profit_with_payed_but_not_returned_deposits for crate in analyzed_crates.values())
+    expected_income: Decimal
+    actual_income: Decimal
+
+    def to_json(self) -> dict[str, str]:
+        return {it.name: f"{getattr(self, it.name):.2f}" for it in fields(self)}
+
+
+def compute_window_value(old: ShilaInventoryCount, new: ShilaInventoryCount, balances: BalanceHistory, analyzed_crates: dict[BeverageID, AnalyzedBeverageCrate], inventory_values: dict[datetime, InventoryValue]) -> WindowValue:
+    """`inventory_values` has to contain both counts, see `valuation.value_inventory_counts`"""
+    old_balance, new_balance = balances.at(old.date), balances.at(new.date)
+    old_inventory_value, new_inventory_value = inventory_values[old.date].purchase_value, inventory_values[new.date].purchase_value
 
-    expected_income = sum(crate.num_sold * crate.beverage.current_sale_price() + crate.total_deposit_returned for crate in analyzed_crates.values())
-    actual_income = new.money_in_safe + new.other_monetary_value - old.other_monetary_value
+    profit = new_balance + new_inventory_value + new.other_monetary_value - old_balance - old_inventory_value - old.other_monetary_value
 
+    return WindowValue(
+        old_value=Decimal(old_balance + old_inventory_value),
+        new_value=Decimal(new_balance + new_inventory_value),
+        profit=Decimal(profit),
+        profit_with_extra_expenses=Decimal(profit + sum(parse_numeric(it) for it in new.extra_expenses.values())),
+        expected_profit=Decimal(sum(crate.total_profit for crate in analyzed_crates.values())),
+        expected_profit_without_deposits=Decimal(sum(crate.total_profit_without_deposits for crate in analyzed_crates.values())),
+        expected_profit_with_payed_but_not_returned_deposits=Decimal(sum(crate.total_profit_with_payed_but_not_returned_deposits for crate in analyzed_crates.values())),
+        expected_income=Decimal(sum(crate.num_sold * crate.beverage.current_sale_price() + crate.total_deposit_returned for crate in analyzed_crates.values())),
+        actual_income=Decimal(new.money_in_safe + new.other_monetary_value - old.other_monetary_value),
+    )
+
+
+def output_value(old: ShilaInventoryCount, new: ShilaInventoryCount, balances: BalanceHistory, analyzed_crates: dict[BeverageID, AnalyzedBeverageCrate], inventory_values: dict[datetime, InventoryValue]) -> tuple[Decimal, Decimal, Decimal, Decimal]:
+    value = compute_window_value(old, new, balances, analyzed_crates, inventory_values)
     has_extra_expenses = new.extra_expenses
 
     print(f"\n{bright_color}{underline_color}Auswertung vom {old.date.strftime('%Y-%m-%d')} bis {new.date.strftime('%Y-%m-%d')}:{reset_color}")
@@ -41,26 +71,26 @@ def output_value(old: ShilaInventoryCount, new: ShilaInventoryCount, bookings: I
     # print(f"Aktueller Kontostand:\t{new_balance:.2f}€")
     # print(f"Aktueller Lagerwert:\t{new_inventory_value:.2f}€")
     # print()
-    print(f"Vorheriger Wert:\t{old_balance + old_inventory_value:.2f}€")
-    print(f"Aktueller Wert:\t\t{new_balance + new_inventory_value:.2f}€")
+    print(f"Vorheriger Wert:\t{value.old_value:.2f}€")
+    print(f"Aktueller Wert:\t\t{value.new_value:.2f}€")
     print("─" * 33)
-    print(f"{'Eigentlicher ' if has_extra_expenses else ''}Profit:{chr(9) * 2 if not has_extra_expenses else ''}\t{profit_with_extra_expenses:.2f}€")
-    print(f"Erwarteter Profit:\t{expected_profit:.2f}€")
-    print(f"(ohne Pfand):\t\t{expected_profit_without_deposits:.2f}€")
-    print(f"(Faktor {pfand_scale_factor}):\t\t{expected_profit_with_payed_but_not_returned_deposits:.2f}€")
+    print(f"{'Eigentlicher ' if has_extra_expenses else ''}Profit:{chr(9) * 2 if not has_extra_expenses else ''}\t{value.profit_with_extra_expenses:.2f}€")
+    print(f"Erwarteter Profit:\t{value.expected_profit:.2f}€")
+    print(f"(ohne Pfand):\t\t{value.expected_profit_without_deposits:.2f}€")
+    print(f"(Faktor {pfand_scale_factor}):\t\t{value.expected_profit_with_payed_but_not_returned_deposits:.2f}€")
 
     # TODO: Diese Darstellung ist ein wenig verwirrend, da erwarteter profit mit profit ähnlich sein sollten
-    print(f"\nSchwund:          \t{expected_profit - profit_with_extra_expenses:.2f}€")
+    print(f"\nSchwund:          \t{value.expected_profit - value.profit_with_extra_expenses:.2f}€")
 
-    print(f"\nErwartete Einnahmen:\t{expected_income:.2f}€")
-    print(f"Tatsächliche Einnahmen:\t{actual_income:.2f}€")
+    print(f"\nErwartete Einnahmen:\t{value.expected_income:.2f}€")
+    print(f"Tatsächliche Einnahmen:\t{value.actual_income:.2f}€")
 
     if has_extra_expenses:
-        print(f"\nSonderausgaben:\t\t{profit_with_extra_expenses - profit:.2f}€")
-        for name, value in new.extra_expenses.items():
-            print(f"  - {name}: {f'{value.strip()} = ' if isinstance(value, str) else ''}{parse_numeric(value):.2f}€")
+        print(f"\nSonderausgaben:\t\t{value.profit_with_extra_expenses - value.profit:.2f}€")
+        for name, expense in new.extra_expenses.items():
+            print(f"  - {name}: {f'{expense.strip()} = ' if isinstance(expense, str) else ''}{parse_numeric(expense):.2f}€")
 
-    return Decimal(profit_with_extra_expenses), Decimal(expected_profit_without_deposits - profit_with_extra_expenses), Decimal(expected_profit - profit_with_extra_expenses), Decimal(expected_profit_with_payed_but_not_returned_deposits - profit_with_extra_expenses)
+    return value.profit_with_extra_expenses, value.expected_profit_without_deposits - value.profit_with_extra_expenses, value.expected_profit - value.profit_with_extra_expenses, value.expected_profit_with_payed_but_not_returned_deposits - value.profit_with_extra_expenses
 
 
 def output_beverage_consumption_and_expected_profit(analyzed_beverage_crates: dict[BeverageID, AnalyzedBeverageCrate]) -> None:
@@ -101,17 +131,23 @@ def output_beverage_consumption_and_expected_profit(analyzed_beverage_crates: di
     pass
 
 
-def output_income_and_expenses(old: ShilaInventoryCount, new: ShilaInventoryCount, bookings: Iterable[ShilaAccountBooking]) -> None:
-    total_profit = sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date(), old.date, new.date))
-    total_expenses = -sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date(), old.date, new.date) and booking.amount < 0)
-    total_money_in = sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date(), old.date, new.date) and booking.amount > 0)
-    total_einzahlungen = sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date(), old.date, new.date) and booking.category == ShilaBookingCategory.sparkasse_income)
-
+def compute_expenses_per_category(old: ShilaInventoryCount, new: ShilaInventoryCount, bookings: Iterable[BookingRow]) -> DefaultDict[ShilaBookingCategory, Decimal]:
     total_expense_per_category: DefaultDict[ShilaBookingCategory, Decimal] = defaultdict(Decimal)
     for booking in bookings:
-        if filter_by_date(booking.actual_booking_date(), old.date, new.date):
+        if filter_by_date(booking.actual_booking_date, old.date, new.date):
             total_expense_per_category[booking.category] -= booking.amount
 
+    return total_expense_per_category
+
+
+def output_income_and_expenses(old: ShilaInventoryCount, new: ShilaInventoryCount, bookings: Iterable[BookingRow]) -> None:
+    total_profit = sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date, old.date, new.date))
+    total_expenses = -sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date, old.date, new.date) and booking.amount < 0)
+    total_money_in = sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date, old.date, new.date) and booking.amount > 0)
+    total_einzahlungen = sum(booking.amount for booking in bookings if filter_by_date(booking.actual_booking_date, old.date, new.date) and booking.category == ShilaBookingCategory.sparkasse_income)
+
+    total_expense_per_category = compute_expenses_per_category(old, new, bookings)
+
     print(f"\n{bright_color}{underline_color}Ausgaben:{reset_color}")
     category_sequence = sorted(ShilaBookingCategory, key=lambda cat: total_expense_per_category[cat], reverse=True)
     cat_strs, val_strs = [f"{cat.value}:" for cat in category_sequence], [f"{total_expense_per_category[cat]:.2f}€" for cat in category_sequence]
@@ -128,22 +164,51 @@ def output_income_and_expenses(old: ShilaInventoryCount, new: ShilaInventoryCoun
     print(f"Tatsächlicher Profit:\t {total_profit:.2f}€")
 
 
-def weekly_digest(start: datetime | None = None, end: datetime | None = None) -> None:
-    bookings, inventory_counts = get_shila_account_bookings(), get_inventory_counts()
-    filtered_inventory_counts = [it for it in inventory_counts if filter_by_date(it.date, start, end)]
+def window_report_record(old: ShilaInventoryCount, new: ShilaInventoryCount, balances: BalanceHistory, analyzed_crates: dict[BeverageID, AnalyzedBeverageCrate], inventory_values: dict[datetime, InventoryValue]) -> dict[str, Any]:
+    """The values printed by `output_value`, the expenses per category and the analysed crates of a window for `ReportWriter`"""
+    value = compute_window_value(old, new, balances, analyzed_crates, inventory_values)
+    return report_record(
+        old.date, new.date,
+        value=value.to_json(),
+        schwund={
+            "without_deposits": f"{value.expected_profit_without_deposits - value.profit_with_extra_expenses:.2f}",
+            "with_deposits": f"{value.expected_profit - value.profit_with_extra_expenses:.2f}",
+            "with_payed_but_not_returned_deposits": f"{value.expected_profit_with_payed_but_not_returned_deposits - value.profit_with_extra_expenses:.2f}",
+        },
+        expenses_per_category={category.value: f"{amount:.2f}" for category, amount in balances.expenses_per_category(old.date, new.date).items()},
+        beverages={id: crate.to_json() for id, crate in analyzed_crates.items() if crate.num_sold or crate.num_ordered or crate.num_returned},
+    )
+
+
+def weekly_digest(start: datetime | None = None, end: datetime | None = None, output_format: ReportFormat = ReportFormat.text) -> None:
+    with profile_stage("Load balances, inventory counts and invoice items"):
+        balances, inventory_counts = BalanceHistory.load(), get_inventory_counts_between(start, end)
+        beverages, invoice_items = get_beverage_crates(), get_invoice_item_rows_by_beverage()
+
+    with profile_stage("Value inventory counts"):
+        inventory_values = value_inventory_counts(inventory_counts)
+
+    if output_format != ReportFormat.text:
+        writer = ReportWriter(output_format)
+        with profile_stage("Analyze inventory count windows"):
+            for old, new in pairwise(inventory_counts):
+                writer.write(window_report_record(old, new, balances, analyze_beverage_crates(beverages, old.date, new.date, (old, new), invoice_items), inventory_values))
+
+        return
 
     all_profits = []
     all_analyzed_beverage_crates = []
-    for old, new in pairwise(sorted(filtered_inventory_counts, key=lambda x: x.date)):
-        # TODO: Actual booking date does not take into account when multiple invoices are booked at the same time
-        analyzed_beverage_crates = analyze_beverage_crates(get_beverage_crates(), old.date, new.date, (old, new))
+    with profile_stage("Analyze inventory count windows"):
+        for old, new in pairwise(inventory_counts):
+            # TODO: Actual booking date does not take into account when multiple invoices are booked at the same time
+            analyzed_beverage_crates = analyze_beverage_crates(beverages, old.date, new.date, (old, new), invoice_items)
 
-        profits = output_value(old, new, bookings, analyzed_beverage_crates)
-        # output_beverage_consumption_and_expected_profit(analyzed_beverage_crates)
+            profits = output_value(old, new, balances, analyzed_beverage_crates, inventory_values)
+            # output_beverage_consumption_and_expected_profit(analyzed_beverage_crates)
 
-        all_profits.append(profits[1:])
-        all_analyzed_beverage_crates.append(analyzed_beverage_crates)
-        print("\n\n")
+            all_profits.append(profits[1:])
+            all_analyzed_beverage_crates.append(analyzed_beverage_crates)
+            print("\n\n")
 
     nd_all_profits = np.array(all_profits, dtype=object)
     averages = np.average(nd_all_profits, axis=0)
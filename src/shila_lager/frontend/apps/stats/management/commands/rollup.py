@@ -0,0 +1,38 @@
+from typing import Any
+
+from dateutil.parser import parse as parse_datetime
+
+from shila_lager.frontend.apps.stats.rollup import RollupPeriod, RollupTable
+from shila_lager.profiling import ProfiledCommand, profile_stage
+from shila_lager.settings import bright_color, reset_color, underline_color
+
+
+class Command(ProfiledCommand):
+    help = 'Sum the materialised statistics per week, month, semester or year (see `stats.rollup`)'
+
+    def add_arguments(self, parser: Any) -> None:
+        super().add_arguments(parser)
+        parser.add_argument('period', nargs='?', choices=[it.value for it in RollupPeriod], help='Split the range into these periods, without it the whole range is summed')
+        parser.add_argument('--start', type=lambda it: parse_datetime(it).date(), help='Start date (inclusive)')
+        parser.add_argument('--end', type=lambda it: parse_datetime(it).date(), help='End date (exclusive)')
+        parser.add_argument('--beverages', type=int, default=5, help='Number of the most sold beverages to show per period')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        with profile_stage("Load statistics"):
+            table = RollupTable.load()
+
+        period = RollupPeriod(options["period"]) if options["period"] else None
+        for rollup in table.rollups(period, options["start"], options["end"]):
+            print(f"\n{bright_color}{underline_color}Auswertung vom {rollup.start:%Y-%m-%d} bis {rollup.end:%Y-%m-%d} ({rollup.num_windows} Zählzeiträume):{reset_color}")
+            print(f"Profit:\t\t\t{rollup.profit:.2f}€")
+            print(f"Erwarteter Profit:\t{rollup.expected_profit:.2f}€")
+            print(f"Schwund:\t\t{rollup.schwund:.2f}€")
+            print(f"Erwartete Einnahmen:\t{rollup.expected_income:.2f}€")
+            print(f"Tatsächliche Einnahmen:\t{rollup.actual_income:.2f}€")
+
+            for category, amount in sorted(rollup.spend_per_category.items(), key=lambda it: it[1], reverse=True):
+                if amount > 0:
+                    print(f"  - {category.value}: {amount:.2f}€")
+
+            for id, crate in sorted(rollup.beverages.items(), key=lambda it: it[1].num_sold, reverse=True)[:options["beverages"]]:
+                print(f"{id}:\t{crate.num_sold:.2f} verkauft, \t{crate.num_ordered:.2f} gekauft, \t{crate.total_profit:.2f}€ profit")
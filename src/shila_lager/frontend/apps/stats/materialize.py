@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from itertools import pairwise
+
+from django.db import transaction
+from pytz import UTC
+
+from shila_lager.frontend.apps.bestellung.crud import get_beverage_crates
+from shila_lager.frontend.apps.rechnungen.analyze import analyze_beverage_crates
+from shila_lager.frontend.apps.rechnungen.balance import BalanceHistory
+from shila_lager.frontend.apps.rechnungen.crud import get_invoice_item_rows_by_beverage
+from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount
+from shila_lager.frontend.apps.rechnungen.valuation import value_inventory_counts
+from shila_lager.frontend.apps.rechnungen.weekly_digest import compute_window_value
+from shila_lager.frontend.apps.stats.models import WindowStatistics, CategorySpend, BeverageStatistics
+from shila_lager.profiling import profile_stage
+from shila_lager.utils import to_datetime
+
+
+def refresh_statistics(since: date | datetime | None = None) -> None:
+    """
+    Materialise the statistics of every inventory count window that is not yet stored.
+    Windows ending at or after `since` are recomputed, as the imported data (bookings, invoices, counts) since then changes them.
+    """
+    since = to_datetime(since)
+    if since is not None:
+        WindowStatistics.objects.filter(end__gte=since if since.tzinfo is not None else UTC.localize(since)).delete()
+
+    with profile_stage("Refresh statistics"):
+        stored = set(WindowStatistics.objects.values_list("end", flat=True))
+        counts = list(ShilaInventoryCount.objects.order_by("date").prefetch_related("details__crate"))
+        missing = [(old, new) for old, new in pairwise(counts) if new.date not in stored]
+        if not missing:
+            return
+
+        balances, beverages, invoice_items = BalanceHistory.load(), get_beverage_crates(), get_invoice_item_rows_by_beverage()
+        inventory_values = value_inventory_counts({it for window in missing for it in window})
+        for old, new in missing:
+            analyzed_crates = analyze_beverage_crates(beverages, old.date, new.date, (old, new), invoice_items)
+            value = compute_window_value(old, new, balances, analyzed_crates, inventory_values)
+
+            with transaction.atomic():
+                window = WindowStatistics.objects.create(
+                    start=old.date,
+                    end=new.date,
+                    profit=value.profit_with_extra_expenses,
+                    expected_profit=value.expected_profit,
+                    expected_profit_without_deposits=value.expected_profit_without_deposits,
+                    expected_profit_with_payed_but_not_returned_deposits=value.expected_profit_with_payed_but_not_returned_deposits,
+                    expected_income=value.expected_income,
+                    actual_income=value.actual_income,
+                )
+
+                CategorySpend.objects.bulk_create([
+                    CategorySpend(window=window, category=category.value, amount=amount)
+                    for category, amount in balances.expenses_per_category(old.date, new.date).items()
+                ])
+
+                BeverageStatistics.objects.bulk_create([
+                    BeverageStatistics(window=window, crate=crate.beverage, num_sold=crate.num_sold, num_ordered=crate.num_ordered, num_returned=crate.num_returned, total_profit=crate.total_profit)
+                    for crate in analyzed_crates.values()
+                    if crate.num_sold or crate.num_ordered or crate.num_returned
+                ])
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.14 on 2026-10-19 13:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('bestellung', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WindowStatistics',
+            fields=[
+                ('end', models.DateTimeField(primary_key=True, serialize=False)),
+                ('start', models.DateTimeField(unique=True)),
+                ('profit', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('expected_profit', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('expected_profit_without_deposits', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('expected_profit_with_payed_but_not_returned_deposits', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('expected_income', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('actual_income', models.DecimalField(decimal_places=2, max_digits=16)),
+            ],
+            options={
+                'verbose_name_plural': 'Window Statistics',
+            },
+        ),
+        migrations.CreateModel(
+            name='CategorySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('Getränke', 'Getränke'), ('GEPA', 'GEPA'), ('Bringmeister', 'Bringmeister'), ('Schokolade', 'Schokolade'), ('DM', 'DM'), ('Hosting', 'Hosting'), ('Sparkasse Gebühr', 'Sparkasse Gebühr'), ('MV Haushalt', 'MV Haushalt'), ('Sonstige', 'Sonstige'), ('Sparkasse Einzahlung', 'Sparkasse Einzahlung')], max_length=64)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('window', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_spend', to='stats.windowstatistics')),
+            ],
+            options={
+                'verbose_name_plural': 'Category Spend',
+                'unique_together': {('window', 'category')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BeverageStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_sold', models.DecimalField(decimal_places=4, max_digits=16)),
+                ('num_ordered', models.DecimalField(decimal_places=4, max_digits=16)),
+                ('num_returned', models.DecimalField(decimal_places=4, max_digits=16)),
+                ('total_profit', models.DecimalField(decimal_places=4, max_digits=16)),
+                ('crate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bestellung.beveragecrate')),
+                ('window', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='beverages', to='stats.windowstatistics')),
+            ],
+            options={
+                'verbose_name_plural': 'Beverage Statistics',
+                'unique_together': {('window', 'crate')},
+            },
+        ),
+    ]
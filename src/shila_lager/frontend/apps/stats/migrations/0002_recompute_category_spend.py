@@ -0,0 +1,22 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:05
+
+from django.apps.registry import Apps
+from django.db import migrations
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def clear_statistics(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    # The spend per category included the start day of each window, the next refresh materialises all windows again
+    WindowStatistics = apps.get_model('stats', 'WindowStatistics')
+    WindowStatistics.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_statistics, migrations.RunPython.noop),
+    ]
@@ -1 +1,107 @@
-# Create your models here.
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any
+
+from django.db.models import Model, DateTimeField, DecimalField, ForeignKey, CASCADE, CharField
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate
+from shila_lager.frontend.apps.rechnungen.models import ShilaBookingCategory
+
+if TYPE_CHECKING:
+    from django.db.models.fields.related_descriptors import RelatedManager
+
+
+class WindowStatistics(Model):
+    """The materialised `weekly_digest` of the window between two consecutive inventory counts, see `stats.materialize`"""
+
+    class Meta:
+        verbose_name_plural = "Window Statistics"
+
+    end = DateTimeField(primary_key=True)
+    start = DateTimeField(unique=True)
+
+    profit = DecimalField(max_digits=16, decimal_places=2)  # Including the extra expenses
+    expected_profit = DecimalField(max_digits=16, decimal_places=2)
+    expected_profit_without_deposits = DecimalField(max_digits=16, decimal_places=2)
+    expected_profit_with_payed_but_not_returned_deposits = DecimalField(max_digits=16, decimal_places=2)
+
+    expected_income = DecimalField(max_digits=16, decimal_places=2)
+    actual_income = DecimalField(max_digits=16, decimal_places=2)
+
+    category_spend: RelatedManager[CategorySpend]
+    beverages: RelatedManager[BeverageStatistics]
+
+    def __str__(self) -> str:
+        return f"Statistics from {self.start} to {self.end}"
+
+    @property
+    def schwund(self) -> Decimal:
+        return self.expected_profit - self.profit
+
+    @property
+    def schwund_without_deposits(self) -> Decimal:
+        return self.expected_profit_without_deposits - self.profit
+
+    @property
+    def schwund_with_payed_but_not_returned_deposits(self) -> Decimal:
+        return self.expected_profit_with_payed_but_not_returned_deposits - self.profit
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "profit": f"{self.profit:.2f}",
+            "expected_profit": f"{self.expected_profit:.2f}",
+            "schwund": f"{self.schwund:.2f}",
+            "schwund_without_deposits": f"{self.schwund_without_deposits:.2f}",
+            "schwund_with_payed_but_not_returned_deposits": f"{self.schwund_with_payed_but_not_returned_deposits:.2f}",
+            "expected_income": f"{self.expected_income:.2f}",
+            "actual_income": f"{self.actual_income:.2f}",
+            "spend_per_category": {it.category: f"{it.amount:.2f}" for it in self.category_spend.all()},
+        }
+
+
+class CategorySpend(Model):
+    class Meta:
+        verbose_name_plural = "Category Spend"
+        unique_together = "window", "category"
+
+    window = ForeignKey(WindowStatistics, on_delete=CASCADE, related_name="category_spend")
+    category = CharField(max_length=64, choices=[(it.value, it.value) for it in ShilaBookingCategory])
+    amount = DecimalField(max_digits=16, decimal_places=2)
+
+    window_id: datetime
+
+    def __str__(self) -> str:
+        return f"{self.category} spend until {self.window_id}"
+
+
+class BeverageStatistics(Model):
+    class Meta:
+        verbose_name_plural = "Beverage Statistics"
+        unique_together = "window", "crate"
+
+    window = ForeignKey(WindowStatistics, on_delete=CASCADE, related_name="beverages")
+    crate = ForeignKey(BeverageCrate, on_delete=CASCADE, related_name="+")
+
+    num_sold = DecimalField(max_digits=16, decimal_places=4)
+    num_ordered = DecimalField(max_digits=16, decimal_places=4)
+    num_returned = DecimalField(max_digits=16, decimal_places=4)
+    total_profit = DecimalField(max_digits=16, decimal_places=4)
+
+    window_id: datetime
+    crate_id: str
+
+    def __str__(self) -> str:
+        return f"{self.crate_id} statistics until {self.window_id}"
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "id": self.crate_id,
+            "num_sold": f"{self.num_sold:.2f}",
+            "num_ordered": f"{self.num_ordered:.2f}",
+            "num_returned": f"{self.num_returned:.2f}",
+            "total_profit": f"{self.total_profit:.2f}",
+        }
@@ -0,0 +1,196 @@
+"""
+The statistics of arbitrary periods (weeks, months, semesters, years or custom ones), rolled up from the materialised statistics.
+
+The finest grain of the profits and beverage statistics is the window between two inventory counts (see `stats.materialize`), the one of the spend per category is a day (see `DailyBalance`).
+Both are loaded once into prefix sums of integers, so the statistics of any period are the difference of two rows, no matter how long the period is.
+A period [start, end) contains the count windows that end in it and the bookings of its days.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, fields
+from datetime import date, timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from shila_lager.frontend.apps.rechnungen.models import DailyBalance, BalanceBasis, ShilaBookingCategory
+from shila_lager.frontend.apps.stats.models import WindowStatistics, BeverageStatistics
+from shila_lager.utils import BeverageID, to_cents, from_cents
+
+window_metrics = ["profit", "expected_profit", "expected_profit_without_deposits", "expected_profit_with_payed_but_not_returned_deposits", "expected_income", "actual_income"]
+beverage_metrics = ["num_sold", "num_ordered", "num_returned", "total_profit"]
+categories = list(ShilaBookingCategory)
+
+# The beverage statistics are stored with 4 decimal places
+beverage_scale = 4
+
+
+class RollupPeriod(Enum):
+    week = "week"
+    month = "month"
+    semester = "semester"  # Summer semester from April to September, winter semester from October to March
+    year = "year"
+
+    def start_of(self, day: date) -> date:
+        match self:
+            case RollupPeriod.week:
+                return day - timedelta(days=day.weekday())
+            case RollupPeriod.month:
+                return day.replace(day=1)
+            case RollupPeriod.semester:
+                if day.month < 4:
+                    return date(day.year - 1, 10, 1)
+                return date(day.year, 4 if day.month < 10 else 10, 1)
+            case RollupPeriod.year:
+                return date(day.year, 1, 1)
+
+    def next_start(self, start: date) -> date:
+        """The start of the period after the one starting at `start`"""
+        match self:
+            case RollupPeriod.week:
+                return start + timedelta(days=7)
+            case RollupPeriod.month | RollupPeriod.semester:
+                months = start.month - 1 + (1 if self == RollupPeriod.month else 6)
+                return date(start.year + months // 12, months % 12 + 1, 1)
+            case RollupPeriod.year:
+                return date(start.year + 1, 1, 1)
+
+    def split(self, start: date, end: date) -> list[tuple[date, date]]:
+        """The periods covering [start, end), the first and the last one are cut off at `start` and `end`"""
+        periods, current = [], start
+        while current < end:
+            following = min(self.next_start(self.start_of(current)), end)
+            periods.append((current, following))
+            current = following
+
+        return periods
+
+
+@dataclass
+class BeverageRollup:
+    num_sold: Decimal
+    num_ordered: Decimal
+    num_returned: Decimal
+    total_profit: Decimal
+
+    def to_json(self) -> dict[str, str]:
+        return {it.name: f"{getattr(self, it.name):.2f}" for it in fields(self)}
+
+
+@dataclass
+class Rollup:
+    start: date
+    end: date  # Exclusive
+    num_windows: int
+
+    profit: Decimal  # Including the extra expenses
+    expected_profit: Decimal
+    expected_profit_without_deposits: Decimal
+    expected_profit_with_payed_but_not_returned_deposits: Decimal
+    expected_income: Decimal
+    actual_income: Decimal
+
+    spend_per_category: dict[ShilaBookingCategory, Decimal]
+    beverages: dict[BeverageID, BeverageRollup]
+
+    @property
+    def schwund(self) -> Decimal:
+        return self.expected_profit - self.profit
+
+    @property
+    def schwund_without_deposits(self) -> Decimal:
+        return self.expected_profit_without_deposits - self.profit
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "num_windows": self.num_windows,
+            **{name: f"{getattr(self, name):.2f}" for name in window_metrics},
+            "schwund": f"{self.schwund:.2f}",
+            "schwund_without_deposits": f"{self.schwund_without_deposits:.2f}",
+            "spend_per_category": {category.value: f"{amount:.2f}" for category, amount in self.spend_per_category.items()},
+            "beverages": {id: it.to_json() for id, it in sorted(self.beverages.items(), key=lambda it: it[1].num_sold, reverse=True)},
+        }
+
+
+def _prefix_sums(values: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """The sums of the first 0, 1, …, n rows"""
+    return np.concatenate([np.zeros((1, *values.shape[1:]), dtype=np.int64), np.cumsum(values, axis=0)])
+
+
+def _beverage_rollup(values: npt.NDArray[np.int64]) -> BeverageRollup:
+    num_sold, num_ordered, num_returned, total_profit = (Decimal(int(it)).scaleb(-beverage_scale) for it in values)
+    return BeverageRollup(num_sold, num_ordered, num_returned, total_profit)
+
+
+class RollupTable:
+    def __init__(self, window_ends: list[date], window_sums: npt.NDArray[np.int64], crate_ids: list[BeverageID], beverage_sums: npt.NDArray[np.int64], days: list[date], spend_sums: npt.NDArray[np.int64]) -> None:
+        self.window_ends = window_ends
+        self.window_sums = window_sums  # (windows + 1, metrics) in cents
+        self.crate_ids = crate_ids
+        self.beverage_sums = beverage_sums  # (windows + 1, crates, metrics) in units of `beverage_scale` decimal places
+        self.days = days
+        self.spend_sums = spend_sums  # (days + 1, categories) in cents
+
+    @classmethod
+    def load(cls) -> RollupTable:
+        """Three queries for all materialised statistics"""
+        windows = list(WindowStatistics.objects.order_by("end").values_list("end", *window_metrics))
+        window_index = {end: i for i, (end, *_) in enumerate(windows)}
+        window_values = np.array([[to_cents(it) for it in metrics] for _, *metrics in windows], dtype=np.int64).reshape(len(windows), len(window_metrics))
+
+        beverages = list(BeverageStatistics.objects.values_list("window_id", "crate_id", *beverage_metrics))
+        crate_ids = sorted({crate_id for _, crate_id, *_ in beverages})
+        crate_index = {id: i for i, id in enumerate(crate_ids)}
+        beverage_values = np.zeros((len(windows), len(crate_ids), len(beverage_metrics)), dtype=np.int64)
+        for window_id, crate_id, *metrics in beverages:
+            beverage_values[window_index[window_id], crate_index[crate_id]] = [int(it.scaleb(beverage_scale).to_integral_value()) for it in metrics]
+
+        balances = list(DailyBalance.objects.filter(basis=BalanceBasis.actual_booking_date).order_by("date").values_list("date", "category_sums"))
+        spend_values = np.array([
+            [-to_cents(Decimal(category_sums.get(category.value, "0"))) for category in categories]
+            for _, category_sums in balances
+        ], dtype=np.int64).reshape(len(balances), len(categories))
+
+        return cls(
+            [end.date() for end, *_ in windows], _prefix_sums(window_values),
+            crate_ids, _prefix_sums(beverage_values),
+            [day for day, _ in balances], _prefix_sums(spend_values),
+        )
+
+    def first_day(self) -> date | None:
+        return min([*self.window_ends[:1], *self.days[:1]], default=None)
+
+    def last_day(self) -> date | None:
+        return max([*self.window_ends[-1:], *self.days[-1:]], default=None)
+
+    def rollup(self, start: date, end: date) -> Rollup:
+        """The statistics of [start, end)"""
+        first, last = bisect_left(self.window_ends, start), bisect_left(self.window_ends, end)
+        window_values = self.window_sums[last] - self.window_sums[first]
+        beverage_values = self.beverage_sums[last] - self.beverage_sums[first]
+        spend_values = self.spend_sums[bisect_left(self.days, end)] - self.spend_sums[bisect_left(self.days, start)]
+
+        profit, expected_profit, without_deposits, with_payed_deposits, expected_income, actual_income = (from_cents(it) for it in window_values)
+        return Rollup(
+            start, end, last - first, profit, expected_profit, without_deposits, with_payed_deposits, expected_income, actual_income,
+            spend_per_category={category: from_cents(amount) for category, amount in zip(categories, spend_values) if amount},
+            beverages={id: _beverage_rollup(values) for id, values in zip(self.crate_ids, beverage_values) if values.any()},
+        )
+
+    def rollups(self, period: RollupPeriod | None, start: date | None = None, end: date | None = None) -> list[Rollup]:
+        """The statistics of every period in [start, end), or of [start, end) as a whole without `period`. Both default to the range of the statistics."""
+        first_day, last_day = self.first_day(), self.last_day()
+        start, end = start or first_day, end or (last_day + timedelta(days=1) if last_day is not None else None)
+        if start is None or end is None:
+            return []
+
+        if period is None:
+            return [self.rollup(start, end)]
+
+        return [self.rollup(period_start, period_end) for period_start, period_end in period.split(start, end)]
@@ -2,6 +2,10 @@ from django.urls import path
 
 from shila_lager.frontend.apps.stats import views
 
+# The stubs for Django 4.2 do not know that async views can be routed
 urlpatterns = [
-    path("", views.index, name="stats_index"),
+    path("", views.index, name="stats_index"),  # type:ignore[arg-type]
+    path("api/windows/", views.windows_api, name="stats_windows_api"),  # type:ignore[arg-type]
+    path("api/beverages/", views.beverages_api, name="stats_beverages_api"),  # type:ignore[arg-type]
+    path("api/rollup/", views.rollup_api, name="stats_rollup_api"),  # type:ignore[arg-type]
 ]
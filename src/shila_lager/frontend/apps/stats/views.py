@@ -1,5 +1,112 @@
-from django.http import HttpRequest, HttpResponse
+from __future__ import annotations
 
+from typing import Any, TYPE_CHECKING, cast
 
-def index(request: HttpRequest, **kwargs: str) -> HttpResponse:
-    return HttpResponse("Hello, world. You're at the stats index.")
+from asgiref.sync import sync_to_async
+
+from django.core.paginator import Paginator, Page
+from django.db.models import QuerySet, Sum
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.template import loader
+from django.utils.dateparse import parse_date
+
+from shila_lager.frontend.apps.stats.models import WindowStatistics, BeverageStatistics
+from shila_lager.frontend.apps.stats.rollup import RollupPeriod, RollupTable
+from shila_lager.frontend.pagination import get_page_size
+
+if TYPE_CHECKING:
+    from django_stubs_ext import ValuesQuerySet
+
+
+async def paginate(request: HttpRequest, queryset: QuerySet[Any] | ValuesQuerySet[Any, Any]) -> Page[Any]:
+    """Like `Paginator.get_page`, but the queries are made with the async ORM. The page contains a list instead of a queryset."""
+    paginator = Paginator(queryset, get_page_size(request))
+    # The paginator would count synchronously, so the count is cached before the page is looked up
+    paginator.count = await queryset.acount()
+
+    page = paginator.get_page(request.GET.get("page"))
+    page.object_list = [it async for it in cast(QuerySet[Any], page.object_list)]
+    return page
+
+
+def page_to_json(page: Page[Any], results: list[dict[str, Any]]) -> dict[str, Any]:
+    return {
+        "count": page.paginator.count,
+        "num_pages": page.paginator.num_pages,
+        "page": page.number,
+        "results": results,
+    }
+
+
+def get_windows() -> QuerySet[WindowStatistics]:
+    return WindowStatistics.objects.order_by("-end").prefetch_related("category_spend")
+
+
+def get_total_beverage_statistics() -> ValuesQuerySet[BeverageStatistics, dict[str, Any]]:
+    """The beverage statistics summed over all windows, the most sold beverages first"""
+    return BeverageStatistics.objects.values("crate_id", "crate__name").annotate(
+        total_sold=Sum("num_sold"), total_ordered=Sum("num_ordered"), total_returned=Sum("num_returned"), total_profit_sum=Sum("total_profit"),
+    ).order_by("-total_sold", "crate_id")
+
+
+async def index(request: HttpRequest, **kwargs: str) -> HttpResponse:
+    template = loader.get_template("stats/index.html")
+    context = {
+        "windows": await paginate(request, get_windows()),
+        "beverages": [it async for it in get_total_beverage_statistics()[:20]],
+    }
+
+    return HttpResponse(template.render(context, request))
+
+
+async def windows_api(request: HttpRequest, **kwargs: str) -> JsonResponse:
+    page = await paginate(request, get_windows())
+    return JsonResponse(page_to_json(page, [it.to_json() for it in page]))
+
+
+async def beverages_api(request: HttpRequest, **kwargs: str) -> JsonResponse:
+    """The statistics per beverage, either of a single window (`?window=<end date>`) or summed over all windows"""
+    if "window" not in request.GET:
+        page = await paginate(request, get_total_beverage_statistics())
+        return JsonResponse(page_to_json(page, [{
+            "id": it["crate_id"],
+            "name": it["crate__name"],
+            "num_sold": f"{it['total_sold']:.2f}",
+            "num_ordered": f"{it['total_ordered']:.2f}",
+            "num_returned": f"{it['total_returned']:.2f}",
+            "total_profit": f"{it['total_profit_sum']:.2f}",
+        } for it in page]))
+
+    try:
+        # Raises for well-formed but invalid dates like 2024-02-30
+        window_end = parse_date(request.GET["window"])
+    except ValueError:
+        window_end = None
+
+    if window_end is None:
+        return JsonResponse({"error": f"Invalid window date {request.GET['window']!r}, expected YYYY-MM-DD"}, status=400)
+
+    page = await paginate(request, BeverageStatistics.objects.filter(window__end__date=window_end).select_related("crate").order_by("-num_sold", "crate_id"))
+    return JsonResponse(page_to_json(page, [it.to_json() | {"name": it.crate.name} for it in page]))
+
+
+async def rollup_api(request: HttpRequest, **kwargs: str) -> JsonResponse:
+    """The statistics per `?period=week|month|semester|year` between `?start` and `?end` (both optional), or of the whole range without a period"""
+    try:
+        period = RollupPeriod(request.GET["period"]) if "period" in request.GET else None
+    except ValueError:
+        return JsonResponse({"error": f"Invalid period {request.GET['period']!r}, expected one of " + ", ".join(it.value for it in RollupPeriod)}, status=400)
+
+    dates = {}
+    for name in ["start", "end"]:
+        value = request.GET.get(name)
+        try:
+            # Raises for well-formed but invalid dates like 2024-02-30
+            dates[name] = parse_date(value) if value else None
+        except ValueError:
+            dates[name] = None
+        if value and dates[name] is None:
+            return JsonResponse({"error": f"Invalid date {value!r} for {name}, expected YYYY-MM-DD"}, status=400)
+
+    table = await sync_to_async(RollupTable.load)()
+    return JsonResponse({"results": [it.to_json() for it in table.rollups(period, dates["start"], dates["end"])]})
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Any
+
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+from django.template.base import Template
+
+from shila_lager.settings import logger, profile_output_dir, profile_requests_log_interval, profile_requests_slow_threshold
+
+
+@dataclass
+class RequestTimings:
+    num_queries: int = 0
+    sql_time: float = 0
+    template_time: float = 0
+    queries: Counter[tuple[str, str]] = field(default_factory=Counter)
+
+    _template_depth: int = 0
+
+    @property
+    def num_duplicated_queries(self) -> int:
+        """Queries that were executed more than once with exactly the same parameters"""
+        return sum(count - 1 for count in self.queries.values() if count > 1)
+
+    @property
+    def num_similar_queries(self) -> int:
+        """Queries that were executed more than once with different parameters. A high number usually is a N+1 pattern."""
+        similar = Counter(sql for sql, _ in self.queries.elements())
+        return sum(count - 1 for count in similar.values() if count > 1)
+
+    def record_query(self, execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]) -> Any:
+        s = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - s
+            self.num_queries += 1
+            self.queries[sql, repr(params)] += 1
+
+
+@dataclass
+class EndpointStatistics:
+    endpoint: str
+    num_requests: int = 0
+    total_time: float = 0
+    max_time: float = 0
+    total_queries: int = 0
+    max_queries: int = 0
+    max_similar_queries: int = 0
+    total_template_time: float = 0
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.num_requests if self.num_requests else 0
+
+
+_current_request_timings: ContextVar[RequestTimings | None] = ContextVar("current_request_timings", default=None)
+_original_template_render = Template.render
+
+
+def _instrumented_template_render(self: Template, context: Any) -> Any:
+    timings = _current_request_timings.get()
+    if timings is None:
+        return _original_template_render(self, context)
+
+    # Included templates are rendered inside their parent, so only the outermost render is measured
+    timings._template_depth += 1
+    s = time.perf_counter()
+    try:
+        return _original_template_render(self, context)
+    finally:
+        timings._template_depth -= 1
+        if timings._template_depth == 0:
+            timings.template_time += time.perf_counter() - s
+
+
+class RequestProfilingMiddleware:
+    """
+    Measures the latency, the SQL queries (including duplicated ones) and the template render time of every request.
+    The numbers are sent to the browser as `Server-Timing` header and aggregated per endpoint into `profile_output_dir / "slowest-endpoints.json"`.
+
+    This middleware is only enabled with `SHILA_LAGER_PROFILE_REQUESTS=True`.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+        self.endpoints: dict[str, EndpointStatistics] = {}
+        self.num_requests = 0
+        self.lock = threading.Lock()
+
+        Template.render = _instrumented_template_render  # type:ignore[method-assign]
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        timings = RequestTimings()
+        token = _current_request_timings.set(timings)
+
+        s = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings.record_query):
+                response = self.get_response(request)
+        finally:
+            _current_request_timings.reset(token)
+
+        total_time = time.perf_counter() - s
+        response["Server-Timing"] = ", ".join([
+            f"total;dur={total_time * 1000:.1f}",
+            f"db;dur={timings.sql_time * 1000:.1f};desc=\"{timings.num_queries} queries, {timings.num_similar_queries} similar, {timings.num_duplicated_queries} duplicated\"",
+            f"tpl;dur={timings.template_time * 1000:.1f}",
+        ])
+
+        endpoint = f"{request.method} {request.resolver_match.view_name if request.resolver_match is not None else request.path}"
+        if total_time > profile_requests_slow_threshold:
+            logger.warning(f"Slow request {endpoint}: {total_time:.3f}s, {timings.num_queries} queries ({timings.num_similar_queries} similar), {timings.template_time:.3f}s rendering templates")
+
+        self.record(endpoint, total_time, timings)
+        return response
+
+    def record(self, endpoint: str, total_time: float, timings: RequestTimings) -> None:
+        with self.lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStatistics(endpoint))
+            stats.num_requests += 1
+            stats.total_time += total_time
+            stats.max_time = max(stats.max_time, total_time)
+            stats.total_queries += timings.num_queries
+            stats.max_queries = max(stats.max_queries, timings.num_queries)
+            stats.max_similar_queries = max(stats.max_similar_queries, timings.num_similar_queries)
+            stats.total_template_time += timings.template_time
+
+            self.num_requests += 1
+            if self.num_requests % profile_requests_log_interval == 0:
+                self.write_log()
+
+    def write_log(self) -> None:
+        slowest = sorted(self.endpoints.values(), key=lambda it: it.mean_time, reverse=True)
+
+        profile_output_dir.mkdir(parents=True, exist_ok=True)
+        with open(profile_output_dir / "slowest-endpoints.json", "w") as f:
+            json.dump([asdict(it) | {"mean_time": it.mean_time} for it in slowest], f, indent=4)
+
+        logger.info("Slowest endpoints:\n" + "\n".join(f"    {it.endpoint}: {it.mean_time * 1000:.1f}ms mean, {it.max_queries} queries max, {it.max_similar_queries} similar max ({it.num_requests} requests)" for it in slowest[:5]))
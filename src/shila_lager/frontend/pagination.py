@@ -0,0 +1,99 @@
+"""
+Keyset pagination for the list views.
+
+Instead of `OFFSET`, which makes the database skip over all previous rows, the next page starts after the last row of the current page.
+The rows are ordered by `(date, pk)` descending, so with an index on `(…, date, pk)` every page is a single index range scan, no matter how deep it is.
+"""
+from __future__ import annotations
+
+import json
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Generic, TypeVar, Iterator
+
+from django.core.exceptions import BadRequest
+from django.db.models import Model, QuerySet
+from django.http import HttpRequest
+from django.utils.dateparse import parse_date
+
+default_page_size = 50
+max_page_size = 500
+
+_Model = TypeVar("_Model", bound=Model)
+
+
+def get_page_size(request: HttpRequest) -> int:
+    try:
+        return min(max(int(request.GET.get("page_size", default_page_size)), 1), max_page_size)
+    except ValueError:
+        return default_page_size
+
+
+def get_date_parameter(request: HttpRequest, name: str) -> date | None:
+    value = request.GET.get(name)
+    if not value:
+        return None
+
+    try:
+        # Raises for well-formed but invalid dates like 2024-02-30
+        day = parse_date(value)
+    except ValueError:
+        day = None
+
+    if day is None:
+        raise BadRequest(f"Invalid date {value!r} for {name}, expected YYYY-MM-DD")
+
+    return day
+
+
+def encode_cursor(day: date, pk: Any) -> str:
+    return urlsafe_b64encode(json.dumps([day.isoformat(), pk]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[date, Any]:
+    try:
+        day, pk = json.loads(urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(day), pk
+    except (ValueError, TypeError) as e:
+        raise BadRequest(f"Invalid cursor {cursor!r}") from e
+
+
+@dataclass
+class KeysetPage(Generic[_Model]):
+    items: list[_Model]
+    next_cursor: str | None
+    # The query strings of the next and first page, which keep all other parameters (filters) of the request
+    next_query: str | None
+    first_query: str | None
+
+    def __iter__(self) -> Iterator[_Model]:
+        return iter(self.items)
+
+
+def keyset_paginate(request: HttpRequest, queryset: QuerySet[_Model], date_field: str) -> KeysetPage[_Model]:
+    """The page after `?cursor=…` of the queryset, newest first"""
+    page_size = get_page_size(request)
+    queryset = queryset.order_by(f"-{date_field}", "-pk")
+
+    query = request.GET.copy()
+    cursor = query.pop("cursor", [None])[-1]
+    first_query = query.urlencode() if cursor else None
+
+    if cursor:
+        day, pk = decode_cursor(cursor)
+        # Equivalent to `date < day OR (date = day AND pk < pk)`, but the plain upper bound on the date lets the database use the index range
+        queryset = queryset.filter(**{f"{date_field}__lte": day}).exclude(**{date_field: day, "pk__gte": pk})
+
+    # Fetching one row more tells whether there is a next page, without an extra `COUNT`
+    items = list(queryset[:page_size + 1])
+    if len(items) <= page_size:
+        return KeysetPage(items, None, None, first_query)
+
+    items = items[:page_size]
+    last = items[-1]
+    next_cursor = encode_cursor(getattr(last, date_field), last.pk)
+
+    query["cursor"] = next_cursor
+
+    return KeysetPage(items, next_cursor, query.urlencode(), first_query)
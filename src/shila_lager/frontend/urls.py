@@ -24,6 +24,7 @@ urlpatterns = [
     path("bestellung/", include("shila_lager.frontend.apps.bestellung.urls")),
     path("einzahlungen/", include("shila_lager.frontend.apps.einzahlungen.urls")),
     path("stats/", include("shila_lager.frontend.apps.stats.urls")),
+    path("jobs/", include("shila_lager.frontend.apps.jobs.urls")),
 
     path("", RedirectView.as_view(url="bestellung/"), name="index"),
     re_path(r'^favicon\.ico$', RedirectView.as_view(url='/static/global/favicon.ico', permanent=True)),
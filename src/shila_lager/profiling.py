@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import cProfile
+import time
+import tracemalloc
+from contextlib import contextmanager, ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Callable, Iterator
+
+from django.core.management import BaseCommand
+from django.db import connection
+
+from shila_lager.settings import logger, profile_output_dir, bright_color, reset_color
+from shila_lager.utils import HumanBytes
+
+profile_dump_formats = ["cprofile", "pyinstrument"]
+
+
+@dataclass
+class StageStatistics:
+    name: str
+    depth: int
+
+    wall_time: float = 0
+    num_queries: int = 0
+    sql_time: float = 0
+    peak_memory: int = 0
+
+
+class Profiler:
+    """
+    Collects the wall time, the number of SQL queries, the total SQL time and the peak memory for every stage (see `profile_stage`) while it is active.
+    Optionally, the whole run is also profiled with cProfile or pyinstrument and dumped into the `profile_output_dir`.
+    Tracing the memory slows down allocation heavy code considerably, so it can be disabled for runs that only need the timings.
+    """
+
+    def __init__(self, name: str, dump_format: str | None = None, trace_memory: bool = True) -> None:
+        self.name = name
+        self.dump_format = dump_format
+        self.trace_memory = trace_memory
+        self.stages: list[StageStatistics] = []
+        self.dump_path: Path | None = None
+
+        self._open_stages: list[StageStatistics] = []
+        self._exit_stack = ExitStack()
+        self._token: Any = None
+        self._cprofile: cProfile.Profile | None = None
+        self._pyinstrument: Any = None
+
+    def __enter__(self) -> Profiler:
+        self._token = _current_profiler.set(self)
+        self._exit_stack.enter_context(connection.execute_wrapper(self._record_query))
+        if self.trace_memory:
+            tracemalloc.start()
+
+        if self.dump_format == "pyinstrument":
+            try:
+                from pyinstrument import Profiler as PyinstrumentProfiler  # type:ignore[import-not-found, unused-ignore]
+                self._pyinstrument = PyinstrumentProfiler()
+                self._pyinstrument.start()
+            except ImportError:
+                logger.error("pyinstrument is not installed, falling back to cProfile")
+                self.dump_format = "cprofile"
+
+        if self.dump_format == "cprofile":
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+        self._exit_stack.enter_context(self.stage(self.name))
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, exc_val: BaseException | None, exc_tb: TracebackType | None) -> None:
+        self._exit_stack.close()
+        if self.trace_memory:
+            tracemalloc.stop()
+        _current_profiler.reset(self._token)
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self.dump_path = self._make_dump_path("prof")
+            self._cprofile.dump_stats(self.dump_path)
+
+        if self._pyinstrument is not None:
+            self._pyinstrument.stop()
+            self.dump_path = self._make_dump_path("html")
+            self.dump_path.write_text(self._pyinstrument.output_html())
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStatistics]:
+        stats = StageStatistics(name, depth=len(self._open_stages))
+        self.stages.append(stats)
+
+        self._update_peak_memory()
+        self._open_stages.append(stats)
+        s = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.wall_time = time.perf_counter() - s
+            self._update_peak_memory()
+            self._open_stages.pop()
+
+    def report(self) -> str:
+        name_width = max(len("  " * it.depth + it.name) for it in self.stages)
+        lines = [f"{bright_color}{'Stage'.ljust(name_width)}  {'Wall time':>10}  {'Queries':>8}  {'SQL time':>10}  {'Peak memory':>12}{reset_color}"]
+
+        for it in self.stages:
+            lines.append(f"{('  ' * it.depth + it.name).ljust(name_width)}  {it.wall_time:>9.3f}s  {it.num_queries:>8}  {it.sql_time:>9.3f}s  {HumanBytes.format_pad(it.peak_memory):>12}")
+
+        if self.dump_path is not None:
+            lines.append(f"\nProfile written to {self.dump_path}")
+
+        return "\n".join(lines)
+
+    def _record_query(self, execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]) -> Any:
+        s = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - s
+            for stats in self._open_stages:
+                stats.num_queries += 1
+                stats.sql_time += duration
+
+    def _update_peak_memory(self) -> None:
+        if not self.trace_memory:
+            return
+
+        # The peak is reset for every new stage, so it has to be attributed to all currently open (outer) stages first
+        _, peak = tracemalloc.get_traced_memory()
+        for stats in self._open_stages:
+            stats.peak_memory = max(stats.peak_memory, peak)
+
+        tracemalloc.reset_peak()
+
+    def _make_dump_path(self, suffix: str) -> Path:
+        profile_output_dir.mkdir(parents=True, exist_ok=True)
+        return profile_output_dir / f"{self.name}-{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.{suffix}"
+
+
+_current_profiler: ContextVar[Profiler | None] = ContextVar("current_profiler", default=None)
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    """Mark a stage of a long-running operation. The duration is always logged, the queries and memory are only recorded while a `Profiler` is active."""
+    profiler = _current_profiler.get()
+    s = time.perf_counter()
+
+    if profiler is None:
+        yield
+    else:
+        with profiler.stage(name):
+            yield
+
+    logger.debug(f"{name} took {time.perf_counter() - s:.3f}s")
+
+
+class ProfiledCommand(BaseCommand):
+    """A management command that can be profiled with `--profile`. Subclasses overriding `add_arguments` have to call `super().add_arguments(parser)`."""
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument("--profile", action="store_true", help="Report the wall time, SQL queries and peak memory per stage")
+        parser.add_argument("--profile-dump", choices=profile_dump_formats, help="Additionally dump a cProfile or pyinstrument profile into the working directory (implies --profile)")
+
+    def execute(self, *args: Any, **options: Any) -> str | None:
+        if not options.get("profile") and not options.get("profile_dump"):
+            return super().execute(*args, **options)
+
+        command_name = self.__class__.__module__.rsplit(".", 1)[-1]
+        with Profiler(command_name, options.get("profile_dump")) as profiler:
+            result = super().execute(*args, **options)
+
+        self.stdout.write(profiler.report())
+        return result
@@ -7,7 +7,8 @@ import re
 import sys
 from decimal import Decimal
 from pathlib import Path
-from typing import NoReturn
+from typing import NoReturn, Any
+from urllib.parse import urlsplit, unquote
 
 bright_color = "\033[1;1m"
 underline_color = "\033[1;4m"
@@ -36,6 +37,17 @@ working_dir_location = Path(get_env("SHILA_LAGER_WORKING_DIR", "~/shila-lager"))
 
 manual_upload_dir = working_dir_location / "manual-uploads"
 plot_output_dir = working_dir_location / "plots"
+profile_output_dir = working_dir_location / "profiles"
+cache_dir = working_dir_location / "cache"
+
+# The bookings, invoice items, prices and inventory counts as memory-mappable NumPy arrays, written by `export-columns` (see `rechnungen.columns`)
+columns_dir = working_dir_location / "columns"
+
+# The estimated stock of every crate on every day between the first and the last inventory count (see `rechnungen.timeline`)
+inventory_timeline_file = working_dir_location / "inventory-timeline.npz"
+
+# Uploaded files are streamed here and moved into their `manual_upload_dir` subdirectory once they are complete, so importers never see partial files
+upload_staging_dir = manual_upload_dir / ".staging"
 
 # A constant to detect if you are on Linux.
 is_linux = platform.system() == "Linux"
@@ -49,6 +61,46 @@ is_windows = platform.system() == "Windows"
 # -/- General settings ---
 
 
+# --- Profiling Settings ---
+
+# Adds the `RequestProfilingMiddleware`, which reports the latency, SQL queries and template render time of every request
+profile_requests = get_env("SHILA_LAGER_PROFILE_REQUESTS", "False").lower() in {"1", "true", "yes"}
+
+# Requests slower than this (in seconds) are logged individually
+profile_requests_slow_threshold = 0.5
+
+# After how many requests the aggregated endpoint statistics are written to the `profile_output_dir`
+profile_requests_log_interval = 100
+
+# -/- Profiling Settings ---
+
+
+# --- Job Settings ---
+
+# Where background jobs (imports of uploaded files, digests, plots) are run:
+#  - "thread": On a thread pool of the web server, nothing else has to be started
+#  - "worker": By a separate `shila-manage run-worker` process, the web server only stores the jobs
+job_runners = ["thread", "worker"]
+job_runner = get_env("SHILA_LAGER_JOB_RUNNER", "thread")
+if job_runner not in job_runners:
+    error_exit(1, f"Unknown job runner \"{job_runner}\". Supported are {', '.join(job_runners)}.")
+
+# Number of threads of the web server that run background jobs with the "thread" runner.
+# The imports write to the same tables, so they are run one after another by default.
+job_worker_threads = int(get_env("SHILA_LAGER_JOB_WORKER_THREADS", "1"))
+
+# How often (in seconds) `run-worker` looks for new jobs
+job_worker_poll_interval = 1.0
+
+# How often (in seconds) `watch` looks for new files in the `manual_upload_dir` if inotify is not available (see `jobs.watch`)
+watch_poll_interval = 2.0
+
+# A new file is only imported once its size and modification time did not change for this many seconds, so files that are still copied are not imported
+watch_debounce = 2.0
+
+# -/- Job Settings ---
+
+
 # --- Test Settings ---
 
 
@@ -81,11 +133,59 @@ def db_make_postgres_url(user: str, pw: str, db_name: str) -> str:
 
 # First, the database url is tried. If it doesn"t work, the `sqlite_database_name` together with the working dir is tried. If both error, the program is halted.
 sqlite_database_name = "state.db"
-database_url = db_make_sqlite_url(sqlite_database_name)
+database_url = get_env("SHILA_LAGER_DATABASE_URL", db_make_sqlite_url(sqlite_database_name))
 
 # If set to True all emitted SQL is echo"d back
 database_verbose_sql = False
 
+# How long (in seconds) a connection to a database server is kept open and reused. SQLite connections are cheap and always closed after each request.
+database_conn_max_age = int(get_env("SHILA_LAGER_DATABASE_CONN_MAX_AGE", "60"))
+
+# Server-side cursors have to be disabled when running behind a transaction pooler like PgBouncer
+database_disable_server_side_cursors = get_env("SHILA_LAGER_DATABASE_DISABLE_SERVER_SIDE_CURSORS", "False").lower() in {"1", "true", "yes"}
+
+# Number of rows fetched per round trip when streaming large tables (e.g. all bookings). On PostgreSQL, this is the size of the server-side cursor batches.
+database_iterator_chunk_size = 2000
+
+
+def db_url_to_django_config(url: str) -> dict[str, Any]:
+    """Translate a SQLAlchemy-style database url (as created by the `db_make_*_url` functions) into a Django `DATABASES` entry"""
+    parsed = urlsplit(url)
+    dialect = parsed.scheme.split("+")[0]
+
+    if dialect == "sqlite":
+        return {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": url.removeprefix(f"{parsed.scheme}:///"),
+        }
+
+    engines = {
+        "postgresql": "django.db.backends.postgresql",
+        "postgres": "django.db.backends.postgresql",
+        "mariadb": "django.db.backends.mysql",
+        "mysql": "django.db.backends.mysql",
+    }
+
+    if dialect not in engines:
+        error_exit(1, f"Unsupported database url \"{parsed.scheme}://…\". Supported are sqlite, postgresql and mariadb.")
+
+    config: dict[str, Any] = {
+        "ENGINE": engines[dialect],
+        "NAME": unquote(parsed.path.lstrip("/")),
+        "USER": unquote(parsed.username or ""),
+        "PASSWORD": unquote(parsed.password or ""),
+        "HOST": parsed.hostname or "",
+        "PORT": str(parsed.port or ""),
+        "CONN_MAX_AGE": database_conn_max_age,
+        "CONN_HEALTH_CHECKS": True,
+    }
+
+    if engines[dialect] == "django.db.backends.postgresql":
+        config["DISABLE_SERVER_SIDE_CURSORS"] = database_disable_server_side_cursors
+
+    return config
+
+
 # -/- Database Configuration ---
 
 # --- Django Configuration ---
@@ -114,6 +214,7 @@ INSTALLED_APPS = [
     "shila_lager.frontend.apps.einzahlungen.apps.EinzahlungenConfig",
     "shila_lager.frontend.apps.rechnungen.apps.RechnungenConfig",
     "shila_lager.frontend.apps.stats.apps.StatsConfig",
+    "shila_lager.frontend.apps.jobs.apps.JobsConfig",
 
     "django.contrib.admin",
     "django.contrib.auth",
@@ -133,6 +234,9 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+if profile_requests:
+    MIDDLEWARE.insert(0, "shila_lager.frontend.middleware.RequestProfilingMiddleware")
+
 ROOT_URLCONF = "shila_lager.frontend.urls"
 
 TEMPLATES = [
@@ -152,15 +256,13 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "shila_lager.frontend.wsgi.application"
+ASGI_APPLICATION = "shila_lager.frontend.asgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": working_dir_location / "state.db",
-    }
+    "default": db_url_to_django_config(database_url),
 }
 
 # Storage
@@ -178,6 +280,20 @@ STORAGES = {
     },
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The cache is file based, as the importers run in a different process than the server and have to be able to invalidate it.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": cache_dir,
+        "TIMEOUT": None,
+    },
+}
+
+# Uploads and jobs require a login, which is done with the admin accounts
+LOGIN_URL = "admin:login"
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -6,7 +6,7 @@ from asyncio import AbstractEventLoop, get_event_loop
 from datetime import datetime, date
 from decimal import Decimal
 from pathlib import Path
-from typing import TypeVar, Callable, Iterable, Any
+from typing import TypeVar, Callable, Iterable, Any, SupportsInt
 
 from django.utils.dateparse import parse_datetime
 from pytz import UTC
@@ -135,6 +135,15 @@ def parse_numeric(it: str | float | int) -> Decimal:
         raise
 
 
+def to_cents(amount: Decimal) -> int:
+    """The analyses compute on integer cents, which are exact like `Decimal` but can be summed as int64 NumPy arrays"""
+    return int(amount.scaleb(2).to_integral_value())
+
+
+def from_cents(cents: SupportsInt) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
+
+
 def filter_by_date(it: date | datetime, start: date | datetime | None, end: date | datetime | None) -> bool:
     match it:
         # Always put datetime first as it is a subclass of date
@@ -0,0 +1,173 @@
+"""
+A deterministic generator for synthetic Shila data.
+
+It simulates a number of years of the Shila: Every week beverages are ordered at Grihed (as pre-extracted invoice text), sold, counted (as Lagerzählung YAML) and the
+money is brought to the Sparkasse (as CSV export). The same seed always yields byte-identical files.
+"""
+from __future__ import annotations
+
+import csv
+import random
+import shutil
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import yaml
+
+from shila_lager.frontend.apps.rechnungen.crud import sale_price_translation
+
+sparkasse_header = [
+    'Auftragskonto', 'Buchungstag', 'Valutadatum', 'Buchungstext', 'Verwendungszweck', 'Glaeubiger ID', 'Mandatsreferenz', 'Kundenreferenz (End-to-End)', 'Sammlerreferenz', 'Lastschrift Ursprungsbetrag', 'Auslagenersatz Ruecklastschrift', 'Beguenstigter/Zahlungspflichtiger',
+    'Kontonummer/IBAN', 'BIC (SWIFT-Code)', 'Betrag', 'Waehrung', 'Info'
+]
+
+shila_iban = "DE02100500000000000000"
+grihed_iban = "DE02100500000000000001"
+
+
+@dataclass(frozen=True)
+class SyntheticCrate:
+    id: str
+    name: str
+    content: str
+    packaging: str
+    deposit: Decimal
+    price: Decimal
+    weekly_demand: int
+
+    @property
+    def sale_price(self) -> Decimal:
+        return Decimal(str(sale_price_translation[self.id, self.name]))
+
+
+crates = [
+    SyntheticCrate("B1278", "Wicküler Pilsener 0,50l", "20 x 0,5l", "Flaschen", Decimal("3.10"), Decimal("11.50"), 12),
+    SyntheticCrate("B1183", "Pilsator 0,50l", "20 x 0,5l", "Flaschen", Decimal("3.10"), Decimal("10.90"), 8),
+    SyntheticCrate("B1165", "Jever Pils 0,50l", "20 x 0,5l", "Flaschen", Decimal("3.10"), Decimal("16.90"), 3),
+    SyntheticCrate("E3438", "Club Mate", "20 x 0,5l", "Flaschen", Decimal("4.50"), Decimal("15.90"), 6),
+    SyntheticCrate("E3446", "Spezi 0,50l", "20 x 0,5l", "Flaschen", Decimal("3.10"), Decimal("13.50"), 3),
+    SyntheticCrate("E3347", "Fritz Zitrone 0,33l", "24 x 0,33l", "Flaschen", Decimal("3.42"), Decimal("17.20"), 2),
+    SyntheticCrate("M4195", "Spreequell Naturelle 1,0l PET", "12 x 1,0l", "Pet Flaschen", Decimal("3.30"), Decimal("6.20"), 2),
+]
+
+# The empty crates that are returned for each deposit category
+return_crates = {
+    Decimal("3.10"): "L0310",
+    Decimal("4.50"): "L0450",
+    Decimal("3.42"): "L0342",
+    Decimal("3.30"): "L0330",
+}
+
+
+def german(value: Decimal) -> str:
+    return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def grihed_id(crate_id: str) -> str:
+    return f"{crate_id[0]} {crate_id[1:]}"
+
+
+def is_semester_break(day: date) -> bool:
+    return day.month in {2, 3, 8, 9}
+
+
+def invoice_text(invoice_number: str, day: date, lines: list[tuple[int, str, str, str, str, Decimal, Decimal]]) -> str:
+    body, total = [], Decimal(0)
+    for quantity, crate_id, name, content, packaging, deposit, price in lines:
+        line_total = (price + deposit) * quantity
+        total += line_total
+        body.append(f"{quantity:>5}   {grihed_id(crate_id)}   {name}   {content}   {packaging}   19 %   {german(deposit)} €   {german(price)} €   {german(line_total)} €")
+
+    first, second = invoice_number.split("-")
+    return (
+        "GRIHED Service GmbH\n\n"
+        f"Rechnung-Nr:  {first} – {second}\n"
+        f"Liefertag:  {day.strftime('%d.%m.%Y')}\n\n"
+        "Menge   ArtNr    Artikelbezeichnung    Inhalt    Gebinde    St-Satz    Pfand    Preis    Summe in €\n" +
+        "\n".join(body) +
+        f"\n\nZahlbetrag: {german(total)} €\n"
+    )
+
+
+def booking_row(day: date, kind: str, description: str, peer: str, iban: str, amount: Decimal, creditor_id: str = "", mandate_reference: str = "") -> list[str]:
+    date_str = day.strftime("%d.%m.%y")
+    return [shila_iban, date_str, date_str, kind, description, creditor_id, mandate_reference, "", "", "", "", peer, iban, "BELADEBEXXX", german(amount).replace(".", ""), "EUR", "Umsatz gebucht"]
+
+
+def generate(output_dir: Path, years: int, seed: int = 42, start: date = date(2022, 1, 3)) -> None:
+    """Write `years` years of synthetic uploads into `output_dir` (usually the `manual_upload_dir`), replacing everything that was there before."""
+    rng = random.Random(seed)
+    grihed_dir, sparkasse_dir, counts_dir = output_dir / "Grihed", output_dir / "Sparkasse", output_dir / "Lagerzählungen"
+    for it in [grihed_dir, sparkasse_dir, counts_dir]:
+        shutil.rmtree(it, ignore_errors=True)
+        it.mkdir(parents=True)
+
+    stock = {crate.id: crate.weekly_demand for crate in crates}
+    empties: defaultdict[Decimal, int] = defaultdict(int)
+    bookings: defaultdict[int, list[list[str]]] = defaultdict(list)
+
+    for week in range(52 * years):
+        monday = start + timedelta(weeks=week)
+        tuesday, friday = monday + timedelta(days=1), monday + timedelta(days=4)
+        price_factor = Decimal(1) + Decimal("0.03") * (week // 52)
+
+        # Tuesday: Order at Grihed and return the empty crates
+        lines = []
+        for crate in crates:
+            quantity = 2 * crate.weekly_demand - stock[crate.id]
+            if quantity > 0:
+                stock[crate.id] += quantity
+                lines.append((quantity, crate.id, crate.name, crate.content, crate.packaging, crate.deposit, (crate.price * price_factor).quantize(Decimal("0.01"))))
+
+        for deposit, return_id in return_crates.items():
+            if empties[deposit] > 0:
+                lines.append((empties[deposit], return_id, "Leergutkasten komplett", f"1 x {german(deposit)}", "Kasten", Decimal(0), -deposit))
+                empties[deposit] = 0
+
+        invoice_number = f"{100000 + week}-{10 + week % 90}"
+        (grihed_dir / f"{tuesday.isoformat()} {invoice_number}.txt").write_text(invoice_text(invoice_number, tuesday, lines))
+
+        invoice_total = sum(((price + deposit) * quantity for quantity, _, _, _, _, deposit, price in lines), Decimal(0))
+        paid_on = tuesday + timedelta(days=10)
+        bookings[paid_on.year].append(booking_row(
+            paid_on, "FOLGELASTSCHRIFT", f"RE{invoice_number} vom {tuesday.strftime('%d.%m.%Y')} Getraenkelieferung", "GRIHED Service GmbH", grihed_iban, -invoice_total, "DE00ZZZ00000000001", "M-0001"
+        ))
+
+        # Until Friday: Sell beverages
+        revenue = Decimal(0)
+        for crate in crates:
+            demand = crate.weekly_demand * (0.3 if is_semester_break(friday) else 1.0)
+            sold = min(stock[crate.id], round(rng.uniform(0.5, 1.5) * demand))
+            stock[crate.id] -= sold
+            empties[crate.deposit] += sold
+            revenue += sold * crate.sale_price
+
+        # Friday: Count the inventory
+        safe = Decimal(rng.randint(0, 40))
+        lager = {
+            "Geld": {"Kasse": 150, "Kleingeld": rng.randint(20, 80)},
+            "Grihed": {f"{crate.id} {crate.name}": stock[crate.id] for crate in crates},
+            "Tresor": float(safe),
+        }
+        if week % 13 == 12:
+            lager["Sonderausgaben"] = {"Putzmittel": "12.5 + 7.99"}
+
+        with open(counts_dir / f"{friday.isoformat()}.yaml", "w") as f:
+            yaml.safe_dump(lager, f, allow_unicode=True, sort_keys=False)
+
+        # Next Monday: Bring the money to the bank
+        deposit_day = monday + timedelta(weeks=1)
+        bookings[deposit_day.year].append(booking_row(deposit_day, "BARGELDEINZAHLUNG SB", f"SB-EINZAHLUNG {deposit_day.strftime('%d.%m')} Woche {week}", "", "0000000000", revenue - safe))
+
+        if monday.day <= 7:
+            bookings[monday.year].append(booking_row(monday, "FOLGELASTSCHRIFT", f"Hetzner Rechnung {monday.strftime('%Y-%m')}", "Hetzner Online GmbH", "DE92760700120750007700", Decimal("-5.83")))
+            bookings[monday.year].append(booking_row(monday, "ENTGELTABSCHLUSS", f"Entgeltabrechnung siehe Anlage {monday.strftime('%m/%Y')}", "", "0000000000", Decimal("-9.50")))
+
+    for year, rows in bookings.items():
+        with open(sparkasse_dir / f"umsaetze-{year}.csv", "w", newline="") as f:
+            writer = csv.writer(f, delimiter=";", quotechar='"', quoting=csv.QUOTE_ALL)
+            writer.writerow(sparkasse_header)
+            writer.writerows(rows)
@@ -0,0 +1,87 @@
+"""
+Benchmarks for the importers and the analysis on synthetic data.
+
+The number of simulated years can be set with `SHILA_LAGER_BENCHMARK_YEARS`, e.g. `SHILA_LAGER_BENCHMARK_YEARS="1 3 5" pytest tests/benchmarks`.
+Next to the timings, the number of SQL queries of a single run is recorded in the `extra_info` of each benchmark.
+"""
+import os
+from typing import Callable, Any
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from pytest import fixture, FixtureRequest
+from pytest_benchmark.fixture import BenchmarkFixture  # type:ignore[import-untyped]
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate, GrihedPrice, SalePrice
+from shila_lager.frontend.apps.rechnungen.models import GrihedInvoiceItem, GrihedInvoice, ShilaAccountBooking, DailyBalance, ShilaInventoryCountDetail, ShilaInventoryCount
+from shila_lager.frontend.apps.rechnungen.mv_abrechnung.main import mv_abrechnung_main
+from shila_lager.frontend.apps.rechnungen.parser.grihed_pdf_parser import import_all_grihed_pdfs
+from shila_lager.frontend.apps.rechnungen.parser.inventory_counts_parser import import_lager_counts
+from shila_lager.frontend.apps.rechnungen.parser.sparkasse_csv_parser import import_bookings
+from shila_lager.frontend.apps.rechnungen.weekly_digest import weekly_digest
+from shila_lager.settings import manual_upload_dir
+from synthetic_data import generate
+
+benchmark_years = [int(it) for it in os.environ.get("SHILA_LAGER_BENCHMARK_YEARS", "1").split()]
+
+
+def clear_database() -> None:
+    for model in [GrihedInvoiceItem, GrihedInvoice, ShilaAccountBooking, DailyBalance, ShilaInventoryCountDetail, ShilaInventoryCount, GrihedPrice, SalePrice, BeverageCrate]:
+        model._default_manager.all().delete()
+
+
+def import_everything() -> None:
+    clear_database()
+    import_all_grihed_pdfs()
+    import_bookings()
+    import_lager_counts()
+
+
+def run_benchmark(benchmark: BenchmarkFixture, func: Callable[[], Any], setup: Callable[[], None] | None = None, rounds: int = 3) -> None:
+    if setup is not None:
+        setup()
+
+    with CaptureQueriesContext(connection) as queries:
+        func()
+
+    benchmark.extra_info["queries"] = len(queries)
+    benchmark.pedantic(func, setup=setup, rounds=rounds)
+
+
+@fixture(scope="module", params=benchmark_years, ids=lambda years: f"{years}y")
+def years(request: FixtureRequest, db: None) -> int:
+    generate(manual_upload_dir, request.param)
+    return int(request.param)
+
+
+def test_import_all_grihed_pdfs(benchmark: BenchmarkFixture, years: int) -> None:
+    run_benchmark(benchmark, import_all_grihed_pdfs, setup=clear_database)
+    assert GrihedInvoice.objects.count() == 52 * years
+
+
+def test_import_bookings(benchmark: BenchmarkFixture, years: int) -> None:
+    def setup() -> None:
+        clear_database()
+        import_all_grihed_pdfs()
+
+    run_benchmark(benchmark, import_bookings, setup=setup)
+    assert ShilaAccountBooking.objects.filter(beneficiary_or_payer="GRIHED Service GmbH").count() >= 52 * years
+
+
+def test_import_lager_counts(benchmark: BenchmarkFixture, years: int) -> None:
+    def setup() -> None:
+        clear_database()
+        import_all_grihed_pdfs()
+
+    run_benchmark(benchmark, import_lager_counts, setup=setup)
+    assert ShilaInventoryCount.objects.count() == 52 * years
+
+
+def test_weekly_digest(benchmark: BenchmarkFixture, years: int) -> None:
+    import_everything()
+    run_benchmark(benchmark, weekly_digest, rounds=1)
+
+
+def test_mv_abrechnung_main(benchmark: BenchmarkFixture, years: int) -> None:
+    import_everything()
+    run_benchmark(benchmark, mv_abrechnung_main, rounds=1)
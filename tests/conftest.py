@@ -1,12 +1,32 @@
-from shila_lager.utils import startup
+import os
+import tempfile
+from typing import Generator
+
+from pytest import fixture
 
 
 def pytest_configure() -> None:
+    # Never touch the real working directory (and its database) while testing
+    os.environ.setdefault("SHILA_LAGER_WORKING_DIR", tempfile.mkdtemp(prefix="shila-lager-test-"))
+    os.environ.setdefault("SHILA_LAGER_GRIHED_BENEFICIARY_OR_PAYER", "GRIHED Service GmbH")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shila_lager.settings")
+
+    import django
+    from shila_lager.utils import startup
+
     startup()
+    django.setup()
+
+
+@fixture(scope="session")
+def db() -> Generator[None, None, None]:
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    yield
 
-# @fixture(scope="session")
-# def db() -> Generator[DatabaseSession, None, None]:
-#     init_database()
-#
-#     with DatabaseSessionMaker() as session:
-#         yield session
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+    teardown_test_environment()
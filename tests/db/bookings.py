@@ -0,0 +1,13 @@
+"""Helpers for creating account bookings in the database tests"""
+from datetime import date
+from decimal import Decimal
+
+from shila_lager.frontend.apps.rechnungen.classification import classify_booking
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, ShilaBookingKind
+
+
+def create_booking(booking_date: date, amount: str, beneficiary_or_payer: str = "DM-drogerie markt", description: str = "") -> ShilaAccountBooking:
+    return ShilaAccountBooking.objects.create(
+        booking_date=booking_date, value_date=booking_date, kind=ShilaBookingKind.lastschrift, description=description, beneficiary_or_payer=beneficiary_or_payer,
+        iban="DE00", bic="XXX", amount=Decimal(amount), currency="EUR", additional_info="", booking_category=classify_booking(beneficiary_or_payer, "DE00", description).value,
+    )
@@ -0,0 +1,37 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from pytest import mark
+
+from shila_lager.frontend.apps.rechnungen.balance import refresh_daily_balances, BalanceHistory
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, DailyBalance, BalanceBasis, ShilaBookingCategory
+from bookings import create_booking
+
+
+@mark.usefixtures("db")
+def test_daily_balances() -> None:
+    with transaction.atomic():
+        ShilaAccountBooking.objects.all().delete()
+        DailyBalance.objects.all().delete()
+
+        create_booking(date(2023, 5, 2), "100.00")
+        create_booking(date(2023, 5, 2), "-20.00")
+        create_booking(date(2023, 5, 10), "-30.00", "GRIHED Service GmbH", "Rechnung 123 vom 01.05.2023")
+        refresh_daily_balances()
+
+        # The incremental refresh has to match a full one
+        create_booking(date(2023, 5, 20), "5.00")
+        refresh_daily_balances(since=date(2023, 5, 20))
+
+        history, original = BalanceHistory.load(), BalanceHistory.load(BalanceBasis.booking_date)
+        assert history.at(date(2023, 5, 1)) == Decimal("-30.00")
+        assert history.at(date(2023, 5, 15)) == Decimal("50.00")
+        assert original.at(date(2023, 5, 1)) == Decimal(0)
+        assert original.current() == history.current() == Decimal("55.00")
+        # The start day is excluded, so adjacent windows do not count their common day twice
+        assert history.expenses_per_category(date(2023, 5, 1), date(2023, 5, 2)) == {ShilaBookingCategory.dm: Decimal("-80.00")}
+        assert history.expenses_per_category(date(2023, 5, 2), date(2023, 5, 10)) == {}
+        assert history.expenses_per_category(date(2023, 4, 30), date(2023, 5, 1)) == {ShilaBookingCategory.beverages: Decimal("30.00")}
+
+        transaction.set_rollback(True)
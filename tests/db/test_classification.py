@@ -0,0 +1,59 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from pytest import mark, raises
+
+from shila_lager.frontend.apps.rechnungen.classification import BookingClassifier, default_booking_classifier, get_booking_classifier, reclassify_bookings
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, ShilaBookingKind, ShilaBookingCategory, BookingRule, BookingRuleField, BookingRuleMatch
+
+
+def test_default_rules() -> None:
+    classify = default_booking_classifier.classify
+    assert classify("GEPA mbH", "DE00", "Metro") == ShilaBookingCategory.gepa
+    assert classify(None, "0000000000", "Rechnung Berliner Sparkasse Entgelt 03/2023") == ShilaBookingCategory.sparkasse_fee
+    assert classify(None, "DE00", "Rechnung Berliner Sparkasse Entgelt 03/2023") == ShilaBookingCategory.other
+    assert classify(None, "DE00", "SB-EINZAHLUNG 123") == ShilaBookingCategory.sparkasse_income
+    assert classify(None, "DE00", "Einzahlung SB-EINZAHLUNG") == ShilaBookingCategory.other
+    assert classify("flaschenpost SE", "DE00", "Bringmeister") == ShilaBookingCategory.beverages
+    assert classify("Metro AG", "DE00", "Einkauf Metro") == ShilaBookingCategory.bringmeister
+    assert classify("Emily Seebeck", "DE00", "MV Ausgabe Kaffee") == ShilaBookingCategory.mv_ausgaben
+
+
+@mark.usefixtures("db")
+def test_rule_changes() -> None:
+    with transaction.atomic():
+        ShilaAccountBooking.objects.all().delete()
+        booking = ShilaAccountBooking.objects.create(
+            booking_date=date(2023, 5, 2), value_date=date(2023, 5, 2), kind=ShilaBookingKind.kartenzahlung, description="Kaffee für das Shila", beneficiary_or_payer="Rösterei",
+            iban="DE00", bic="XXX", amount=Decimal("-12.00"), currency="EUR", additional_info="",
+        )
+        assert reclassify_bookings() == []
+
+        rule = BookingRule.objects.create(priority=50, field=BookingRuleField.description, match=BookingRuleMatch.regex, pattern=r"Kaffee\b", category=ShilaBookingCategory.gepa.value)
+        assert get_booking_classifier().classify(booking.beneficiary_or_payer, booking.iban, booking.description) == ShilaBookingCategory.gepa
+        assert reclassify_bookings(rule.to_filter()) == [booking]
+
+        booking.refresh_from_db()
+        assert booking.category == ShilaBookingCategory.gepa
+
+        transaction.set_rollback(True)
+
+
+def test_rules_that_can_not_be_combined() -> None:
+    inline_flag = BookingRule(priority=1, field=BookingRuleField.description, match=BookingRuleMatch.regex, pattern="(?i)kaffee", category=ShilaBookingCategory.gepa.value)
+    backreference = BookingRule(priority=2, field=BookingRuleField.description, match=BookingRuleMatch.regex, pattern=r"(M)ate \1", category=ShilaBookingCategory.dm.value)
+    named_groups = [BookingRule(priority=3, field=BookingRuleField.peer, match=BookingRuleMatch.regex, pattern=r"(?P<x>Rösterei)", category=ShilaBookingCategory.hosting.value) for _ in range(2)]
+
+    for rule in [inline_flag, backreference, named_groups[0]]:
+        with raises(ValidationError):
+            rule.clean()
+
+    # Rules that were created without being validated are matched one by one
+    classifier = BookingClassifier([inline_flag, backreference, *named_groups])
+    assert classifier.classify("Rösterei", "DE00", "") == ShilaBookingCategory.hosting
+    assert classifier.classify(None, "DE00", "KAFFEE") == ShilaBookingCategory.gepa
+    assert classifier.classify(None, "DE00", "Club Mate M") == ShilaBookingCategory.dm
+
+    BookingRule(field=BookingRuleField.description, match=BookingRuleMatch.regex, pattern=r"(?i:kaffee)\b", category=ShilaBookingCategory.gepa.value).clean()
@@ -0,0 +1,67 @@
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import DefaultDict
+
+import numpy as np
+from django.db import transaction
+from pytest import mark, MonkeyPatch
+
+from shila_lager.frontend.apps.rechnungen import columns
+from shila_lager.frontend.apps.rechnungen.columns import BookingColumns, export_columns
+from shila_lager.frontend.apps.rechnungen.crud import get_booking_rows
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, ShilaBookingCategory, BookingRow
+from shila_lager.frontend.apps.rechnungen.mv_abrechnung.main import BookingTotals, sum_bookings, sum_booking_columns
+from shila_lager.utils import filter_by_date
+from bookings import create_booking
+
+
+def sum_rows(bookings: list[BookingRow], start: datetime | None = None, end: datetime | None = None) -> BookingTotals:
+    """The sums on the `Decimal` amounts of the rows, to check the columns against"""
+    in_range = [it for it in bookings if filter_by_date(it.actual_booking_date, start, end)]
+
+    turnover_per_category: DefaultDict[ShilaBookingCategory, Decimal] = defaultdict(Decimal)
+    for booking in in_range:
+        if booking.amount < 0:
+            turnover_per_category[booking.category] -= booking.amount
+
+    return BookingTotals(
+        profit=sum((it.amount for it in in_range), Decimal()),
+        turnover=-sum((it.amount for it in in_range if it.amount < 0), Decimal()),
+        money_in=sum((it.amount for it in in_range if it.amount > 0), Decimal()),
+        turnover_per_category=turnover_per_category,
+    )
+
+
+@mark.usefixtures("db")
+def test_export_columns(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(columns, "columns_dir", tmp_path)
+
+    with transaction.atomic():
+        ShilaAccountBooking.objects.all().delete()
+        create_booking(date(2023, 5, 2), "100.00")
+        create_booking(date(2023, 5, 2), "-20.10")
+        create_booking(date(2023, 5, 10), "-30.05", "GRIHED Service GmbH", "Rechnung 123 vom 01.05.2023")
+        assert export_columns()["bookings"] == 3
+
+        # Only the new booking is queried, the others are read from the columns
+        last = create_booking(date(2023, 5, 20), "-5.00")
+        assert export_columns()["bookings"] == 4
+        assert BookingColumns.load().amount.tolist() == [10000, -2010, -3005, -500]
+
+        # Deleted rows can not be appended, so all bookings are exported again
+        last.delete()
+        loaded = BookingColumns.load()
+        assert export_columns()["bookings"] == 3 and len(loaded) == 4
+        loaded = BookingColumns.load()
+        assert loaded.actual_booking_date[2] == np.datetime64("2023-05-01")
+
+        bookings = get_booking_rows()
+        assert sum_bookings(bookings).profit == Decimal("49.85") and sum_bookings(bookings).turnover == Decimal("50.15")
+        for start, end in [(None, None), (datetime(2023, 5, 1), None), (None, datetime(2023, 5, 1)), (datetime(2023, 5, 1), datetime(2023, 5, 2)), (datetime(2023, 5, 2), datetime(2023, 5, 20))]:
+            assert sum_booking_columns(loaded, start, end) == sum_bookings(bookings, start, end) == sum_rows(bookings, start, end)
+
+        assert sum_booking_columns(loaded).turnover_per_category == {ShilaBookingCategory.dm: Decimal("20.10"), ShilaBookingCategory.beverages: Decimal("30.05")}
+
+        transaction.set_rollback(True)
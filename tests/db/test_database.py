@@ -0,0 +1,27 @@
+from datetime import date
+
+from pytest import mark
+
+from shila_lager.frontend.apps.rechnungen.models import GrihedInvoice, ShilaAccountBooking, GrihedInvoiceItem
+
+
+def assert_uses_index(explanation: str, index_name: str) -> None:
+    assert index_name in explanation, f"Expected the query plan to use {index_name}:\n{explanation}"
+
+
+@mark.usefixtures("db")
+def test_invoice_date_range_uses_index() -> None:
+    query = GrihedInvoice.objects.filter(date__gte=date(2023, 1, 1), date__lte=date(2023, 12, 31)).order_by("date")
+    assert_uses_index(query.explain(), "grihed_invoice_date_idx")
+
+
+@mark.usefixtures("db")
+def test_bookings_by_peer_use_index() -> None:
+    query = ShilaAccountBooking.objects.filter(beneficiary_or_payer="GRIHED Service GmbH").order_by("booking_date")
+    assert_uses_index(query.explain(), "booking_peer_date_idx")
+
+
+@mark.usefixtures("db")
+def test_invoice_items_by_beverage_use_index() -> None:
+    query = GrihedInvoiceItem.objects.filter(beverage_id="B1278", invoice__date__gte=date(2023, 1, 1))
+    assert_uses_index(query.explain(), "grihed_item_beverage_idx")
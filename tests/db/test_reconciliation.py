@@ -0,0 +1,50 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import transaction
+from pytest import mark
+
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, ShilaBookingKind, GrihedInvoice, GrihedInvoiceItem, GrihedInvoicePayment, InvoicePaymentStatus
+from shila_lager.frontend.apps.rechnungen.parser.sparkasse_csv_parser import import_grihed_non_booked_items
+from shila_lager.frontend.apps.rechnungen.reconciliation import link_invoice_payments, get_grihed_debt, get_outstanding_invoices, get_unknown_invoice_payments
+
+
+def create_grihed_booking(kind: ShilaBookingKind, amount: str, description: str) -> ShilaAccountBooking:
+    return ShilaAccountBooking.objects.create(
+        booking_date=date(2023, 6, 1), value_date=date(2023, 6, 1), kind=kind, description=description, beneficiary_or_payer="GRIHED Service GmbH",
+        iban="DE00", bic="XXX", amount=Decimal(amount), currency="EUR", additional_info="",
+    )
+
+
+@mark.usefixtures("db")
+def test_invoice_payments() -> None:
+    with transaction.atomic():
+        ShilaAccountBooking.objects.all().delete()
+        GrihedInvoiceItem.objects.all().delete()
+        GrihedInvoice.objects.all().delete()
+
+        GrihedInvoice.objects.create(invoice_number="100-1", date=date(2023, 5, 2), total_price=Decimal("10.00"))
+        GrihedInvoice.objects.create(invoice_number="100-2", date=date(2023, 5, 9), total_price=Decimal("20.00"))
+        GrihedInvoice.objects.create(invoice_number="100-3", date=date(2023, 5, 16), total_price=Decimal("40.00"))
+
+        link_invoice_payments([
+            create_grihed_booking(ShilaBookingKind.lastschrift, "-30.00", "RE100-1 vom 02.05.2023 RE100-2 vom 09.05.2023 Getraenkelieferung"),
+            create_grihed_booking(ShilaBookingKind.lastschrift_undo, "20.00", "RE100-2 vom 09.05.2023 Getraenkelieferung"),
+            create_grihed_booking(ShilaBookingKind.lastschrift, "-5.00", "RE99-9 vom 25.04.2023 Getraenkelieferung"),
+        ])
+
+        assert get_grihed_debt() == Decimal("60.00")
+        assert get_grihed_debt(end=datetime(2023, 5, 10)) == Decimal("20.00")
+        assert [it.invoice_number for it in get_unknown_invoice_payments()] == ["99-9"]
+
+        # The outstanding invoices get temporary bookings, which are replaced on every import
+        removed, added = import_grihed_non_booked_items()
+        assert removed == [] and len(added) == 2
+        assert GrihedInvoicePayment.objects.filter(status=InvoicePaymentStatus.temp).count() == 2
+        assert not get_outstanding_invoices().exists()
+
+        removed, added = import_grihed_non_booked_items()
+        assert len(removed) == 2 and len(added) == 2
+        assert GrihedInvoicePayment.objects.filter(status=InvoicePaymentStatus.temp).count() == 2
+
+        transaction.set_rollback(True)
@@ -0,0 +1,25 @@
+import csv
+import json
+from datetime import datetime
+from io import StringIO
+
+from shila_lager.frontend.apps.rechnungen.report import ReportFormat, ReportWriter, report_record
+
+
+def test_report_writer() -> None:
+    record = report_record(datetime(2023, 6, 2), datetime(2023, 6, 9), value={"profit": "190.06"}, beverages={"B1278": {"name": "Wicküler", "num_sold": "9.00"}})
+
+    output = StringIO()
+    writer = ReportWriter(ReportFormat.json, output)
+    writer.write(record)
+    writer.write(record)
+    assert [json.loads(it) for it in output.getvalue().splitlines()] == [record, record]
+
+    output = StringIO()
+    ReportWriter(ReportFormat.csv, output).write(record)
+    assert list(csv.reader(StringIO(output.getvalue()))) == [
+        ["start", "end", "section", "name", "field", "value"],
+        ["2023-06-02T00:00:00", "2023-06-09T00:00:00", "value", "", "profit", "190.06"],
+        ["2023-06-02T00:00:00", "2023-06-09T00:00:00", "beverages", "B1278", "name", "Wicküler"],
+        ["2023-06-02T00:00:00", "2023-06-09T00:00:00", "beverages", "B1278", "num_sold", "9.00"],
+    ]
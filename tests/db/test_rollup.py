@@ -0,0 +1,49 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import transaction
+from pytest import mark
+from pytz import UTC
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate, BottleType
+from shila_lager.frontend.apps.rechnungen.models import DailyBalance, BalanceBasis, ShilaBookingCategory
+from shila_lager.frontend.apps.stats.models import WindowStatistics, BeverageStatistics
+from shila_lager.frontend.apps.stats.rollup import RollupPeriod, RollupTable
+
+
+def test_periods() -> None:
+    assert RollupPeriod.semester.split(date(2023, 2, 15), date(2024, 1, 1)) == [
+        (date(2023, 2, 15), date(2023, 4, 1)), (date(2023, 4, 1), date(2023, 10, 1)), (date(2023, 10, 1), date(2024, 1, 1)),
+    ]
+    assert RollupPeriod.week.split(date(2023, 5, 3), date(2023, 5, 15)) == [(date(2023, 5, 3), date(2023, 5, 8)), (date(2023, 5, 8), date(2023, 5, 15))]
+    assert RollupPeriod.month.next_start(date(2023, 12, 1)) == date(2024, 1, 1)
+
+
+@mark.usefixtures("db")
+def test_rollups() -> None:
+    with transaction.atomic():
+        WindowStatistics.objects.all().delete()
+        DailyBalance.objects.all().delete()
+        mate = BeverageCrate.objects.create(id="T0003", name="Test Mate", content="20 x 0,50 l", bottle_type=BottleType.glass_bottle)
+
+        for i, (start, end) in enumerate([(datetime(2023, 4, 20), datetime(2023, 4, 27)), (datetime(2023, 4, 27), datetime(2023, 5, 4)), (datetime(2023, 5, 4), datetime(2023, 5, 11))]):
+            window = WindowStatistics.objects.create(
+                start=UTC.localize(start), end=UTC.localize(end), profit=Decimal(10 * (i + 1)), expected_profit=Decimal(12 * (i + 1)), expected_profit_without_deposits=0,
+                expected_profit_with_payed_but_not_returned_deposits=0, expected_income=0, actual_income=0,
+            )
+            BeverageStatistics.objects.create(window=window, crate=mate, num_sold=Decimal("2.5"), num_ordered=3, num_returned=0, total_profit=Decimal("1.25"))
+
+        for day, amount in [(date(2023, 4, 30), "-5.00"), (date(2023, 5, 1), "-7.50"), (date(2023, 5, 31), "-1.00")]:
+            DailyBalance.objects.create(basis=BalanceBasis.actual_booking_date, date=day, net_change=Decimal(amount), balance=0, category_sums={ShilaBookingCategory.gepa.value: amount})
+
+        april, may = RollupTable.load().rollups(RollupPeriod.month, date(2023, 4, 1), date(2023, 6, 1))
+        assert (april.num_windows, april.profit, april.schwund) == (1, Decimal(10), Decimal(2))
+        assert april.spend_per_category == {ShilaBookingCategory.gepa: Decimal("5.00")}
+        assert april.beverages["T0003"].num_sold == Decimal("2.5")
+
+        assert (may.num_windows, may.profit, may.spend_per_category[ShilaBookingCategory.gepa]) == (2, Decimal(50), Decimal("8.50"))
+
+        total, = RollupTable.load().rollups(None)
+        assert (total.start, total.end, total.num_windows, total.beverages["T0003"].total_profit) == (date(2023, 4, 27), date(2023, 6, 1), 3, Decimal("3.75"))
+
+        transaction.set_rollback(True)
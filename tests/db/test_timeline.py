@@ -0,0 +1,56 @@
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+from django.db import transaction
+from pytest import mark, MonkeyPatch
+from pytz import UTC
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate, BottleType, GrihedPrice, SalePrice
+from shila_lager.frontend.apps.rechnungen import timeline
+from shila_lager.frontend.apps.rechnungen.models import GrihedInvoice, GrihedInvoiceItem, ShilaInventoryCount, ShilaInventoryCountDetail
+
+
+def create_count(crate: BeverageCrate, day: date, count: int) -> None:
+    inventory_count = ShilaInventoryCount.objects.create(date=datetime(day.year, day.month, day.day, 18, tzinfo=UTC), other_monetary_value=0, money_in_safe=0, extra_expenses={})
+    ShilaInventoryCountDetail.objects.create(date=inventory_count, crate=crate, count=Decimal(count))
+
+
+@mark.usefixtures("db")
+def test_inventory_timeline(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(timeline, "inventory_timeline_file", tmp_path / "inventory-timeline.npz")
+
+    with transaction.atomic():
+        ShilaInventoryCountDetail.objects.all().delete()
+        ShilaInventoryCount.objects.all().delete()
+
+        mate = BeverageCrate.objects.create(id="T0002", name="Test Mate", content="20 x 0,50 l", bottle_type=BottleType.glass_bottle)
+        purchase_price = GrihedPrice.objects.create(crate=mate, price=Decimal("10.00"), deposit=Decimal("3.00"), valid_from=datetime(2023, 1, 1, tzinfo=UTC))
+        sale_price = SalePrice.objects.create(crate=mate, price=Decimal("20.00"), valid_from=datetime(2023, 1, 1, tzinfo=UTC))
+
+        create_count(mate, date(2023, 1, 1), 10)
+        invoice = GrihedInvoice.objects.create(invoice_number="200-1", date=date(2023, 1, 6), total_price=Decimal("60.00"))
+        GrihedInvoiceItem.objects.create(invoice=invoice, beverage=mate, quantity=6, total_price=Decimal("60.00"), purchase_price=purchase_price, sale_price=sale_price)
+        create_count(mate, date(2023, 1, 11), 6)
+
+        # 10 crates were sold in 10 days, 6 of them were delivered on the fifth day
+        it = timeline.refresh_inventory_timeline()
+        assert it is not None
+        assert [it.stock_at("T0002", date(2023, 1, day)) for day in [1, 5, 6, 11]] == [10, 6, 11, 6]
+        assert it.consumption_between("T0002", date(2023, 1, 1), date(2023, 1, 11)) == 10
+        assert it.stock_at("T0002", date(2023, 1, 12)) is None
+
+        # Sold out on the day of the third count
+        create_count(mate, date(2023, 1, 21), 0)
+        it = timeline.refresh_inventory_timeline()
+        assert it is not None and it.end == date(2023, 1, 21)
+        assert it.consumption_rate("T0002", date(2023, 1, 11), date(2023, 1, 21)) == 0.6
+        assert it.days_out_of_stock("T0002", date(2023, 1, 1), date(2023, 1, 21)) == 1
+
+        # Imports discard the stored timeline, which is built again once it is used
+        create_count(mate, date(2023, 1, 31), 0)
+        timeline.discard_inventory_timeline()
+        it = timeline.get_inventory_timeline()
+        assert it is not None and it.end == date(2023, 1, 31)
+
+        transaction.set_rollback(True)
@@ -0,0 +1,36 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import connection, transaction, reset_queries
+from django.test.utils import CaptureQueriesContext
+from pytest import mark
+from pytz import UTC
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate, BottleType, GrihedPrice, SalePrice
+from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount, ShilaInventoryCountDetail
+from shila_lager.frontend.apps.rechnungen.valuation import PriceTable, value_inventory_counts
+
+
+@mark.usefixtures("db")
+def test_inventory_counts_are_valued_at_their_prices() -> None:
+    with transaction.atomic():
+        mate = BeverageCrate.objects.create(id="T0001", name="Test Mate", content="20 x 0,50 l", bottle_type=BottleType.glass_bottle)
+        GrihedPrice.objects.create(crate=mate, price=Decimal("10.00"), deposit=Decimal("3.00"), valid_from=datetime(2023, 1, 1, tzinfo=UTC))
+        GrihedPrice.objects.create(crate=mate, price=Decimal("12.00"), deposit=Decimal("3.00"), valid_from=datetime(2024, 1, 1, tzinfo=UTC))
+        SalePrice.objects.create(crate=mate, price=Decimal("20.00"), valid_from=datetime(2023, 1, 1, tzinfo=UTC))
+
+        counts = []
+        for day in [datetime(2022, 6, 1, tzinfo=UTC), datetime(2023, 6, 1, tzinfo=UTC), datetime(2024, 1, 1, tzinfo=UTC)]:
+            counts.append(count := ShilaInventoryCount.objects.create(date=day, other_monetary_value=0, money_in_safe=0, extra_expenses={}))
+            ShilaInventoryCountDetail.objects.create(date=count, crate=mate, count=Decimal("2.5"))
+
+        prices = PriceTable.load()
+        reset_queries()  # The query log is capped, so it might still be full from previous tests
+        with CaptureQueriesContext(connection) as queries:
+            values = value_inventory_counts(ShilaInventoryCount.objects.filter(date__in=[it.date for it in counts]).prefetch_related("details"), prices)
+
+        assert len(queries) == 2
+        assert [it.purchase_value for it in values.values()] == [Decimal("25.00"), Decimal("25.00"), Decimal("30.00")]
+        assert all(it.sale_value == Decimal("50.00") for it in values.values())
+
+        transaction.set_rollback(True)
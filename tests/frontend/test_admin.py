@@ -0,0 +1,57 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.contrib import admin
+from django.db import transaction
+from django.test import RequestFactory
+from pytest import mark
+from pytz import UTC
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate, BottleType, GrihedPrice, SalePrice
+from shila_lager.frontend.apps.bestellung.orders import catalogue_version
+from shila_lager.frontend.apps.rechnungen.forecast import refresh_demand_forecasts
+from shila_lager.frontend.apps.rechnungen.models import CrateDemandForecast, GrihedInvoiceItem, ShilaInventoryCount, ShilaInventoryCountDetail
+
+
+@mark.usefixtures("db")
+def test_deleting_counts_refreshes_forecasts() -> None:
+    with transaction.atomic():
+        GrihedInvoiceItem.objects.all().delete()
+        ShilaInventoryCountDetail.objects.all().delete()
+        ShilaInventoryCount.objects.all().delete()
+        CrateDemandForecast.objects.all().delete()
+
+        mate = BeverageCrate.objects.create(id="T0004", name="Test Mate", content="20 x 0,50 l", bottle_type=BottleType.glass_bottle)
+        GrihedPrice.objects.create(crate=mate, price=Decimal("10.00"), deposit=Decimal("3.00"), valid_from=datetime(2023, 1, 1, tzinfo=UTC))
+        SalePrice.objects.create(crate=mate, price=Decimal("20.00"), valid_from=datetime(2023, 1, 1, tzinfo=UTC))
+        for day, count in [(2, 10), (9, 6), (16, 5)]:
+            inventory_count = ShilaInventoryCount.objects.create(date=datetime(2023, 5, day, 18, tzinfo=UTC), other_monetary_value=0, money_in_safe=0, extra_expenses={})
+            ShilaInventoryCountDetail.objects.create(date=inventory_count, crate=mate, count=Decimal(count))
+
+        refresh_demand_forecasts()
+        semester_rate = CrateDemandForecast.objects.get(crate=mate).semester_rate
+        version = catalogue_version()
+
+        # Without the last count only the first window is left, which had a higher consumption
+        model_admin = admin.site._registry[ShilaInventoryCount]
+        model_admin.delete_model(RequestFactory().post("/"), ShilaInventoryCount.objects.get(date=datetime(2023, 5, 16, 18, tzinfo=UTC)))
+
+        refreshed_rate = CrateDemandForecast.objects.get(crate=mate).semester_rate
+        assert refreshed_rate is not None and semester_rate is not None and refreshed_rate > semester_rate
+        assert catalogue_version() != version
+
+        transaction.set_rollback(True)
+
+
+@mark.usefixtures("db")
+def test_changing_crates_bumps_catalogue_version() -> None:
+    with transaction.atomic():
+        mate = BeverageCrate.objects.create(id="T0005", name="Test Mate", content="20 x 0,50 l", bottle_type=BottleType.glass_bottle)
+        version = catalogue_version()
+
+        mate.name = "Test Mate Zero"
+        model_admin = admin.site._registry[BeverageCrate]
+        model_admin.save_model(RequestFactory().post("/"), mate, None, True)
+        assert catalogue_version() != version
+
+        transaction.set_rollback(True)
@@ -0,0 +1,73 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import transaction
+from pytest import mark
+from pytz import UTC
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate, BottleType, GrihedPrice, SalePrice
+from shila_lager.frontend.apps.rechnungen.forecast import DemandState, open_days, refresh_demand_forecasts
+from shila_lager.frontend.apps.rechnungen.models import CrateDemandForecast, GrihedInvoice, GrihedInvoiceItem, ShilaInventoryCount, ShilaInventoryCountDetail
+
+
+def test_open_days_skip_closed_periods() -> None:
+    # Two days before the christmas break in 2023, which lasts until the 7th of January
+    assert open_days(date(2023, 12, 20), date(2024, 1, 10)) == (5, 0)
+    assert open_days(date(2023, 3, 1), date(2023, 3, 8)) == (0, 7)
+
+
+def test_demand_state() -> None:
+    state = DemandState()
+    state.update(Decimal(14), 7, 0)
+    state.update(Decimal(7), 7, 0)
+    assert state.semester_rate == Decimal("1.7")
+    assert state.break_rate is None
+
+    # Without any break history, the semester rate is used for the semester break as well
+    assert state.target_stock(date(2023, 3, 1)) == Decimal(15)
+
+
+@mark.usefixtures("db")
+def test_invoices_on_count_days() -> None:
+    with transaction.atomic():
+        GrihedInvoiceItem.objects.all().delete()
+        ShilaInventoryCountDetail.objects.all().delete()
+        ShilaInventoryCount.objects.all().delete()
+        CrateDemandForecast.objects.all().delete()
+
+        mate = BeverageCrate.objects.create(id="T0003", name="Test Mate", content="20 x 0,50 l", bottle_type=BottleType.glass_bottle)
+        purchase_price = GrihedPrice.objects.create(crate=mate, price=Decimal("10.00"), deposit=Decimal("3.00"), valid_from=datetime(2023, 1, 1, tzinfo=UTC))
+        sale_price = SalePrice.objects.create(crate=mate, price=Decimal("20.00"), valid_from=datetime(2023, 1, 1, tzinfo=UTC))
+
+        days = [date(2023, 5, 2), date(2023, 5, 9), date(2023, 5, 16)]
+        for day, count in zip(days, [10, 6, 4]):
+            inventory_count = ShilaInventoryCount.objects.create(date=datetime(day.year, day.month, day.day, 18, tzinfo=UTC), other_monetary_value=0, money_in_safe=0, extra_expenses={})
+            ShilaInventoryCountDetail.objects.create(date=inventory_count, crate=mate, count=Decimal(count))
+
+        # Delivered on the days of the second and the last count, so they belong to the windows ending on these days
+        for day, quantity in zip(days[1:], [6, 5]):
+            invoice = GrihedInvoice.objects.create(invoice_number=f"300-{day.day}", date=day, total_price=Decimal(10 * quantity))
+            GrihedInvoiceItem.objects.create(invoice=invoice, beverage=mate, quantity=quantity, total_price=Decimal(10 * quantity), purchase_price=purchase_price, sale_price=sale_price)
+
+        refresh_demand_forecasts()
+
+        expected = DemandState()
+        expected.update(Decimal(10 - 6 + 6), *open_days(days[0], days[1]))
+        expected.update(Decimal(6 - 4 + 5), *open_days(days[1], days[2]))
+
+        forecast = CrateDemandForecast.objects.get(crate=mate)
+        assert expected.semester_rate is not None and forecast.break_rate is None
+        assert forecast.semester_rate == expected.semester_rate.quantize(Decimal("0.0001"))
+
+        # An invoice imported afterward rebuilds the forecasts of the windows it belongs to
+        invoice = GrihedInvoice.objects.create(invoice_number="300-0", date=days[2], total_price=Decimal(10))
+        GrihedInvoiceItem.objects.create(invoice=invoice, beverage=mate, quantity=1, total_price=Decimal(10), purchase_price=purchase_price, sale_price=sale_price)
+        refresh_demand_forecasts(since=invoice.date)
+
+        expected = DemandState()
+        expected.update(Decimal(10 - 6 + 6), *open_days(days[0], days[1]))
+        expected.update(Decimal(6 - 4 + 5 + 1), *open_days(days[1], days[2]))
+        assert expected.semester_rate is not None
+        assert CrateDemandForecast.objects.get(crate=mate).semester_rate == expected.semester_rate.quantize(Decimal("0.0001"))
+
+        transaction.set_rollback(True)
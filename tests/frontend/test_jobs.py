@@ -0,0 +1,146 @@
+import hashlib
+import threading
+from io import StringIO
+from pathlib import Path
+from typing import Any
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import Client
+from pytest import mark, MonkeyPatch
+
+from shila_lager.frontend.apps.jobs import runner, uploads, tasks, views
+from shila_lager.frontend.apps.jobs.models import Job, JobKind, JobStatus
+from shila_lager.frontend.apps.jobs.uploads import UploadKind
+
+
+@mark.usefixtures("db")
+def test_upload_is_streamed_and_queued(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(uploads, "manual_upload_dir", tmp_path)
+    monkeypatch.setattr(uploads, "upload_staging_dir", tmp_path / ".staging")
+
+    with transaction.atomic():
+        client = Client()
+        content = b"Buchungstag;Valutadatum\n" * 10_000
+        assert client.post("/jobs/upload/", {"kind": UploadKind.sparkasse, "file": SimpleUploadedFile("umsatz.csv", content)}).status_code == 302
+
+        client.force_login(User.objects.create(username="upload-test"))
+        response = client.post("/jobs/upload/", {"kind": UploadKind.sparkasse, "file": SimpleUploadedFile("umsatz.csv", content)})
+        assert response.status_code == 202
+
+        job = Job.objects.get(pk=response.json()["job"]["id"])
+        assert job.kind == JobKind.import_bookings and job.status == JobStatus.pending
+        assert job.sha256 == hashlib.sha256(content).hexdigest()
+        assert (tmp_path / "Sparkasse" / "umsatz.csv").read_bytes() == content
+        assert not list((tmp_path / ".staging").iterdir())
+
+        # Uploading the same content again does not import it twice
+        response = client.post("/jobs/upload/", {"kind": UploadKind.sparkasse, "file": SimpleUploadedFile("umsatz-kopie.csv", content)})
+        assert response.status_code == 200 and response.json()["job"]["id"] == job.pk
+
+        # A different file with the same name does not replace the one that was already imported
+        response = client.post("/jobs/upload/", {"kind": UploadKind.sparkasse, "file": SimpleUploadedFile("umsatz.csv", b"Buchungstag;Valutadatum\n")})
+        assert response.status_code == 409 and "umsatz.csv" in response.json()["error"]
+        assert (tmp_path / "Sparkasse" / "umsatz.csv").read_bytes() == content
+        assert not list((tmp_path / ".staging").iterdir())
+
+        transaction.set_rollback(True)
+
+
+@mark.usefixtures("db")
+def test_run_job(monkeypatch: MonkeyPatch) -> None:
+    def fail(**kwargs: Any) -> dict[str, Any]:
+        raise RuntimeError("Kaputte Datei")
+
+    def digest(start: str, end: str) -> dict[str, Any]:
+        print("Schwund: 0.00€")
+        return {"start": start, "end": end}
+
+    monkeypatch.setitem(tasks.job_functions, JobKind.import_bookings, fail)
+    monkeypatch.setitem(tasks.job_functions, JobKind.weekly_digest, digest)
+
+    with transaction.atomic():
+        job = Job.objects.create(kind=JobKind.import_bookings)
+        runner.run_job(job.pk)
+
+        job.refresh_from_db()
+        assert job.status == JobStatus.failed and "Kaputte Datei" in job.error
+        assert job.started_at is not None and job.finished_at is not None
+
+        # Identical jobs are only run once
+        arguments = {"start": "2023-01-01", "end": "2023-02-01"}
+        job = runner.enqueue_job(JobKind.weekly_digest, arguments)
+        assert runner.enqueue_job(JobKind.weekly_digest, arguments) == job
+        assert runner.enqueue_job(JobKind.weekly_digest, {"start": "2023-01-01"}) != job
+
+        runner.run_job(job.pk)
+        job.refresh_from_db()
+        assert job.status == JobStatus.succeeded and job.result == arguments and job.output == "Schwund: 0.00€\n"
+        assert job.timings[0]["name"] == "job-weekly_digest" and job.duration is not None
+
+        transaction.set_rollback(True)
+
+
+@mark.usefixtures("db")
+def test_start_job_rejects_invalid_dates() -> None:
+    with transaction.atomic():
+        client = Client()
+        client.force_login(User.objects.create(username="start-test"))
+        for value in ["2024-13-01", "2024-02-30"]:
+            response = client.post("/jobs/start/", {"kind": JobKind.weekly_digest, "start": value})
+            assert response.status_code == 400 and value in response.json()["error"]
+
+        assert not Job.objects.filter(kind=JobKind.weekly_digest).exists()
+
+        transaction.set_rollback(True)
+
+
+def test_capture_stdout_per_thread() -> None:
+    outputs, barrier = [StringIO(), StringIO()], threading.Barrier(2)
+
+    def job(i: int) -> None:
+        with runner.capture_stdout(outputs[i]):
+            # Both threads capture while the other one prints
+            barrier.wait()
+            print(f"Job {i}")
+            barrier.wait()
+
+    threads = [threading.Thread(target=job, args=(i,)) for i in range(2)]
+    for it in threads:
+        it.start()
+    for it in threads:
+        it.join()
+
+    assert [it.getvalue() for it in outputs] == ["Job 0\n", "Job 1\n"]
+
+
+async def read_streaming_content(response: Any) -> bytes:
+    return b"".join([it async for it in response.streaming_content])
+
+
+@mark.usefixtures("db")
+def test_job_status_and_plot_download(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(views, "plot_output_dir", tmp_path)
+    monkeypatch.setattr(views, "plot_chunk_size", 1000)
+    content = bytes(range(256)) * 100
+    (tmp_path / "gewinn_und_ausgaben_line.png").write_bytes(content)
+
+    with transaction.atomic():
+        client = Client()
+        job = Job.objects.create(kind=JobKind.mv_abrechnung)
+        assert client.get(f"/jobs/{job.pk}/").status_code == 302
+
+        client.force_login(User.objects.create(username="plot-test"))
+        assert client.get(f"/jobs/{job.pk}/").json()["job"]["status"] == JobStatus.pending
+        assert client.get(f"/jobs/{job.pk + 1}/").status_code == 404
+
+        response = client.get("/jobs/plots/gewinn_und_ausgaben_line.png/")
+        assert response["Content-Type"] == "image/png" and response["Content-Length"] == str(len(content))
+        assert async_to_sync(read_streaming_content)(response) == content
+
+        assert client.get("/jobs/plots/fehlt.png/").status_code == 404
+        assert client.get("/jobs/plots/..%2Fstate.db/").status_code == 404
+
+        transaction.set_rollback(True)
@@ -0,0 +1,26 @@
+from django.http import HttpRequest, HttpResponse
+from django.template import engines
+from django.test import RequestFactory
+from pytest import mark
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate
+from shila_lager.frontend.middleware import RequestProfilingMiddleware
+
+
+def n_plus_one_view(request: HttpRequest) -> HttpResponse:
+    for id in ["B1278", "B1183", "B1278"]:
+        BeverageCrate.objects.filter(id=id).first()
+
+    template = engines["django"].from_string("{% for it in items %}{{ it }}{% endfor %}")
+    return HttpResponse(template.render({"items": range(3)}, request))
+
+
+@mark.usefixtures("db")
+def test_server_timing_header() -> None:
+    middleware = RequestProfilingMiddleware(n_plus_one_view)
+    response = middleware(RequestFactory().get("/bestellung/grihed/"))
+
+    assert response.content == b"012"
+    assert "total;dur=" in response["Server-Timing"]
+    assert "3 queries, 2 similar, 1 duplicated" in response["Server-Timing"]
+    assert middleware.endpoints["GET /bestellung/grihed/"].max_similar_queries == 2
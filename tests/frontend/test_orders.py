@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import connection, transaction, reset_queries
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from pytest import mark
+from pytz import UTC
+
+from shila_lager.frontend.apps.bestellung.models import BeverageCrate, BottleType, GrihedPrice
+from shila_lager.frontend.apps.bestellung.orders import compute_order_suggestions, bump_catalogue_version
+from shila_lager.frontend.apps.bestellung.views import calculate_grihed_order, grihed_order, parse_order_form, max_order_form_quantity
+from shila_lager.frontend.apps.rechnungen.models import ShilaInventoryCount, ShilaInventoryCountDetail
+
+
+def create_catalogue() -> None:
+    mate = BeverageCrate.objects.create(id="T0001", name="Test Mate", content="20 x 0,50 l", bottle_type=BottleType.glass_bottle)
+    BeverageCrate.objects.create(id="T0002", name="Test Kasten", content="1 x 3,00", bottle_type=BottleType.crate_return)
+
+    GrihedPrice.objects.create(crate=mate, price=Decimal("10.00"), deposit=Decimal("3.00"), valid_from=datetime(2023, 1, 1, tzinfo=UTC))
+    GrihedPrice.objects.create(crate=mate, price=Decimal("12.00"), deposit=Decimal("3.00"), valid_from=datetime(2024, 1, 1, tzinfo=UTC))
+
+    count = ShilaInventoryCount.objects.create(date=datetime(2024, 2, 1, tzinfo=UTC), other_monetary_value=0, money_in_safe=0, extra_expenses={})
+    ShilaInventoryCountDetail.objects.create(date=count, crate=mate, count=Decimal("2.5"))
+
+
+@mark.usefixtures("db")
+def test_order_suggestions() -> None:
+    with transaction.atomic():
+        create_catalogue()
+
+        reset_queries()  # The query log is capped, so it might still be full from previous tests
+        with CaptureQueriesContext(connection) as queries:
+            [suggestion] = [it for it in compute_order_suggestions({"T0001": Decimal(6)}, extras={"T0001": 1}) if it.beverage.id.startswith("T")]
+
+        assert len(queries) == 2
+        assert suggestion.current_stock == Decimal("2.5")
+        assert suggestion.order_quantity == 5
+        assert suggestion.cost == Decimal("75.00")
+
+        response = calculate_grihed_order(RequestFactory().post("/bestellung/grihed/calculate/", {"current_stock_T0001": "7", "extra_order_qty_T0001": "x"}))
+        [item] = [it for it in json.loads(response.content)["items"] if it["id"] == "T0001"]
+        assert item["order_quantity"] == 0
+
+        # Values that can not be ordered are treated like invalid ones instead of failing the request
+        for value in ["Infinity", "-Infinity", "NaN", "sNaN"]:
+            assert parse_order_form({"current_stock_T0001": value}) == ({"T0001": Decimal(0)}, {})
+        assert parse_order_form({"current_stock_T0001": "1e999", "extra_order_qty_T0001": "9" * 100}) == ({"T0001": Decimal(max_order_form_quantity)}, {"T0001": max_order_form_quantity})
+
+        response = calculate_grihed_order(RequestFactory().post("/bestellung/grihed/calculate/", {"current_stock_T0001": "Infinity"}))
+        assert response.status_code == 200
+
+        bump_catalogue_version()
+        page = grihed_order(RequestFactory().get("/bestellung/grihed/")).content.decode()
+        assert "<script>" not in page
+        assert "value=\"2.5\"" in page
+
+        # The table is cached until the next import
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            assert "value=\"2.5\"" in grihed_order(RequestFactory().get("/bestellung/grihed/")).content.decode()
+        assert len(queries) == 0
+
+        bump_catalogue_version()
+
+        transaction.set_rollback(True)
@@ -0,0 +1,52 @@
+from datetime import date
+from decimal import Decimal
+from urllib.parse import parse_qs
+
+from django.core.exceptions import BadRequest
+from django.db import transaction
+from django.test import RequestFactory
+from pytest import mark, raises
+
+from shila_lager.frontend.apps.rechnungen.models import ShilaAccountBooking, ShilaBookingKind, ShilaBookingCategory
+from shila_lager.frontend.pagination import keyset_paginate, get_date_parameter
+
+
+@mark.usefixtures("db")
+def test_keyset_pagination() -> None:
+    with transaction.atomic():
+        ShilaAccountBooking.objects.all().delete()
+        for day in [date(2023, 5, 1), date(2023, 5, 2), date(2023, 5, 2), date(2023, 5, 2), date(2023, 5, 3)]:
+            ShilaAccountBooking.objects.create(
+                booking_date=day, value_date=day, kind=ShilaBookingKind.lastschrift, description="", booking_category=ShilaBookingCategory.dm.value,
+                beneficiary_or_payer="DM-drogerie markt", iban="DE00", bic="XXX", amount=Decimal(-10), currency="EUR", additional_info="",
+            )
+
+        expected = list(ShilaAccountBooking.objects.order_by("-booking_date", "-id").values_list("id", flat=True))
+        bookings = ShilaAccountBooking.objects.filter(booking_category=ShilaBookingCategory.dm.value)
+
+        seen: list[int] = []
+        params = {"page_size": "2", "category": ShilaBookingCategory.dm.value}
+        while True:
+            page = keyset_paginate(RequestFactory().get("/einzahlungen/", params), bookings, "booking_date")
+            seen.extend(it.id for it in page)
+            if page.next_query is None:
+                break
+
+            params = {key: value[-1] for key, value in parse_qs(page.next_query).items()}
+            assert params["category"] == ShilaBookingCategory.dm.value
+
+        assert seen == expected
+
+        with raises(BadRequest):
+            keyset_paginate(RequestFactory().get("/einzahlungen/", {"cursor": "kaputt"}), bookings, "booking_date")
+
+        transaction.set_rollback(True)
+
+
+def test_get_date_parameter() -> None:
+    assert get_date_parameter(RequestFactory().get("/einzahlungen/", {"start": "2024-02-29"}), "start") == date(2024, 2, 29)
+    assert get_date_parameter(RequestFactory().get("/einzahlungen/"), "start") is None
+
+    for value in ["gestern", "2024-02-30"]:
+        with raises(BadRequest):
+            get_date_parameter(RequestFactory().get("/einzahlungen/", {"start": value}), "start")
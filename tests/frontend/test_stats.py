@@ -0,0 +1,36 @@
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.db import transaction
+from django.test import RequestFactory
+from pytest import mark
+from pytz import UTC
+
+from shila_lager.frontend.apps.stats.models import WindowStatistics, CategorySpend
+from shila_lager.frontend.apps.stats.views import windows_api, beverages_api, rollup_api
+
+
+@mark.usefixtures("db")
+def test_windows_api() -> None:
+    with transaction.atomic():
+        start = datetime(2023, 1, 6, tzinfo=UTC)
+        for i in range(3):
+            window = WindowStatistics.objects.create(
+                start=start + timedelta(weeks=i), end=start + timedelta(weeks=i + 1), profit=Decimal(100), expected_profit=Decimal(120), expected_profit_without_deposits=Decimal(110),
+                expected_profit_with_payed_but_not_returned_deposits=Decimal(115), expected_income=Decimal(500), actual_income=Decimal(480),
+            )
+            CategorySpend.objects.create(window=window, category="Getränke", amount=Decimal(300))
+
+        response = json.loads(async_to_sync(windows_api)(RequestFactory().get("/stats/api/windows/", {"page_size": 2, "page": 2})).content)
+        assert response["count"] == 3 and response["num_pages"] == 2
+        assert [it["end"] for it in response["results"]] == [(start + timedelta(weeks=1)).isoformat()]
+        assert response["results"][0]["schwund"] == "20.00"
+        assert response["results"][0]["spend_per_category"] == {"Getränke": "300.00"}
+
+        for value in ["gestern", "2024-02-30"]:
+            assert async_to_sync(beverages_api)(RequestFactory().get("/stats/api/beverages/", {"window": value})).status_code == 400
+            assert async_to_sync(rollup_api)(RequestFactory().get("/stats/api/rollup/", {"start": value})).status_code == 400
+
+        transaction.set_rollback(True)
@@ -0,0 +1,37 @@
+import os
+from pathlib import Path
+
+from pytest import MonkeyPatch
+
+from shila_lager.frontend.apps.jobs import uploads, watch
+from shila_lager.frontend.apps.jobs.uploads import UploadKind
+from shila_lager.frontend.apps.jobs.watch import UploadWatcher
+
+
+def test_new_files_are_debounced(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(uploads, "manual_upload_dir", tmp_path)
+    monkeypatch.setattr(watch, "watch_debounce", 2.0)
+    for kind in UploadKind:
+        kind.directory.mkdir()
+
+    (tmp_path / "Sparkasse" / "alt.csv").write_text("Buchungstag")
+    watcher = UploadWatcher()
+
+    counts = tmp_path / "Lagerzählungen" / "2024-05-03.yaml"
+    counts.write_text("Geld:")
+    (tmp_path / "Lagerzählungen" / ".2024-05-10.yaml.part").write_text("Geld:")
+    assert watcher.settled_files(now=0) == {}
+    assert watcher.settled_files(now=1) == {}
+
+    # Still copied, so the debounce starts again
+    counts.write_text("Geld:\nTresor: 0")
+    os.utime(counts, ns=(1, 1))
+    assert watcher.settled_files(now=2.5) == {}
+
+    assert watcher.settled_files(now=4.5) == {UploadKind.lagerzaehlung: [counts]}
+    assert watcher.settled_files(now=10) == {}
+
+    # Files that were there before are only imported if they change
+    (tmp_path / "Sparkasse" / "alt.csv").write_text("Buchungstag;Valutadatum")
+    watcher.settled_files(now=20)
+    assert watcher.settled_files(now=22) == {UploadKind.sparkasse: [tmp_path / "Sparkasse" / "alt.csv"]}